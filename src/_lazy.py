@@ -0,0 +1,35 @@
+# src/_lazy.py
+"""
+Exportaciones perezosas (PEP 562) de los paquetes: importar src.clients,
+src.storage o src.pipeline no carga sus dependencias pesadas; cada nombre se
+importa la primera vez que se usa y queda cacheado en el paquete.
+
+    _EXPORTS = {"RedditClient": ".reddit", ...}
+    __all__, __getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
+"""
+import importlib
+import sys
+from typing import Any, Callable, Dict, List, Tuple
+
+
+def lazy_exports(
+    package: str,
+    exports: Dict[str, str],
+) -> Tuple[List[str], Callable[[str], Any], Callable[[], List[str]]]:
+    """
+    (__all__, __getattr__, __dir__) para el __init__ de `package`, a partir de
+    {nombre: módulo relativo}.
+    """
+
+    def __getattr__(name: str) -> Any:
+        module = exports.get(name)
+        if module is None:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        value = getattr(importlib.import_module(module, package), name)
+        setattr(sys.modules[package], name, value)
+        return value
+
+    def __dir__() -> List[str]:
+        return sorted(set(vars(sys.modules[package])) | set(exports))
+
+    return list(exports), __getattr__, __dir__
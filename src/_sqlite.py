@@ -0,0 +1,29 @@
+# src/_sqlite.py
+"""
+Apertura común de los SQLite locales (caché HTTP, sinónimos, cola de jobs,
+near-dup, embeddings, full-text): crea el directorio, abre en autocommit
+(isolation_level=None; las transacciones se abren a mano con BEGIN), permite
+usar la conexión desde varios hilos (cada clase la protege con su lock) y
+activa WAL para que los lectores no bloqueen al escritor.
+
+    self._con = open_sqlite(path, synchronous="NORMAL")
+"""
+import os
+import sqlite3
+from typing import Optional
+
+
+def open_sqlite(path: str, busy_timeout: float = 5.0, synchronous: Optional[str] = None) -> sqlite3.Connection:
+    """
+    Conexión a `path` en modo WAL. busy_timeout (segundos) es lo que espera
+    una escritura si otro proceso tiene el lock; synchronous ("NORMAL",
+    "FULL"...) se fija solo si se pasa.
+    """
+    d = os.path.dirname(path)
+    if d:
+        os.makedirs(d, exist_ok=True)
+    con = sqlite3.connect(path, timeout=busy_timeout, check_same_thread=False, isolation_level=None)
+    con.execute("PRAGMA journal_mode=WAL")
+    if synchronous is not None:
+        con.execute(f"PRAGMA synchronous={synchronous}")
+    return con
@@ -1 +1,16 @@
-from .reddit import RedditClient
\ No newline at end of file
+# src/clients/__init__.py
+# Exportaciones perezosas (PEP 562): importar el paquete no carga requests/httpx
+# ni, a través de los normalizadores, pandas/pyarrow. Cada nombre se importa la
+# primera vez que se usa.
+from src._lazy import lazy_exports
+
+_EXPORTS = {
+    "RedditClient": ".reddit",
+    "AsyncRedditClient": ".reddit_async",
+    "ListingTarget": ".reddit_async",
+    "RateLimiter": ".rate_limit",
+    "SharedRateLimiter": ".rate_limit",
+    "ResponseCache": ".http_cache",
+}
+
+__all__, __getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
@@ -0,0 +1,135 @@
+# src/clients/comments.py
+"""
+Recorrido de árboles de comentarios, compartido por RedditClient y AsyncRedditClient.
+
+Reddit devuelve en /comments/{post} solo una parte del árbol; el resto llega como
+stubs "more":
+  - con ids (children): se expanden con /api/morechildren, hasta 100 ids por
+    llamada. Se juntan los ids de TODOS los stubs del post y se piden en lotes
+    llenos, en vez de una llamada por stub. (La API exige un link_id por llamada,
+    así que no se pueden mezclar ids de posts distintos.)
+  - "continue this thread" (id '_', sin children): se pide el subárbol con
+    /comments/{post}?comment={padre}.
+
+CommentTreeWalk no hace peticiones: recibe respuestas, emite comentarios planos
+(dicts de t1 con link_id/parent_id/depth) y dice cuál es la siguiente petición.
+La memoria por post es O(ids pendientes + ids vistos), nunca el árbol entero.
+"""
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Iterator, List, Optional, Set, Tuple
+
+MORECHILDREN_MAX_IDS = 100
+COMMENTS_LIMIT = 500
+
+
+def _short(fullname: str) -> str:
+    return fullname.split("_", 1)[1] if "_" in fullname else fullname
+
+
+@dataclass
+class CommentTreeWalk:
+    post_id: str                       # id corto del post ('abc123')
+    sort: str = "new"
+    limit: int = COMMENTS_LIMIT        # comentarios en la petición inicial
+    depth: Optional[int] = None
+    max_comments: Optional[int] = None
+    pending_more: Deque[str] = field(default_factory=deque, init=False)
+    pending_threads: Deque[str] = field(default_factory=deque, init=False)
+    seen: Set[str] = field(default_factory=set, init=False, repr=False)
+    emitted: int = field(default=0, init=False)
+    calls: int = field(default=0, init=False)
+
+    @property
+    def link_id(self) -> str:
+        return f"t3_{_short(self.post_id)}"
+
+    # ---------------------- Peticiones ----------------------
+
+    def initial_request(self) -> Tuple[str, Dict]:
+        return self._comments_request()
+
+    def _comments_request(self, comment: Optional[str] = None) -> Tuple[str, Dict]:
+        params: Dict = {"sort": self.sort, "limit": self.limit, "raw_json": 1, "threaded": "true"}
+        if self.depth is not None:
+            params["depth"] = self.depth
+        if comment:
+            params["comment"] = comment
+        return f"/comments/{_short(self.post_id)}", params
+
+    def next_request(self) -> Optional[Tuple[str, Dict]]:
+        """
+        Siguiente petición pendiente (lote de morechildren primero), o None si
+        el árbol está completo o se alcanzó max_comments.
+        """
+        if self.done:
+            return None
+        if self.pending_more:
+            n = min(MORECHILDREN_MAX_IDS, len(self.pending_more))
+            ids = [self.pending_more.popleft() for _ in range(n)]
+            params = {
+                "link_id": self.link_id,
+                "children": ",".join(ids),
+                "sort": self.sort,
+                "api_type": "json",
+                "limit_children": "false",
+                "raw_json": 1,
+            }
+            return "/api/morechildren", params
+        if self.pending_threads:
+            return self._comments_request(self.pending_threads.popleft())
+        return None
+
+    @property
+    def done(self) -> bool:
+        return self.max_comments is not None and self.emitted >= self.max_comments
+
+    # ---------------------- Respuestas ----------------------
+
+    def feed(self, path: str, payload) -> Iterator[Dict]:
+        """
+        Procesa la respuesta de una petición devuelta por initial_request/next_request.
+        """
+        self.calls += 1
+        if path == "/api/morechildren":
+            things = (payload.get("json") or {}).get("data", {}).get("things", [])
+            yield from self._walk(things)
+            return
+        # /comments/{id} -> [listing del post, listing de comentarios]
+        if isinstance(payload, list) and len(payload) > 1:
+            yield from self._walk(payload[1].get("data", {}).get("children", []))
+
+    def _walk(self, children: List[Dict]) -> Iterator[Dict]:
+        # Pila explícita: los hilos muy profundos no agotan la recursión
+        stack = list(reversed(children))
+        while stack:
+            if self.done:
+                return
+            ch = stack.pop()
+            kind = ch.get("kind")
+            data = ch.get("data") or {}
+            if kind == "more":
+                self._add_stub(data)
+                continue
+            if kind != "t1":
+                continue
+            cid = data.get("id")
+            replies = data.get("replies")
+            if isinstance(replies, dict):
+                stack.extend(reversed(replies.get("data", {}).get("children", [])))
+            if not cid or cid in self.seen:
+                continue
+            self.seen.add(cid)
+            out = {k: v for k, v in data.items() if k != "replies"}
+            out.setdefault("link_id", self.link_id)
+            self.emitted += 1
+            yield out
+
+    def _add_stub(self, data: Dict) -> None:
+        children = data.get("children") or []
+        if children:
+            # Stub con ids: solo los no vistos; si ya se vieron todos, se descarta
+            self.pending_more.extend(i for i in children if i not in self.seen)
+        elif not data.get("count") and data.get("parent_id", "").startswith("t1_"):
+            # "continue this thread" (count 0, sin children): subárbol a partir del padre
+            self.pending_threads.append(_short(data["parent_id"]))
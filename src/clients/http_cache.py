@@ -0,0 +1,247 @@
+# src/clients/http_cache.py
+import hashlib
+import json
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Optional, Dict, Mapping, Callable
+from urllib.parse import urlparse
+
+from src._sqlite import open_sqlite
+
+# TTL (segundos) de /top y search según la ventana 't'
+TOP_TTL = {
+    "hour": 5 * 60,
+    "day": 30 * 60,
+    "week": 6 * 3600,
+    "month": 24 * 3600,
+    "year": 24 * 3600,
+    "all": 24 * 3600,
+}
+NEW_TTL = 60
+SEARCH_TTL = 15 * 60
+DEFAULT_TTL = 5 * 60
+
+
+def default_ttl(url: str, params: Optional[Dict]) -> int:
+    """
+    TTL por endpoint: los listings 'new' caducan en un minuto; /top y las
+    búsquedas no cronológicas según su ventana temporal (t=week -> 6 h).
+    """
+    params = params or {}
+    path = urlparse(url).path.rstrip("/")
+    sort = params.get("sort")
+    if path.endswith("/new") or sort == "new":
+        return NEW_TTL
+    if path.endswith("/top") or sort == "top":
+        return TOP_TTL.get(params.get("t", "day"), DEFAULT_TTL)
+    if path.endswith("/search"):
+        return SEARCH_TTL
+    return DEFAULT_TTL
+
+
+@dataclass
+class CachedResponse:
+    key: str
+    body: bytes
+    etag: Optional[str]
+    last_modified: Optional[str]
+    expires_at: float
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    def json(self) -> Dict:
+        return json.loads(self.body)
+
+    def conditional_headers(self) -> Dict[str, str]:
+        h = {}
+        if self.etag:
+            h["If-None-Match"] = self.etag
+        if self.last_modified:
+            h["If-Modified-Since"] = self.last_modified
+        return h
+
+
+class ResponseCache:
+    """
+    Caché en disco (SQLite) de respuestas GET de la API.
+
+    - Clave: URL + params ordenados (sha256).
+    - TTL por endpoint (ver default_ttl); caducada, se revalida con
+      If-None-Match / If-Modified-Since si el servidor dio ETag/Last-Modified.
+    - Expulsión LRU por tamaño total (`max_bytes`) de los cuerpos comprimidos.
+      El total se lleva en memoria (se lee al abrir y se ajusta en cada
+      escritura), así store() no recorre la tabla; al expulsar se recalcula,
+      por si otro proceso comparte el fichero.
+    - Contadores: hits, misses, revalidated (304), stores, evictions.
+
+    Segura entre hilos (una conexión con lock).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 256 * 1024 * 1024,
+        ttl: Callable[[str, Optional[Dict]], int] = default_ttl,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._con = open_sqlite(path)
+        self._con.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._con.execute("CREATE INDEX IF NOT EXISTS ix_last_access ON responses(last_access)")
+        self._bytes = self._total_bytes()
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.stores = 0
+        self.evictions = 0
+
+    # ---------------------- Claves ----------------------
+
+    @staticmethod
+    def key(url: str, params: Optional[Dict] = None) -> str:
+        items = sorted((str(k), str(v)) for k, v in (params or {}).items())
+        raw = url + "?" + "&".join(f"{k}={v}" for k, v in items)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    # ---------------------- Lectura ----------------------
+
+    def lookup(self, url: str, params: Optional[Dict] = None) -> Optional[CachedResponse]:
+        """
+        Devuelve la entrada (fresca o caducada) o None. Cuenta hit solo si está fresca;
+        una entrada caducada es un miss hasta que un 304 la revalide.
+        """
+        k = self.key(url, params)
+        with self._lock:
+            row = self._con.execute(
+                "SELECT body, etag, last_modified, expires_at FROM responses WHERE key = ?", (k,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            body, etag, last_modified, expires_at = row
+            entry = CachedResponse(k, zlib.decompress(body), etag, last_modified, expires_at)
+            if entry.fresh:
+                self.hits += 1
+                self._con.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), k))
+            else:
+                self.misses += 1
+            return entry
+
+    # ---------------------- Escritura ----------------------
+
+    def store(self, url: str, params: Optional[Dict], body: bytes, headers: Mapping[str, str]) -> None:
+        k = self.key(url, params)
+        now = time.time()
+        blob = zlib.compress(body, 3)
+        with self._lock:
+            old = self._con.execute("SELECT size FROM responses WHERE key = ?", (k,)).fetchone()
+            self._con.execute(
+                """
+                INSERT OR REPLACE INTO responses
+                    (key, url, body, size, etag, last_modified, stored_at, expires_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    k, url, blob, len(blob),
+                    headers.get("ETag"), headers.get("Last-Modified"),
+                    now, now + self.ttl(url, params), now,
+                ),
+            )
+            self._bytes += len(blob) - (old[0] if old else 0)
+            self.stores += 1
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def refresh(self, entry: CachedResponse, url: str, params: Optional[Dict], headers: Mapping[str, str]) -> None:
+        """
+        Tras un 304: la entrada vuelve a ser fresca otro TTL (y actualiza validadores).
+        """
+        now = time.time()
+        with self._lock:
+            self._con.execute(
+                """
+                UPDATE responses
+                SET expires_at = ?, last_access = ?,
+                    etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified)
+                WHERE key = ?
+                """,
+                (now + self.ttl(url, params), now, headers.get("ETag"), headers.get("Last-Modified"), entry.key),
+            )
+            self.revalidated += 1
+
+    def _total_bytes(self) -> int:
+        return self._con.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def _evict(self) -> None:
+        total = self._bytes = self._total_bytes()
+        if total <= self.max_bytes:
+            return
+        # LRU: borra las menos usadas hasta bajar del límite
+        for k, size in self._con.execute(
+            "SELECT key, size FROM responses ORDER BY last_access ASC"
+        ).fetchall():
+            self._con.execute("DELETE FROM responses WHERE key = ?", (k,))
+            self.evictions += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+        self._bytes = total
+
+    # ---------------------- Mantenimiento ----------------------
+
+    def purge_expired(self) -> int:
+        """
+        Borra entradas caducadas sin validadores (no se pueden revalidar).
+        """
+        with self._lock:
+            cur = self._con.execute(
+                "DELETE FROM responses WHERE expires_at < ? AND etag IS NULL AND last_modified IS NULL",
+                (time.time(),),
+            )
+            self._bytes = self._total_bytes()
+            return cur.rowcount
+
+    def clear(self) -> None:
+        with self._lock:
+            self._con.execute("DELETE FROM responses")
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            n, size = self._con.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        total = self.hits + self.misses
+        return {
+            "entries": n,
+            "bytes": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidated": self.revalidated,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "hit_ratio": (self.hits / total) if total else 0.0,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._con.close()
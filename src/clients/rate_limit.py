@@ -0,0 +1,228 @@
+# src/clients/rate_limit.py
+import asyncio
+import multiprocessing
+import threading
+import time
+from typing import Mapping, Optional, Tuple
+
+from src import metrics
+
+
+class RateLimiter:
+    """
+    Token bucket adaptativo guiado por las cabeceras x-ratelimit-* de Reddit.
+
+    - Mientras quede presupuesto holgado (> reserve) las peticiones salen sin espera.
+    - Cerca del agotamiento reparte lo que queda uniformemente hasta el reset.
+    - Sin presupuesto, espera al reset de la ventana y vuelve a pedir turno.
+
+    Reddit envía en cada respuesta:
+      x-ratelimit-remaining (float), x-ratelimit-used (int), x-ratelimit-reset (segundos).
+    Hasta ver la primera cabecera se asume una ventana conservadora (capacity/period).
+
+    Es seguro compartirlo entre hilos (lock interno) y entre tareas asyncio:
+    el cálculo de la espera es atómico y la espera en sí ocurre fuera del lock
+    (time.sleep en acquire(), asyncio.sleep en acquire_async()).
+    """
+
+    def __init__(
+        self,
+        capacity: int = 100,
+        period: float = 60.0,
+        reserve_ratio: float = 0.1,
+        clock=time.monotonic,
+    ):
+        self.capacity = float(capacity)
+        self.period = float(period)
+        self.reserve_ratio = reserve_ratio
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        self._roll_window(clock())
+        self._calibrated = False
+        self._inflight = 0  # tokens concedidos cuya respuesta aún no ha llegado
+
+        # Estadísticas
+        self.acquired = 0
+        self.waits = 0
+        self.waited_seconds = 0.0
+
+    # ---------------------- Reserva ----------------------
+
+    @property
+    def reserve(self) -> float:
+        return max(1.0, self.capacity * self.reserve_ratio)
+
+    def _roll_window(self, now: float) -> None:
+        self._remaining = self.capacity
+        self._reset_at = now + self.period
+        self._next_slot = now
+        self._last_used = 0.0
+
+    def _reserve(self) -> Tuple[bool, float]:
+        """
+        Intenta consumir un token. Devuelve (concedido, segundos de espera):
+          - concedido: esperar `delay` y lanzar la petición.
+          - no concedido: esperar `delay` (hasta el reset) y volver a intentarlo.
+        """
+        with self._lock:
+            now = self._clock()
+            if now >= self._reset_at:
+                self._roll_window(now)
+
+            if self._remaining > self.reserve:
+                # Presupuesto holgado: sin espera
+                self._remaining -= 1
+                self._inflight += 1
+                return True, 0.0
+
+            if self._remaining >= 1:
+                # Cerca del límite: reparte lo que queda hasta el reset
+                interval = (self._reset_at - now) / self._remaining
+                start = max(now, self._next_slot)
+                if start < self._reset_at:
+                    self._next_slot = start + interval
+                    self._remaining -= 1
+                    self._inflight += 1
+                    return True, start - now
+
+            # Agotado: hay que esperar a la próxima ventana
+            return False, max(0.0, self._reset_at - now)
+
+    def _record(self, waited: float) -> None:
+        with self._lock:
+            self.acquired += 1
+            if waited > 0:
+                self.waits += 1
+                self.waited_seconds += waited
+        if waited > 0:
+            # La antigua espera fija entre páginas: ahora la decide el bucket
+            metrics.observe("ratelimit_wait_seconds", waited)
+
+    def acquire(self) -> float:
+        """Bloquea el hilo hasta disponer de un token. Devuelve los segundos esperados."""
+        waited = 0.0
+        while True:
+            granted, delay = self._reserve()
+            if delay > 0:
+                time.sleep(delay)
+                waited += delay
+            if granted:
+                self._record(waited)
+                return waited
+
+    async def acquire_async(self) -> float:
+        """Como acquire() pero cede el loop mientras espera."""
+        waited = 0.0
+        while True:
+            granted, delay = self._reserve()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                waited += delay
+            if granted:
+                self._record(waited)
+                return waited
+
+    def release(self) -> None:
+        """
+        La petición de un token concedido ya terminó (con respuesta o con error:
+        timeout, conexión...). Llamar siempre, en un finally, antes de
+        update_from_headers(): la calibración descuenta solo las que siguen en vuelo.
+        """
+        with self._lock:
+            self._inflight = max(0, self._inflight - 1)
+
+    # ---------------------- Feedback del servidor ----------------------
+
+    @staticmethod
+    def _header_float(headers: Mapping[str, str], name: str) -> Optional[float]:
+        v = headers.get(name)
+        if v is None:
+            return None
+        try:
+            return float(v)
+        except (TypeError, ValueError):
+            return None
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        """
+        Ajusta el bucket con las cabeceras de una respuesta (requests o httpx).
+        """
+        remaining = self._header_float(headers, "x-ratelimit-remaining")
+        used = self._header_float(headers, "x-ratelimit-used")
+        reset = self._header_float(headers, "x-ratelimit-reset")
+        if remaining is None or reset is None:
+            return
+
+        with self._lock:
+            now = self._clock()
+            if used is not None and remaining + used > 0:
+                self.capacity = remaining + used
+                self.period = max(self.period, reset)
+
+            new_window = not self._calibrated or (
+                used is not None
+                and used < self._last_used
+                and now + reset > self._reset_at + 1.0
+            )
+            if new_window:
+                # Primera cabecera, o 'used' ha bajado y el reset se ha alejado
+                # (no es solo una respuesta desordenada): la cifra del servidor manda,
+                # descontando las peticiones que siguen en vuelo
+                self._remaining = max(0.0, remaining - self._inflight)
+                self._next_slot = now
+                self._last_used = used or 0.0
+                self._calibrated = True
+            else:
+                # Misma ventana: las peticiones en vuelo aún no cuentan en el servidor
+                self._remaining = min(self._remaining, remaining)
+                self._last_used = max(self._last_used, used or 0.0)
+            self._reset_at = now + reset
+
+    def on_rate_limited(self, headers: Mapping[str, str]) -> None:
+        """
+        Tras un 429: vacía el bucket hasta el reset indicado (o un periodo por defecto).
+        """
+        reset = self._header_float(headers, "x-ratelimit-reset")
+        metrics.count("ratelimited_total")
+        with self._lock:
+            now = self._clock()
+            self._remaining = 0.0
+            self._reset_at = now + (max(1.0, reset) if reset is not None else self.period)
+
+
+def _shared_field(i: int) -> property:
+    return property(
+        lambda self: self._state[i],
+        lambda self, v: self._state.__setitem__(i, v),
+    )
+
+
+class SharedRateLimiter(RateLimiter):
+    """
+    RateLimiter con el estado del bucket en memoria compartida (RawArray + Lock de
+    multiprocessing): un único presupuesto para todos los procesos que lo reciban
+    al arrancar (argumento de Process). time.monotonic es común a todo el sistema,
+    así que las ventanas cuadran entre procesos. Las estadísticas (acquired,
+    waits...) siguen siendo por proceso.
+    """
+
+    _FIELDS = ("capacity", "period", "_remaining", "_reset_at", "_next_slot",
+               "_last_used", "_inflight", "_calibrated")
+
+    def __init__(
+        self,
+        capacity: int = 100,
+        period: float = 60.0,
+        reserve_ratio: float = 0.1,
+        ctx=None,
+    ):
+        ctx = ctx or multiprocessing.get_context()
+        self._state = ctx.RawArray("d", len(self._FIELDS))
+        super().__init__(capacity, period, reserve_ratio)
+        self._lock = ctx.Lock()
+
+
+for _i, _name in enumerate(SharedRateLimiter._FIELDS):
+    setattr(SharedRateLimiter, _name, _shared_field(_i))
+del _i, _name
@@ -1,12 +1,18 @@
 # src/extract/reddit_wrappers.py
-from typing import Optional, Dict, Iterable
+from typing import Optional, Dict, Iterable, Tuple, TYPE_CHECKING
 import time
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
-import pandas as pd
 
-from src.transform.normalizers import normalize_posts
+from src import metrics
+from src.storage.checkpoints import CheckpointStore, Watermark
+from .rate_limit import RateLimiter
+from .http_cache import ResponseCache
+from .comments import CommentTreeWalk, COMMENTS_LIMIT
+
+if TYPE_CHECKING:  # pandas solo se carga al usar la capa DataFrame
+    import pandas as pd
 
 
 class RedditClient:
@@ -17,6 +23,12 @@ class RedditClient:
 
     - Gestiona sesión, token y reintentos.
     - Helpers para listings con paginación (after).
+    - Ritmo de peticiones según cabeceras x-ratelimit-* (RateLimiter compartible
+      entre varios clientes, hilos o tareas async).
+    - Crawl incremental opcional: con un CheckpointStore, los listings
+      cronológicos (new / search sort=new) paran al llegar a lo ya ingerido.
+    - Caché HTTP en disco opcional (ResponseCache) para GETs repetidos;
+      con caché, la autenticación se difiere a la primera petición real.
     """
 
     AUTH_URL = "https://www.reddit.com/api/v1/access_token"
@@ -30,33 +42,43 @@ class RedditClient:
         user_agent_prefix: str = "TFM-analytics/1.0",
         timeout: int = 20,
         max_retries: int = 3,
+        rate_limiter: Optional[RateLimiter] = None,
+        checkpoints: Optional[CheckpointStore] = None,
+        cache: Optional[ResponseCache] = None,
     ):
         self.client_id = client_id
         self.client_secret = client_secret
         self.user_agent = f"{user_agent_prefix} by u/{username}"
         self.timeout = timeout
+        self.max_retries = max_retries
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.checkpoints = checkpoints
+        self.cache = cache
 
-        # Session + retries (5xx/429 con backoff)
+        # Session + retries (5xx con backoff; los 429 los gestiona el RateLimiter)
         self.s = requests.Session()
         self.s.headers.update({"User-Agent": self.user_agent})
         retry = Retry(
             total=max_retries,
             backoff_factor=0.8,
-            status_forcelist=(429, 500, 502, 503, 504),
+            status_forcelist=(500, 502, 503, 504),
             allowed_methods=frozenset(["GET", "POST"]),
         )
         self.s.mount("https://", HTTPAdapter(max_retries=retry))
 
         self._token: Optional[str] = None
         self._token_expiry_ts: float = 0.0
-        self._authenticate()
+        if self.cache is None:
+            self._authenticate()
 
     # ---------------------- Auth ----------------------
 
     def _authenticate(self) -> None:
         data = {"grant_type": "client_credentials"}
         auth = requests.auth.HTTPBasicAuth(self.client_id, self.client_secret)
-        r = self.s.post(self.AUTH_URL, data=data, auth=auth, timeout=self.timeout)
+        with metrics.span("authenticate"):
+            r = self.s.post(self.AUTH_URL, data=data, auth=auth, timeout=self.timeout)
+        metrics.count("auth_total", status=r.status_code)
         r.raise_for_status()
         payload = r.json()
 
@@ -79,24 +101,49 @@ class RedditClient:
         method: 'GET' | 'POST'
         path: '/r/{sub}/new' o 'search' (se resuelve contra API_BASE)
         """
-        self._ensure_token()
-
         url = path if path.startswith("http") else f"{self.API_BASE}/{path.lstrip('/')}"
-        r = self.s.request(method, url, params=params, timeout=self.timeout)
 
-        # Gestiona 429 con espera según cabeceras si no lo absorbió Retry
-        if r.status_code == 429:
-            reset = r.headers.get("x-ratelimit-reset")
-            if reset:
-                wait = max(1, int(float(reset)))
-                time.sleep(wait)
-                r = self.s.request(method, url, params=params, timeout=self.timeout)
+        # Caché: fresca -> sin red ni cuota; caducada -> petición condicional
+        cached = None
+        headers = {}
+        if self.cache is not None and method == "GET":
+            cached = self.cache.lookup(url, params)
+            if cached is not None:
+                if cached.fresh:
+                    metrics.count("http_cache_total", result="fresh")
+                    return cached.json()
+                headers = cached.conditional_headers()
+
+        self._ensure_token()
+
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                with metrics.span("http_request", method=method):
+                    r = self.s.request(method, url, params=params, headers=headers, timeout=self.timeout)
+            finally:
+                self.rate_limiter.release()
+            metrics.count("http_responses_total", method=method, status=r.status_code)
+            if r.status_code != 429:
+                self.rate_limiter.update_from_headers(r.headers)
+                break
+            # 429: vacía el bucket hasta x-ratelimit-reset y reintenta
+            self.rate_limiter.on_rate_limited(r.headers)
+
+        metrics.count("http_bytes_total", len(r.content), method=method)
+        if r.status_code == 304 and cached is not None:
+            metrics.count("http_cache_total", result="revalidated")
+            self.cache.refresh(cached, url, params, r.headers)
+            return cached.json()
 
         r.raise_for_status()
         try:
-            return r.json()
+            payload = r.json()
         except ValueError as e:
             raise RuntimeError(f"Respuesta no JSON desde {url}") from e
+        if self.cache is not None and method == "GET":
+            self.cache.store(url, params, r.content, r.headers)
+        return payload
 
     # ---------------------- Listings helpers ----------------------
 
@@ -106,46 +153,71 @@ class RedditClient:
         limit: int = 100,
         max_items: int = 1000,
         extra_params: Optional[Dict] = None,
+        checkpoint_key: Optional[str] = None,
     ) -> Iterable[Dict]:
         """
         Itera sobre un listing (children) usando paginación via 'after'.
+
+        checkpoint_key: si hay CheckpointStore, corta la paginación al alcanzar
+        el watermark guardado y, al terminar el recorrido, deja pendiente el
+        post más nuevo visto (CheckpointStore.stage). El consumidor lo confirma
+        con checkpoints.commit() cuando las filas ya están escritas. Solo para
+        listings ordenados por fecha descendente.
         """
         params = {"limit": min(limit, 100)}
         if extra_params:
             params.update(extra_params)
 
+        tracking = checkpoint_key is not None and self.checkpoints is not None
+        since = self.checkpoints.get(checkpoint_key) if tracking else None
+        newest: Optional[Watermark] = None
+        complete = False
+
         fetched = 0
         after = None
 
-        while True:
-            if after:
-                params["after"] = after
-
-            payload = self._request("GET", path, params=params)
-            data = payload.get("data", {})
-            children = data.get("children", [])
-            for ch in children:
-                yield ch.get("data", {})
-                fetched += 1
-                if fetched >= max_items:
+        try:
+            while True:
+                if after:
+                    params["after"] = after
+
+                payload = self._request("GET", path, params=params)
+                data = payload.get("data", {})
+                children = data.get("children", [])
+                for ch in children:
+                    post = ch.get("data", {})
+                    if since is not None and since.reached(post):
+                        complete = True
+                        return
+                    if tracking and not post.get("stickied"):
+                        mark = Watermark.from_post(post)
+                        if mark is not None and mark.newer_than(newest):
+                            newest = mark
+                    yield post
+                    fetched += 1
+                    if fetched >= max_items:
+                        # Corte por max_items: entre este post y el watermark
+                        # viejo quedan posts sin leer, así que no cuenta como completo
+                        return
+
+                after = data.get("after")
+                if not after or not children:
+                    complete = True
                     return
-
-            after = data.get("after")
-            if not after or not children:
-                return
-
-            # respetar rate limiting suave
-            self._sleep_respecting_limits(payload)
-
-    def _sleep_respecting_limits(self, _response_json: Dict) -> None:
-        # Si la API devolviera headers de x-ratelimit en JSON (no siempre),
-        # usa un sleep fijo pequeño para ser “nice”.
-        time.sleep(0.6)
+                # El ritmo entre páginas lo marca el RateLimiter en _request
+        finally:
+            # Solo si el recorrido llegó al watermark viejo o agotó el listing
+            # (no en errores, abandonos ni cortes por max_items): así nunca queda
+            # un hueco. Queda pendiente hasta que el consumidor escriba las filas
+            # y llame a checkpoints.commit() (p.ej. save_df(..., checkpoints=...))
+            if tracking and complete and newest is not None:
+                self.checkpoints.stage(checkpoint_key, newest)
 
     # ---------------------- Métodos crudos ----------------------
 
     def subreddit_new(self, subreddit: str, **kwargs) -> Iterable[Dict]:
-        return self.listing(f"/r/{subreddit}/new", **kwargs)
+        key = CheckpointStore.key("new", subreddit=subreddit, sort="new")
+        return self.listing(f"/r/{subreddit}/new", checkpoint_key=key, **kwargs)
 
     def subreddit_top(self, subreddit: str, t: str = "day", **kwargs) -> Iterable[Dict]:
         params = {"t": t}
@@ -164,13 +236,51 @@ class RedditClient:
         """
         Retorna un iterable de dicts (posts). Para DataFrame usar search_df().
         """
+        path, params = self._search_request(
+            query, sort=sort, t=t, restrict_sr=restrict_sr, subreddit=subreddit,
+            include_over_18=include_over_18, limit=kwargs.get("limit", 100),
+        )
+
+        # Filtra kwargs de listing para evitar pasar 'limit' duplicado
+        listing_kwargs = {k: v for k, v in kwargs.items() if k not in ("limit",)}
+        if sort == "new":
+            listing_kwargs.setdefault("checkpoint_key", self._search_checkpoint_key(
+                query, sort=sort, t=t, restrict_sr=restrict_sr, subreddit=subreddit,
+            ))
+        return self.listing(path, extra_params=params, **listing_kwargs)
+
+    @staticmethod
+    def _search_checkpoint_key(
+        query: str,
+        sort: str,
+        t: str,
+        restrict_sr: bool,
+        subreddit: Optional[str],
+    ) -> str:
+        return CheckpointStore.key(
+            "search", subreddit=subreddit if restrict_sr else None, query=query, sort=sort, t=t,
+        )
+
+    @staticmethod
+    def _search_request(
+        query: str,
+        sort: str = "relevance",
+        t: str = "all",
+        restrict_sr: bool = False,
+        subreddit: Optional[str] = None,
+        include_over_18: Optional[bool] = None,
+        limit: int = 100,
+    ) -> Tuple[str, Dict]:
+        """
+        Construye (path, params) de una búsqueda. Compartido con el cliente async.
+        """
         params = {
             "q": query,
             "sort": sort,              # 'relevance' | 'new' | 'top' | 'comments'
             "t": t,                    # 'hour'|'day'|'week'|'month'|'year'|'all'
             "type": "link",            # Solo posts (no comentarios)
             "raw_json": 1,
-            "limit": min(kwargs.get("limit", 100), 100),
+            "limit": min(limit, 100),
         }
 
         if include_over_18 is not None:
@@ -180,23 +290,50 @@ class RedditClient:
         if restrict_sr and subreddit:
             params["restrict_sr"] = 1
             path = f"/r/{subreddit}/search"
+        return path, params
 
-        # Filtra kwargs de listing para evitar pasar 'limit' duplicado
-        listing_kwargs = {k: v for k, v in kwargs.items() if k not in ("limit",)}
-        return self.listing(path, extra_params=params, **listing_kwargs)
+    # ---------------------- Comentarios ----------------------
+
+    def comment_tree(
+        self,
+        post_id: str,
+        sort: str = "new",
+        limit: int = COMMENTS_LIMIT,
+        depth: Optional[int] = None,
+        max_comments: Optional[int] = None,
+    ) -> Iterable[Dict]:
+        """
+        Todos los comentarios de un post, planos (dicts de t1 con link_id,
+        parent_id y depth), expandiendo los stubs "more" en lotes de 100 ids.
+        """
+        walk = CommentTreeWalk(post_id, sort=sort, limit=limit, depth=depth, max_comments=max_comments)
+        req = walk.initial_request()
+        while req is not None:
+            path, params = req
+            yield from walk.feed(path, self._request("GET", path, params=params))
+            req = walk.next_request()
+
+    def comments(self, post_ids: Iterable[str], **kwargs) -> Iterable[Dict]:
+        """
+        Comentarios de muchos posts, uno detrás de otro (generador: memoria acotada).
+        Para pedir varios posts a la vez, AsyncRedditClient.crawl_comments().
+        """
+        for pid in post_ids:
+            yield from self.comment_tree(pid, **kwargs)
 
     # ---------------------- Capa DataFrame ----------------------
 
-    def _collect(self, it: Iterable[Dict]) -> pd.DataFrame:
+    def _collect(self, it: Iterable[Dict]) -> "pd.DataFrame":
         """
         Normaliza una lista de posts (dicts) a DataFrame optimizado.
         """
+        from src.transform.normalizers import normalize_posts
         return normalize_posts(list(it))
 
-    def subreddit_new_df(self, subreddit: str, **kwargs) -> pd.DataFrame:
+    def subreddit_new_df(self, subreddit: str, **kwargs) -> "pd.DataFrame":
         return self._collect(self.subreddit_new(subreddit, **kwargs))
 
-    def subreddit_top_df(self, subreddit: str, t: str = "day", **kwargs) -> pd.DataFrame:
+    def subreddit_top_df(self, subreddit: str, t: str = "day", **kwargs) -> "pd.DataFrame":
         return self._collect(self.subreddit_top(subreddit, t=t, **kwargs))
 
     def search_df(
@@ -206,7 +343,7 @@ class RedditClient:
         restrict_sr: bool = False,
         subreddit: Optional[str] = None,
         **kwargs,
-    ) -> pd.DataFrame:
+    ) -> "pd.DataFrame":
         """
         Capa conveniente que retorna un DataFrame ya normalizado.
         """
@@ -219,3 +356,7 @@ class RedditClient:
                 **kwargs,
             )
         )
+
+    def comments_df(self, post_ids: Iterable[str], **kwargs) -> "pd.DataFrame":
+        from src.transform.normalizers import normalize_comments
+        return normalize_comments(list(self.comments(post_ids, **kwargs)))
@@ -0,0 +1,415 @@
+# src/clients/reddit_async.py
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Optional, Dict, List, Tuple, AsyncIterator, Iterable
+
+import httpx
+
+from src import metrics
+from .reddit import RedditClient
+from src.storage.checkpoints import CheckpointStore, Watermark
+from .rate_limit import RateLimiter
+from .http_cache import ResponseCache
+from .comments import CommentTreeWalk, COMMENTS_LIMIT
+
+
+@dataclass(frozen=True)
+class ListingTarget:
+    """
+    Un objetivo de crawl: 'new' | 'top' | 'search' sobre un subreddit y/o query,
+    o 'comments' (árbol de comentarios de un post).
+    `kwargs` admite los mismos parámetros que los métodos crudos del cliente
+    (limit, max_items, t, sort, restrict_sr...), como tupla de pares para ser hashable.
+    """
+    kind: str
+    subreddit: Optional[str] = None
+    query: Optional[str] = None
+    kwargs: Tuple[Tuple[str, object], ...] = field(default_factory=tuple)
+    post_id: Optional[str] = None
+
+    @classmethod
+    def new(cls, subreddit: str, **kwargs) -> "ListingTarget":
+        return cls("new", subreddit=subreddit, kwargs=tuple(sorted(kwargs.items())))
+
+    @classmethod
+    def top(cls, subreddit: str, t: str = "day", **kwargs) -> "ListingTarget":
+        kwargs["t"] = t
+        return cls("top", subreddit=subreddit, kwargs=tuple(sorted(kwargs.items())))
+
+    @classmethod
+    def search(cls, query: str, subreddit: Optional[str] = None, **kwargs) -> "ListingTarget":
+        return cls("search", subreddit=subreddit, query=query, kwargs=tuple(sorted(kwargs.items())))
+
+    @classmethod
+    def comments(cls, post_id: str, **kwargs) -> "ListingTarget":
+        return cls("comments", post_id=post_id, kwargs=tuple(sorted(kwargs.items())))
+
+
+class AsyncRedditClient:
+    """
+    Variante asyncio (httpx) de RedditClient para crawls de muchos subreddits/queries.
+
+    - Un único token compartido por todas las tareas (renovación protegida con lock).
+    - Límite global de peticiones en vuelo (`max_concurrency`), no por listing:
+      las páginas de distintos objetivos se intercalan.
+    - Devuelve exactamente los mismos dicts de post que RedditClient.
+    - Ritmo global con RateLimiter (puede compartirse con clientes síncronos).
+    - Crawl incremental con CheckpointStore y caché HTTP, igual que RedditClient.
+
+    Uso:
+        async with AsyncRedditClient(cid, secret, "user") as rc:
+            async for target, post in rc.crawl([ListingTarget.new("python"), ...]):
+                ...
+    """
+
+    AUTH_URL = RedditClient.AUTH_URL
+    API_BASE = RedditClient.API_BASE
+
+    def __init__(
+        self,
+        client_id: str,
+        client_secret: str,
+        username: str,
+        user_agent_prefix: str = "TFM-analytics/1.0",
+        timeout: int = 20,
+        max_retries: int = 3,
+        max_concurrency: int = 16,
+        rate_limiter: Optional[RateLimiter] = None,
+        checkpoints: Optional[CheckpointStore] = None,
+        cache: Optional[ResponseCache] = None,
+        auth_url: Optional[str] = None,
+        api_base: Optional[str] = None,
+    ):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.user_agent = f"{user_agent_prefix} by u/{username}"
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.max_concurrency = max_concurrency
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.checkpoints = checkpoints
+        self.cache = cache
+        self.auth_url = auth_url or self.AUTH_URL
+        self.api_base = (api_base or self.API_BASE).rstrip("/")
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._auth_lock: Optional[asyncio.Lock] = None
+        self._token: Optional[str] = None
+        self._token_expiry_ts: float = 0.0
+
+    # ---------------------- Ciclo de vida ----------------------
+
+    async def __aenter__(self) -> "AsyncRedditClient":
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+    async def open(self) -> None:
+        if self._client is not None:
+            return
+        limits = httpx.Limits(
+            max_connections=self.max_concurrency,
+            max_keepalive_connections=self.max_concurrency,
+        )
+        self._client = httpx.AsyncClient(
+            headers={"User-Agent": self.user_agent},
+            timeout=self.timeout,
+            limits=limits,
+        )
+        # Primitivas asyncio creadas dentro del loop activo
+        self._sem = asyncio.Semaphore(self.max_concurrency)
+        self._auth_lock = asyncio.Lock()
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+        self._client = None
+
+    # ---------------------- Auth ----------------------
+
+    async def _authenticate(self) -> None:
+        with metrics.span("authenticate"):
+            r = await self._client.post(
+                self.auth_url,
+                data={"grant_type": "client_credentials"},
+                auth=(self.client_id, self.client_secret),
+            )
+        metrics.count("auth_total", status=r.status_code)
+        r.raise_for_status()
+        payload = r.json()
+
+        self._token = payload["access_token"]
+        expires_in = int(payload.get("expires_in", 3600))
+        # Renueva algo antes de la expiración real
+        self._token_expiry_ts = time.time() + expires_in * 0.9
+
+    async def _ensure_token(self) -> None:
+        if self._token and time.time() < self._token_expiry_ts:
+            return
+        async with self._auth_lock:
+            # Otra tarea pudo renovarlo mientras esperábamos el lock
+            if not self._token or time.time() >= self._token_expiry_ts:
+                await self._authenticate()
+
+    # ---------------------- Core request ----------------------
+
+    async def _request(self, method: str, path: str, params: Optional[Dict] = None) -> Dict:
+        """
+        Igual que RedditClient._request: el RateLimiter marca el ritmo,
+        los 429 vacían el bucket hasta x-ratelimit-reset y los 5xx
+        se reintentan con backoff exponencial. Usa la ResponseCache si la hay.
+        """
+        if self._client is None:
+            await self.open()
+
+        url = path if path.startswith("http") else f"{self.api_base}/{path.lstrip('/')}"
+
+        cached = None
+        headers = {}
+        if self.cache is not None and method == "GET":
+            cached = self.cache.lookup(url, params)
+            if cached is not None:
+                if cached.fresh:
+                    metrics.count("http_cache_total", result="fresh")
+                    return cached.json()
+                headers = cached.conditional_headers()
+
+        await self._ensure_token()
+        headers["Authorization"] = f"bearer {self._token}"
+
+        for attempt in range(self.max_retries + 1):
+            # Espera de ritmo fuera del semáforo: no ocupa huecos de concurrencia
+            await self.rate_limiter.acquire_async()
+            try:
+                async with self._sem:
+                    with metrics.span("http_request", method=method):
+                        r = await self._client.request(method, url, params=params, headers=headers)
+            finally:
+                self.rate_limiter.release()
+            metrics.count("http_responses_total", method=method, status=r.status_code)
+
+            if r.status_code == 429:
+                self.rate_limiter.on_rate_limited(r.headers)
+                continue
+            self.rate_limiter.update_from_headers(r.headers)
+            if r.status_code >= 500 and attempt < self.max_retries:
+                await asyncio.sleep(0.8 * (2 ** attempt))
+                continue
+            break
+
+        metrics.count("http_bytes_total", len(r.content), method=method)
+        if r.status_code == 304 and cached is not None:
+            metrics.count("http_cache_total", result="revalidated")
+            self.cache.refresh(cached, url, params, r.headers)
+            return cached.json()
+
+        r.raise_for_status()
+        try:
+            payload = r.json()
+        except ValueError as e:
+            raise RuntimeError(f"Respuesta no JSON desde {url}") from e
+        if self.cache is not None and method == "GET":
+            self.cache.store(url, params, r.content, r.headers)
+        return payload
+
+    # ---------------------- Listings helpers ----------------------
+
+    async def listing(
+        self,
+        path: str,
+        limit: int = 100,
+        max_items: int = 1000,
+        extra_params: Optional[Dict] = None,
+        checkpoint_key: Optional[str] = None,
+    ) -> AsyncIterator[Dict]:
+        """
+        Itera sobre un listing (children) usando paginación via 'after'.
+        Misma semántica de checkpoint_key que RedditClient.listing.
+        """
+        params = {"limit": min(limit, 100)}
+        if extra_params:
+            params.update(extra_params)
+
+        tracking = checkpoint_key is not None and self.checkpoints is not None
+        since = self.checkpoints.get(checkpoint_key) if tracking else None
+        newest: Optional[Watermark] = None
+        complete = False
+
+        fetched = 0
+        after = None
+
+        try:
+            while True:
+                if after:
+                    params["after"] = after
+
+                payload = await self._request("GET", path, params=dict(params))
+                data = payload.get("data", {})
+                children = data.get("children", [])
+                for ch in children:
+                    post = ch.get("data", {})
+                    if since is not None and since.reached(post):
+                        complete = True
+                        return
+                    if tracking and not post.get("stickied"):
+                        mark = Watermark.from_post(post)
+                        if mark is not None and mark.newer_than(newest):
+                            newest = mark
+                    yield post
+                    fetched += 1
+                    if fetched >= max_items:
+                        # Corte por max_items: entre este post y el watermark
+                        # viejo quedan posts sin leer, así que no cuenta como completo
+                        return
+
+                after = data.get("after")
+                if not after or not children:
+                    complete = True
+                    return
+        finally:
+            if tracking and complete and newest is not None:
+                self.checkpoints.stage(checkpoint_key, newest)
+
+    # ---------------------- Métodos crudos ----------------------
+
+    def subreddit_new(self, subreddit: str, **kwargs) -> AsyncIterator[Dict]:
+        key = CheckpointStore.key("new", subreddit=subreddit, sort="new")
+        return self.listing(f"/r/{subreddit}/new", checkpoint_key=key, **kwargs)
+
+    def subreddit_top(self, subreddit: str, t: str = "day", **kwargs) -> AsyncIterator[Dict]:
+        params = {"t": t}
+        return self.listing(f"/r/{subreddit}/top", extra_params=params, **kwargs)
+
+    def search(
+        self,
+        query: str,
+        sort: str = "relevance",
+        t: str = "all",
+        restrict_sr: bool = False,
+        subreddit: Optional[str] = None,
+        include_over_18: Optional[bool] = None,
+        **kwargs,
+    ) -> AsyncIterator[Dict]:
+        path, params = RedditClient._search_request(
+            query, sort=sort, t=t, restrict_sr=restrict_sr, subreddit=subreddit,
+            include_over_18=include_over_18, limit=kwargs.get("limit", 100),
+        )
+        listing_kwargs = {k: v for k, v in kwargs.items() if k not in ("limit",)}
+        if sort == "new":
+            listing_kwargs.setdefault("checkpoint_key", RedditClient._search_checkpoint_key(
+                query, sort=sort, t=t, restrict_sr=restrict_sr, subreddit=subreddit,
+            ))
+        return self.listing(path, extra_params=params, **listing_kwargs)
+
+    async def comment_tree(
+        self,
+        post_id: str,
+        sort: str = "new",
+        limit: int = COMMENTS_LIMIT,
+        depth: Optional[int] = None,
+        max_comments: Optional[int] = None,
+    ) -> AsyncIterator[Dict]:
+        """
+        Igual que RedditClient.comment_tree. Las llamadas de un mismo post van en
+        serie; crawl_comments() reparte la concurrencia entre posts.
+        """
+        walk = CommentTreeWalk(post_id, sort=sort, limit=limit, depth=depth, max_comments=max_comments)
+        req = walk.initial_request()
+        while req is not None:
+            path, params = req
+            for comment in walk.feed(path, await self._request("GET", path, params=params)):
+                yield comment
+            req = walk.next_request()
+
+    async def crawl_comments(
+        self,
+        post_ids: Iterable[str],
+        queue_size: int = 1000,
+        **kwargs,
+    ) -> AsyncIterator[Dict]:
+        """
+        Comentarios de muchos posts a la vez (hasta max_concurrency peticiones
+        en vuelo), emitidos según llegan; la cola acota la memoria.
+        """
+        targets = [ListingTarget.comments(pid, **kwargs) for pid in post_ids]
+        async for _, comment in self.crawl(targets, queue_size=queue_size):
+            yield comment
+
+    def _iter_target(self, target: ListingTarget) -> AsyncIterator[Dict]:
+        kwargs = dict(target.kwargs)
+        if target.kind == "new":
+            return self.subreddit_new(target.subreddit, **kwargs)
+        if target.kind == "top":
+            return self.subreddit_top(target.subreddit, **kwargs)
+        if target.kind == "search":
+            return self.search(target.query, subreddit=target.subreddit, **kwargs)
+        if target.kind == "comments":
+            return self.comment_tree(target.post_id, **kwargs)
+        raise ValueError(f"Tipo de objetivo no soportado: {target.kind!r}")
+
+    # ---------------------- Fan-out ----------------------
+
+    async def crawl(
+        self,
+        targets: Iterable[ListingTarget],
+        queue_size: int = 1000,
+    ) -> AsyncIterator[Tuple[ListingTarget, Dict]]:
+        """
+        Lanza todos los objetivos a la vez y emite (target, post) según llegan.
+        La concurrencia real la limita `max_concurrency`; `queue_size` acota
+        la memoria si el consumidor es más lento que la red.
+        Un error en un objetivo se propaga en cuanto llega y cancela el resto.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        done = object()
+
+        async def run(target: ListingTarget) -> None:
+            try:
+                async for post in self._iter_target(target):
+                    await queue.put((target, post))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await queue.put((target, e))
+                return
+            await queue.put((target, done))
+
+        tasks = [asyncio.create_task(run(t)) for t in targets]
+        pending = len(tasks)
+        try:
+            while pending:
+                target, item = await queue.get()
+                if item is done:
+                    pending -= 1
+                    continue
+                if isinstance(item, Exception):
+                    raise item
+                yield target, item
+        finally:
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def crawl_all(self, targets: Iterable[ListingTarget]) -> Dict[ListingTarget, List[Dict]]:
+        """
+        Igual que crawl() pero agrupa los posts por objetivo.
+        """
+        targets = list(targets)
+        out: Dict[ListingTarget, List[Dict]] = {t: [] for t in targets}
+        async for target, post in self.crawl(targets):
+            out[target].append(post)
+        return out
+
+
+def crawl_sync(client: AsyncRedditClient, targets: Iterable[ListingTarget]) -> Dict[ListingTarget, List[Dict]]:
+    """
+    Atajo para scripts síncronos: ejecuta crawl_all en un loop nuevo.
+    """
+    async def _run():
+        async with client:
+            return await client.crawl_all(targets)
+    return asyncio.run(_run())
@@ -1,14 +1,150 @@
-from nltk.corpus import wordnet as wn
-import nltk
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
 
-# Solo la primera vez
-nltk.download('wordnet')
-nltk.download('omw-1.4')
+from src._sqlite import open_sqlite
 
-def generate_synonyms(word: str, max_out: int = 15) -> list[str]:
-    """Devuelve sinónimos básicos en inglés usando WordNet."""
-    synonyms = set()
-    for syn in wn.synsets(word):
+# WordNet se carga la primera vez que se usa, nunca al importar. Si el corpus no
+# está instalado NO se descarga en silencio (sin red en arranque ni en workers):
+# se lanza LookupError con la instrucción, salvo que se pida con
+# ensure_wordnet(download=True) o TFM_NLTK_DOWNLOAD=1.
+_wn = None
+_wn_lock = threading.Lock()
+WORDNET_CORPORA = ("wordnet", "omw-1.4")
+
+
+def ensure_wordnet(download: bool = False):
+    """
+    Comprueba (y opcionalmente descarga) el corpus de WordNet y lo deja cargado.
+    """
+    global _wn
+    with _wn_lock:
+        if _wn is None:
+            import nltk
+            from nltk.corpus import wordnet as wn
+            try:
+                wn.ensure_loaded()
+            except LookupError:
+                if not download:
+                    raise LookupError(
+                        "Falta el corpus WordNet de NLTK. Instálalo con "
+                        "`python -m nltk.downloader wordnet omw-1.4` "
+                        "o llama a ensure_wordnet(download=True)."
+                    ) from None
+                for corpus in WORDNET_CORPORA:
+                    nltk.download(corpus, quiet=True)
+                wn.ensure_loaded()
+            _wn = wn
+    return _wn
+
+
+def _wordnet():
+    if _wn is not None:
+        return _wn
+    return ensure_wordnet(download=os.environ.get("TFM_NLTK_DOWNLOAD") == "1")
+
+
+def rank_synonyms(word: str) -> List[Tuple[str, float]]:
+    """
+    Sinónimos de WordNet con una puntuación determinista:
+    frecuencia del lema en SemCor (lemma.count()) + peso del sentido (los
+    primeros synsets son los más comunes). Empates -> orden alfabético.
+    """
+    wn = _wordnet()
+    base = word.strip().lower()
+    scores: Dict[str, float] = {}
+    synsets = wn.synsets(base.replace(" ", "_"))
+    for rank, syn in enumerate(synsets):
+        sense_weight = 1.0 / (1 + rank)
         for lemma in syn.lemmas():
-            synonyms.add(lemma.name().replace("_", " "))
-    return list(synonyms)[:max_out]
+            name = lemma.name().replace("_", " ").lower()
+            if name == base:
+                continue
+            scores[name] = scores.get(name, 0.0) + sense_weight + lemma.count()
+    return sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))
+
+
+def generate_synonyms(word: str, max_out: int = 15, cache: Optional["SynonymCache"] = None) -> list[str]:
+    """Devuelve sinónimos básicos en inglés usando WordNet (orden estable, de más a menos relevante)."""
+    if cache is not None:
+        hit = cache.get(word, max_out)
+        if hit is not None:
+            return hit
+    out = [name for name, _ in rank_synonyms(word)[:max_out]]
+    if cache is not None:
+        cache.put(word, max_out, out)
+    return out
+
+
+class SynonymCache:
+    """
+    Memo persistente (SQLite) de expansiones: (término, max_out) -> lista.
+    Expulsión LRU por número de entradas (`max_entries`) y caducidad opcional
+    (`ttl` segundos; None = no caduca: WordNet no cambia entre ejecuciones).
+    """
+
+    def __init__(self, path: str, max_entries: int = 50_000, ttl: Optional[float] = None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._con = open_sqlite(path)
+        self._con.execute(
+            """
+            CREATE TABLE IF NOT EXISTS expansions (
+                term TEXT NOT NULL,
+                max_out INTEGER NOT NULL,
+                result TEXT NOT NULL,
+                stored_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (term, max_out)
+            )
+            """
+        )
+        self._con.execute("CREATE INDEX IF NOT EXISTS ix_exp_access ON expansions(last_access)")
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _norm(term: str) -> str:
+        return " ".join(term.lower().split())
+
+    def get(self, term: str, max_out: int) -> Optional[List[str]]:
+        key = self._norm(term)
+        now = time.time()
+        with self._lock:
+            row = self._con.execute(
+                "SELECT result, stored_at FROM expansions WHERE term = ? AND max_out = ?", (key, max_out)
+            ).fetchone()
+            if row is None or (self.ttl is not None and now - row[1] > self.ttl):
+                self.misses += 1
+                return None
+            self._con.execute(
+                "UPDATE expansions SET last_access = ? WHERE term = ? AND max_out = ?", (now, key, max_out)
+            )
+            self.hits += 1
+            return json.loads(row[0])
+
+    def put(self, term: str, max_out: int, result: List[str]) -> None:
+        now = time.time()
+        with self._lock:
+            self._con.execute(
+                "INSERT OR REPLACE INTO expansions VALUES (?, ?, ?, ?, ?)",
+                (self._norm(term), max_out, json.dumps(result), now, now),
+            )
+            n = self._con.execute("SELECT COUNT(*) FROM expansions").fetchone()[0]
+            if n > self.max_entries:
+                self._con.execute(
+                    """
+                    DELETE FROM expansions WHERE rowid IN (
+                        SELECT rowid FROM expansions ORDER BY last_access ASC LIMIT ?
+                    )
+                    """,
+                    (n - self.max_entries,),
+                )
+
+    def close(self) -> None:
+        with self._lock:
+            self._con.close()
@@ -1,13 +1,39 @@
 # src/tfm/logging_cfg.py
+import json
 import logging
 from logging.config import dictConfig
 
-def setup_logging(level: str = "INFO") -> None:
+
+class JsonFormatter(logging.Formatter):
+    """
+    Una línea JSON por registro. Los campos estructurados van en `extra={"fields": {...}}`
+    (así los emite src.metrics) y se añaden al nivel superior.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        out = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if isinstance(fields, dict):
+            out.update(fields)
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        return json.dumps(out, ensure_ascii=False, default=str)
+
+
+def setup_logging(level: str = "INFO", json_logs: bool = False) -> None:
     dictConfig({
         "version": 1,
-        "formatters": {"std": {"format": "%(asctime)s | %(levelname)s | %(name)s | %(message)s"}},
+        "formatters": {
+            "std": {"format": "%(asctime)s | %(levelname)s | %(name)s | %(message)s"},
+            "json": {"()": JsonFormatter},
+        },
         "handlers": {
-            "console": {"class": "logging.StreamHandler", "formatter": "std", "level": level}
+            "console": {"class": "logging.StreamHandler", "formatter": "json" if json_logs else "std", "level": level}
         },
         "root": {"handlers": ["console"], "level": level},
     })
@@ -0,0 +1,347 @@
+# src/metrics.py
+"""
+Instrumentación ligera de los caminos calientes (cliente, transformación, storage).
+
+Desactivada por defecto: span() devuelve un objeto nulo compartido y count() /
+observe() retornan en la primera línea, así que el coste es una llamada y la
+lectura de un global. Al activarla (enable() o TFM_METRICS=1):
+
+  - span(nombre, **labels): cronometra un bloque (with) y acumula un histograma
+    tfm_span_seconds{span=...}; con log_spans, cada span cerrado se emite como
+    log estructurado (logger "tfm.metrics", campos en record.fields; ver
+    logging_cfg.setup_logging(json_logs=True)). Los spans anidados llevan el
+    nombre del padre (contextvars: vale para hilos y tareas asyncio).
+  - timed(nombre, rows=...): lo mismo como decorador, contando filas del resultado.
+  - count(nombre, valor, **labels): contadores (bytes, filas, esperas...).
+  - render_prometheus() / write_prometheus(path) / serve(port): exposición en
+    formato de texto de Prometheus (fichero para node_exporter textfile o endpoint).
+  - profiling(path): cProfile opcional para una ejecución.
+
+Los registros son por proceso: con IngestScheduler, cada proceso escribe su
+propio fichero (p.ej. metrics_{pid}.prom) o expone su propio puerto.
+
+    from src import metrics
+    metrics.enable(prom_path="data/metrics.prom")
+    ... crawl ...
+    metrics.write_prometheus()
+"""
+import bisect
+import contextlib
+import contextvars
+import functools
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger("tfm.metrics")
+
+PREFIX = "tfm_"
+# Cotas de los buckets de duración (segundos), como los de client_python
+BUCKETS: Tuple[float, ...] = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+_enabled = False
+_log_spans = False
+_prom_path: Optional[str] = None
+_lock = threading.Lock()
+_counters: Dict[Tuple[str, LabelKey], float] = {}
+_histograms: Dict[Tuple[str, LabelKey], List[float]] = {}   # [count, sum, max, bucket_0..bucket_n]
+_current: contextvars.ContextVar = contextvars.ContextVar("tfm_span", default=None)
+
+
+def _key(labels: Dict) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+# ---------------------- Activación ----------------------
+
+def enable(log_spans: bool = False, prom_path: Optional[str] = None) -> None:
+    """
+    log_spans: emitir un log por span cerrado (útil con JSON; ruidoso en consola).
+    prom_path: destino por defecto de write_prometheus() ({pid} se sustituye).
+    """
+    global _enabled, _log_spans, _prom_path
+    _enabled = True
+    _log_spans = log_spans
+    _prom_path = prom_path
+
+
+def disable() -> None:
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def configure_from_env() -> None:
+    """
+    TFM_METRICS=1 activa; TFM_METRICS_LOG_SPANS=1 loguea cada span;
+    TFM_METRICS_FILE=ruta.prom fija el destino de write_prometheus().
+    """
+    if os.environ.get("TFM_METRICS", "").lower() in ("1", "true", "yes"):
+        enable(
+            log_spans=os.environ.get("TFM_METRICS_LOG_SPANS", "").lower() in ("1", "true", "yes"),
+            prom_path=os.environ.get("TFM_METRICS_FILE") or None,
+        )
+
+
+# ---------------------- Registro ----------------------
+
+def count(name: str, value: float = 1, **labels) -> None:
+    if not _enabled:
+        return
+    k = (name, _key(labels))
+    with _lock:
+        _counters[k] = _counters.get(k, 0) + value
+
+
+def observe(name: str, seconds: float, **labels) -> None:
+    """
+    Añade una duración al histograma `name` (p.ej. esperas medidas fuera de un span).
+    """
+    if not _enabled:
+        return
+    k = (name, _key(labels))
+    with _lock:
+        h = _histograms.get(k)
+        if h is None:
+            h = _histograms[k] = [0, 0.0, 0.0] + [0] * len(BUCKETS)
+        h[0] += 1
+        h[1] += seconds
+        h[2] = max(h[2], seconds)
+        i = bisect.bisect_left(BUCKETS, seconds)
+        if i < len(BUCKETS):
+            h[3 + i] += 1
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+    def set(self, **fields) -> None:
+        pass
+
+
+_NULL = _NullSpan()
+
+
+class Span:
+    """
+    Bloque cronometrado. set(**fields) añade campos al log del span (filas, bytes...)
+    sin convertirlos en labels de Prometheus.
+    """
+    __slots__ = ("name", "labels", "fields", "_t0", "_token")
+
+    def __init__(self, name: str, labels: Dict):
+        self.name = name
+        self.labels = labels
+        self.fields: Dict = {}
+
+    def __enter__(self) -> "Span":
+        self._token = _current.set(self)
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        elapsed = time.perf_counter() - self._t0
+        _current.reset(self._token)
+        observe("span_seconds", elapsed, span=self.name, **self.labels)
+        if exc_type is not None:
+            count("span_errors_total", span=self.name, error=exc_type.__name__)
+        if _log_spans:
+            parent = _current.get()
+            logger.info(
+                "span %s %.1f ms", self.name, elapsed * 1000,
+                extra={"fields": {
+                    "span": self.name, "duration_ms": round(elapsed * 1000, 3),
+                    "parent": parent.name if parent is not None else None,
+                    "error": exc_type.__name__ if exc_type else None,
+                    **self.labels, **self.fields,
+                }},
+            )
+
+    def set(self, **fields) -> None:
+        self.fields.update(fields)
+
+
+def span(name: str, **labels):
+    """
+    with metrics.span("normalize_posts", engine="python") as sp: ...; sp.set(rows=n)
+    """
+    if not _enabled:
+        return _NULL
+    return Span(name, labels)
+
+
+def timed(name: str, rows: Optional[Callable] = None, **labels) -> Callable:
+    """
+    Decorador: la función entera como span. rows(resultado) -> nº de filas,
+    que se suma a tfm_rows_total{stage=name}. Desactivado, solo añade la llamada.
+    """
+    def deco(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with Span(name, labels) as sp:
+                out = fn(*args, **kwargs)
+                if rows is not None:
+                    n = rows(out)
+                    sp.set(rows=n)
+                    count("rows_total", n, stage=name)
+            return out
+        return wrapper
+    return deco
+
+
+# ---------------------- Exposición ----------------------
+
+def snapshot() -> Dict[str, Dict]:
+    """
+    Copia de los contadores e histogramas: {"counters": {...}, "histograms": {...}}
+    con claves "nombre{a=b,...}".
+    """
+    def fmt(name: str, labels: LabelKey) -> str:
+        return name + ("{" + ",".join(f"{k}={v}" for k, v in labels) + "}" if labels else "")
+
+    with _lock:
+        return {
+            "counters": {fmt(n, l): v for (n, l), v in _counters.items()},
+            "histograms": {fmt(n, l): {"count": h[0], "sum": h[1], "max": h[2]} for (n, l), h in _histograms.items()},
+        }
+
+
+def _labels(labels: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    items = labels + extra
+    if not items:
+        return ""
+    esc = (lambda v: v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in items) + "}"
+
+
+def render_prometheus() -> str:
+    """
+    Formato de texto de Prometheus (0.0.4): contadores como *_total e histogramas
+    con _bucket acumulados, _sum y _count.
+    """
+    with _lock:
+        counters = sorted(_counters.items())
+        hists = sorted((k, list(h)) for k, h in _histograms.items())
+    lines: List[str] = []
+    seen = set()
+    for (name, labels), v in counters:
+        metric = PREFIX + name
+        if metric not in seen:
+            lines.append(f"# TYPE {metric} counter")
+            seen.add(metric)
+        lines.append(f"{metric}{_labels(labels)} {int(v) if float(v).is_integer() else repr(float(v))}")
+    for (name, labels), h in hists:
+        metric = PREFIX + name
+        if metric not in seen:
+            lines.append(f"# TYPE {metric} histogram")
+            seen.add(metric)
+        acc = 0
+        for b, n in zip(BUCKETS, h[3:]):
+            acc += n
+            lines.append(f"{metric}_bucket{_labels(labels, (('le', f'{b:g}'),))} {acc}")
+        lines.append(f"{metric}_bucket{_labels(labels, (('le', '+Inf'),))} {h[0]}")
+        lines.append(f"{metric}_sum{_labels(labels)} {h[1]:.6f}")
+        lines.append(f"{metric}_count{_labels(labels)} {h[0]}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path: Optional[str] = None) -> Optional[str]:
+    """
+    Escribe render_prometheus() de forma atómica (para el textfile collector).
+    """
+    path = path or _prom_path
+    if not path:
+        return None
+    path = path.format(pid=os.getpid())
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(render_prometheus())
+    os.replace(tmp, path)
+    return path
+
+
+def serve(port: int = 9108, host: str = "127.0.0.1"):
+    """
+    Endpoint /metrics en un hilo daemon. Devuelve el servidor (shutdown() para parar).
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args) -> None:  # silencioso
+            pass
+
+        def do_GET(self) -> None:
+            body = render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    httpd = ThreadingHTTPServer((host, port), Handler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+
+def log_summary(level: int = logging.INFO) -> None:
+    """
+    Un log estructurado con todos los contadores y los totales de cada histograma.
+    """
+    snap = snapshot()
+    logger.log(level, "metrics summary", extra={"fields": snap})
+
+
+# ---------------------- Profiling ----------------------
+
+@contextlib.contextmanager
+def profiling(path: Optional[str] = None, top: int = 25) -> Iterator[None]:
+    """
+    cProfile sobre el bloque. Con path vuelca el .prof (snakeviz, pstats);
+    en todo caso loguea las `top` funciones por tiempo acumulado.
+    TFM_PROFILE=ruta.prof lo activa en los puntos de entrada que llaman a
+    profiling_from_env().
+    """
+    import cProfile
+    import io
+    import pstats
+
+    prof = cProfile.Profile()
+    prof.enable()
+    try:
+        yield
+    finally:
+        prof.disable()
+        if path:
+            prof.dump_stats(path.format(pid=os.getpid()))
+        out = io.StringIO()
+        pstats.Stats(prof, stream=out).sort_stats("cumulative").print_stats(top)
+        logger.info("profile\n%s", out.getvalue())
+
+
+def profiling_from_env():
+    """profiling(TFM_PROFILE) si la variable está definida; si no, un contexto nulo."""
+    path = os.environ.get("TFM_PROFILE")
+    return profiling(path) if path else contextlib.nullcontext()
@@ -0,0 +1,21 @@
+# src/pipeline/__init__.py
+# Exportaciones perezosas (PEP 562): el planificador no necesita pyarrow.
+from src._lazy import lazy_exports
+
+_EXPORTS = {
+    "batched": ".streaming",
+    "iter_async": ".streaming",
+    "iter_post_tables": ".streaming",
+    "stream_posts_to_parquet": ".streaming",
+    "iter_comment_tables": ".streaming",
+    "stream_comments_to_parquet": ".streaming",
+    "QueryPlanner": ".query_planner",
+    "PlannerStats": ".query_planner",
+    "pack_or_queries": ".query_planner",
+    "Job": ".jobs",
+    "JobQueue": ".jobs",
+    "IngestScheduler": ".scheduler",
+    "RunReport": ".scheduler",
+}
+
+__all__, __getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
@@ -0,0 +1,229 @@
+# src/pipeline/jobs.py
+"""
+Cola de trabajos persistente (SQLite, WAL) para la ingesta multiproceso.
+
+Cada trabajo es una descarga (kind + target + params):
+  - 'new'      -> subreddit_new(target)
+  - 'top'      -> subreddit_top(target, t=...)
+  - 'search'   -> search(target, ...)
+  - 'comments' -> comment_tree(target)
+
+Ciclo de vida: pending -> leased -> done | (pending con backoff) -> failed.
+Un proceso *alquila* un trabajo durante `lease_seconds` con un token propio;
+si muere, el alquiler caduca y otro proceso lo recoge (reanudación tras un
+fallo sin coordinador). Solo quien tiene el token vigente puede completarlo
+o marcarlo como fallido. enqueue() es idempotente: (kind, target, params)
+identifica el trabajo y volver a encolarlo reactiva uno terminado.
+"""
+import json
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from src._sqlite import open_sqlite
+
+PENDING, LEASED, DONE, FAILED = "pending", "leased", "done", "failed"
+
+
+@dataclass
+class Job:
+    id: int
+    kind: str
+    target: str
+    params: Dict
+    attempts: int
+    token: str
+
+    @property
+    def dataset(self) -> str:
+        return "comments" if self.kind == "comments" else "posts"
+
+    @property
+    def label(self) -> str:
+        return f"{self.kind}:{self.target}"
+
+
+class JobQueue:
+    """
+    Seguro entre procesos (cada uno abre su propia JobQueue sobre el mismo
+    fichero) y entre hilos (lock interno). Los alquileres usan BEGIN IMMEDIATE,
+    así dos procesos nunca se llevan el mismo trabajo.
+    """
+
+    def __init__(self, path: str, max_attempts: int = 5, backoff: float = 5.0, busy_timeout: float = 30.0):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self._lock = threading.Lock()
+        self._con = open_sqlite(path, busy_timeout=busy_timeout, synchronous="NORMAL")
+        self._con.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY,
+                kind TEXT NOT NULL,
+                target TEXT NOT NULL,
+                params TEXT NOT NULL,
+                priority INTEGER NOT NULL DEFAULT 0,
+                state TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                token TEXT,
+                lease_until REAL,
+                not_before REAL NOT NULL DEFAULT 0,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                UNIQUE (kind, target, params)
+            )
+            """
+        )
+        self._con.execute("CREATE INDEX IF NOT EXISTS ix_jobs_ready ON jobs(state, not_before, priority)")
+
+    # ---------------------- Encolado ----------------------
+
+    def enqueue(self, kind: str, target: str, params: Optional[Dict] = None, priority: int = 0) -> int:
+        """
+        Añade (o reactiva) un trabajo. Devuelve su id. Un trabajo ya pendiente o
+        alquilado no se toca: un reintento en backoff conserva attempts y
+        not_before, así que volver a encolarlo no se salta max_attempts. Solo uno
+        terminado o fallido vuelve a 'pending' con los intentos a cero.
+        """
+        now = time.time()
+        p = json.dumps(params or {}, sort_keys=True)
+        with self._lock:
+            self._con.execute(
+                """
+                INSERT INTO jobs (kind, target, params, priority, state, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (kind, target, params) DO UPDATE SET
+                    state = ?, attempts = 0, last_error = NULL, not_before = 0,
+                    priority = excluded.priority, updated_at = excluded.updated_at
+                -- el WHERE del upsert filtra la fila existente: pending/leased no se resetean
+                WHERE jobs.state IN (?, ?)
+                """,
+                (kind, target, p, priority, PENDING, now, now, PENDING, DONE, FAILED),
+            )
+            return self._con.execute(
+                "SELECT id FROM jobs WHERE kind = ? AND target = ? AND params = ?", (kind, target, p)
+            ).fetchone()[0]
+
+    # ---------------------- Alquiler ----------------------
+
+    def lease(self, lease_seconds: float = 300.0) -> Optional[Job]:
+        """
+        Alquila el trabajo listo de mayor prioridad (pendiente, o alquilado con el
+        alquiler caducado). None si no hay ninguno listo ahora mismo.
+        """
+        now = time.time()
+        token = uuid.uuid4().hex
+        with self._lock:
+            self._con.execute("BEGIN IMMEDIATE")
+            try:
+                # Alquileres caducados sin intentos restantes: el proceso murió demasiadas veces
+                self._con.execute(
+                    "UPDATE jobs SET state = ?, token = NULL, last_error = COALESCE(last_error, ?), "
+                    "updated_at = ? WHERE state = ? AND lease_until < ? AND attempts >= ?",
+                    (FAILED, "lease expired", now, LEASED, now, self.max_attempts),
+                )
+                row = self._con.execute(
+                    """
+                    SELECT id, kind, target, params, attempts FROM jobs
+                    WHERE (state = ? AND not_before <= ?) OR (state = ? AND lease_until < ?)
+                    ORDER BY priority DESC, id
+                    LIMIT 1
+                    """,
+                    (PENDING, now, LEASED, now),
+                ).fetchone()
+                if row is None:
+                    self._con.execute("COMMIT")
+                    return None
+                self._con.execute(
+                    """
+                    UPDATE jobs SET state = ?, token = ?, lease_until = ?,
+                        attempts = attempts + 1, updated_at = ?
+                    WHERE id = ?
+                    """,
+                    (LEASED, token, now + lease_seconds, now, row[0]),
+                )
+                self._con.execute("COMMIT")
+            except BaseException:
+                self._con.execute("ROLLBACK")
+                raise
+        return Job(row[0], row[1], row[2], json.loads(row[3]), row[4] + 1, token)
+
+    def heartbeat(self, job_id: int, token: str, lease_seconds: float = 300.0) -> bool:
+        """
+        Prolonga el alquiler. False si ya no es nuestro (caducó y otro lo tomó).
+        """
+        now = time.time()
+        return self._update(
+            "UPDATE jobs SET lease_until = ?, updated_at = ? WHERE id = ? AND token = ? AND state = ?",
+            (now + lease_seconds, now, job_id, token, LEASED),
+        )
+
+    def complete(self, job_id: int, token: str) -> bool:
+        return self._update(
+            "UPDATE jobs SET state = ?, token = NULL, lease_until = NULL, updated_at = ? "
+            "WHERE id = ? AND token = ? AND state = ?",
+            (DONE, time.time(), job_id, token, LEASED),
+        )
+
+    def fail(self, job_id: int, token: str, error: str) -> bool:
+        """
+        Devuelve el trabajo a 'pending' con backoff exponencial, o lo marca
+        'failed' si agotó max_attempts.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._con.execute(
+                "SELECT attempts FROM jobs WHERE id = ? AND token = ? AND state = ?", (job_id, token, LEASED)
+            ).fetchone()
+            if row is None:
+                return False
+            attempts = row[0]
+            state = FAILED if attempts >= self.max_attempts else PENDING
+            delay = self.backoff * 2 ** (attempts - 1)
+            cur = self._con.execute(
+                """
+                UPDATE jobs SET state = ?, token = NULL, lease_until = NULL, not_before = ?,
+                    last_error = ?, updated_at = ?
+                WHERE id = ? AND token = ?
+                """,
+                (state, now + delay, error[:2000], now, job_id, token),
+            )
+            return cur.rowcount > 0
+
+    def _update(self, sql: str, args) -> bool:
+        with self._lock:
+            return self._con.execute(sql, args).rowcount > 0
+
+    # ---------------------- Estado ----------------------
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._con.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        out = {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        out.update(dict(rows))
+        return out
+
+    def unfinished(self) -> int:
+        c = self.counts()
+        return c[PENDING] + c[LEASED]
+
+    def failed(self) -> List[Dict]:
+        with self._lock:
+            rows = self._con.execute(
+                "SELECT id, kind, target, attempts, last_error FROM jobs WHERE state = ? ORDER BY id", (FAILED,)
+            ).fetchall()
+        return [dict(zip(("id", "kind", "target", "attempts", "last_error"), r)) for r in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._con.close()
+
+    def __enter__(self) -> "JobQueue":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
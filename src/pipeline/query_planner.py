@@ -0,0 +1,171 @@
+# src/pipeline/query_planner.py
+"""
+Planificador de búsquedas para un concepto: en lugar de una search() por
+sinónimo (con resultados muy solapados),
+
+  1) expande el concepto con un orden determinista (generate_synonyms + memo
+     persistente opcional, ver SynonymCache),
+  2) agrupa las variantes en consultas OR que caben en el límite de Reddit
+     (512 caracteres), de la más a la menos relevante,
+  3) pagina cada consulta mientras aporte ids nuevos: si una página trae sobre
+     todo ids ya vistos (>= overlap_stop), deja de paginarla,
+  4) si varias consultas seguidas se cortan ya en su primera página, el
+     concepto está saturado y no se lanzan las restantes.
+
+    planner = QueryPlanner(rc, expand=lambda w, n: generate_synonyms(w, n, cache=SynonymCache(path)))
+    for post in planner.run("running shoes", sort="new", max_items=1000):
+        ...
+    print(planner.stats.summary())
+"""
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+from src.clients.synonim_gen import generate_synonyms
+
+MAX_QUERY_CHARS = 512
+OR_SEPARATOR = " OR "
+
+
+def quote_term(term: str) -> str:
+    """
+    Variante como término de búsqueda: frase entre comillas si tiene espacios.
+    """
+    term = " ".join(term.replace('"', " ").split())
+    return f'"{term}"' if " " in term else term
+
+
+def pack_or_queries(
+    terms: Iterable[str],
+    max_chars: int = MAX_QUERY_CHARS,
+    max_terms: Optional[int] = None,
+) -> List[str]:
+    """
+    Agrupa términos (ya en orden de relevancia) en consultas "a OR b OR ..."
+    de como mucho `max_chars` y `max_terms` términos. Un término que no cabe
+    solo se descarta.
+    """
+    queries: List[str] = []
+    current: List[str] = []
+    length = 0
+    for t in terms:
+        q = quote_term(t)
+        if not q or len(q) > max_chars:
+            continue
+        extra = len(q) + (len(OR_SEPARATOR) if current else 0)
+        full = max_terms is not None and len(current) >= max_terms
+        if current and (full or length + extra > max_chars):
+            queries.append(OR_SEPARATOR.join(current))
+            current, length = [], 0
+            extra = len(q)
+        current.append(q)
+        length += extra
+    if current:
+        queries.append(OR_SEPARATOR.join(current))
+    return queries
+
+
+@dataclass
+class PlannerStats:
+    variants: int = 0
+    queries_planned: int = 0
+    queries_run: int = 0
+    queries_skipped: int = 0
+    pages: int = 0
+    posts_seen: int = 0
+    posts_new: int = 0
+    cut_by_overlap: int = 0
+
+    def summary(self) -> str:
+        return (
+            f"{self.variants} variantes -> {self.queries_planned} consultas OR "
+            f"({self.queries_run} lanzadas, {self.queries_skipped} omitidas por saturación); "
+            f"{self.pages} páginas, {self.posts_new}/{self.posts_seen} posts nuevos, "
+            f"{self.cut_by_overlap} consultas cortadas por solape"
+        )
+
+
+@dataclass
+class QueryPlanner:
+    client: object                       # RedditClient (o cualquier objeto con .search())
+    expand: Callable[[str, int], List[str]] = generate_synonyms
+    max_variants: int = 15
+    max_query_chars: int = MAX_QUERY_CHARS
+    # Reddit corta cada búsqueda en ~1000 resultados: grupos OR pequeños no pierden cobertura
+    terms_per_query: Optional[int] = 4
+    overlap_stop: float = 0.8            # fracción de ids ya vistos en una página para cortar
+    saturation: int = 2                  # consultas seguidas cortadas en la 1ª página -> fin
+    page_size: int = 100
+    stats: PlannerStats = field(default_factory=PlannerStats, init=False)
+
+    def variants(self, concept: str) -> List[str]:
+        """
+        [concepto] + expansiones, sin repetidos (sin distinguir mayúsculas), en orden estable.
+        """
+        out, seen = [], set()
+        for v in [concept] + list(self.expand(concept, self.max_variants)):
+            key = " ".join(v.lower().split())
+            if key and key not in seen:
+                seen.add(key)
+                out.append(v)
+        return out
+
+    def plan(self, concept: str, variants: Optional[List[str]] = None) -> List[str]:
+        """
+        Consultas OR del concepto; `variants` evita volver a expandirlo si ya se tiene.
+        """
+        if variants is None:
+            variants = self.variants(concept)
+        return pack_or_queries(variants, self.max_query_chars, self.terms_per_query)
+
+    def run(
+        self,
+        concept: str,
+        seen: Optional[Set[str]] = None,
+        **search_kwargs,
+    ) -> Iterator[Dict]:
+        """
+        Lanza el plan y emite solo posts no vistos (`seen` puede compartirse entre
+        conceptos o venir precargado con ids ya ingeridos). search_kwargs va a
+        client.search (sort, t, subreddit, max_items...).
+        """
+        seen = set() if seen is None else seen
+        search_kwargs.setdefault("limit", self.page_size)
+        page_size = min(search_kwargs["limit"], 100)
+        variants = self.variants(concept)
+        queries = self.plan(concept, variants)
+        self.stats = stats = PlannerStats(variants=len(variants), queries_planned=len(queries))
+
+        first_page_cuts = 0
+        for k, q in enumerate(queries):
+            if first_page_cuts >= self.saturation:
+                stats.queries_skipped = len(queries) - k
+                break
+            stats.queries_run += 1
+            pages, in_page, new_in_page, cut = 0, 0, 0, False
+            it = iter(self.client.search(q, **search_kwargs))
+            try:
+                for post in it:
+                    in_page += 1
+                    stats.posts_seen += 1
+                    pid = post.get("id")
+                    if pid and pid not in seen:
+                        seen.add(pid)
+                        new_in_page += 1
+                        stats.posts_new += 1
+                        yield post
+                    if in_page == page_size:
+                        pages += 1
+                        if 1 - new_in_page / page_size >= self.overlap_stop:
+                            cut = True
+                            break
+                        in_page, new_in_page = 0, 0
+            finally:
+                # Cerrar el generador: un listing abandonado no avanza checkpoints
+                close = getattr(it, "close", None)
+                if close is not None:
+                    close()
+            pages += 1 if in_page and not cut else 0
+            stats.pages += max(pages, 1)
+            if cut:
+                stats.cut_by_overlap += 1
+            first_page_cuts = first_page_cuts + 1 if cut and pages == 1 else 0
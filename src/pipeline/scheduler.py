@@ -0,0 +1,377 @@
+# src/pipeline/scheduler.py
+"""
+Planificador de ingesta multiproceso sobre una JobQueue persistente.
+
+    objetivos (Settings.reddit_subreddits + consultas)
+        -> JobQueue (SQLite)
+        -> N procesos de red: alquilan un trabajo, descargan y envían lotes de
+           dicts crudos (un único presupuesto de cuota: SharedRateLimiter)
+        -> M procesos de escritura: normalizan a Arrow y escriben Parquet; un
+           trabajo se marca 'done' solo cuando todas sus filas están en disco.
+
+La red y la CPU (normalizar + comprimir ZSTD) se solapan en núcleos distintos.
+Los lotes de un trabajo van siempre al mismo escritor (job.id % M), así el fin
+de trabajo llega detrás de sus lotes. Si un proceso muere, sus alquileres
+caducan y la siguiente ejecución (o un proceso vivo) los retoma; los reintentos
+pueden reescribir filas ya guardadas, que la deduplicación por id (vistas
+latest_only / compactación) absorbe.
+
+Los procesos de red no usan CheckpointStore (un JSON por proceso perdería
+actualizaciones entre procesos): cada trabajo descarga hasta max_items.
+
+    sched = IngestScheduler.from_settings("data/jobs.sqlite", "data/curated/reddit")
+    sched.plan(get_settings().reddit_subreddits, queries=["running shoes"], kinds=("new", "top"))
+    print(sched.run().summary())
+"""
+import argparse
+import os
+import queue
+import time
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from src import metrics
+from src.clients.rate_limit import SharedRateLimiter
+from .jobs import Job, JobQueue
+from .streaming import batched
+
+DEFAULT_KINDS = ("new",)
+
+
+def job_items(client, job: Job) -> Iterator[Dict]:
+    """
+    Ejecuta un trabajo con un RedditClient y emite los dicts crudos.
+    """
+    p = dict(job.params)
+    if job.kind == "new":
+        return client.subreddit_new(job.target, **p)
+    if job.kind == "top":
+        return client.subreddit_top(job.target, **p)
+    if job.kind == "search":
+        return client.search(job.target, **p)
+    if job.kind == "comments":
+        return client.comment_tree(job.target, **p)
+    raise ValueError(f"Tipo de trabajo desconocido: {job.kind}")
+
+
+# ---------------------- Procesos ----------------------
+
+def _instrumented(target: Callable, *args) -> None:
+    """
+    Envoltorio de cada proceso: métricas y profiling según el entorno
+    (TFM_METRICS*, TFM_PROFILE), un fichero por pid si la ruta lleva {pid}.
+    """
+    if not metrics.is_enabled():
+        metrics.configure_from_env()
+    try:
+        with metrics.profiling_from_env():
+            target(*args)
+    finally:
+        metrics.write_prometheus()
+
+
+def _fetch_worker(
+    queue_path: str,
+    client_factory: Callable,
+    limiter: SharedRateLimiter,
+    inboxes: Sequence,
+    lease_seconds: float,
+    chunk_size: int,
+    poll: float,
+    max_attempts: int,
+) -> None:
+    jq = JobQueue(queue_path, max_attempts=max_attempts)
+    client = None
+    try:
+        while True:
+            job = jq.lease(lease_seconds)
+            if job is None:
+                if jq.unfinished() == 0:
+                    return
+                time.sleep(poll)
+                continue
+            inbox = inboxes[job.id % len(inboxes)]
+            try:
+                if client is None:
+                    client = client_factory(rate_limiter=limiter)
+                n = 0
+                for chunk in batched(job_items(client, job), chunk_size):
+                    inbox.put(("chunk", job.id, job.token, job.dataset, chunk))
+                    n += len(chunk)
+                    if not jq.heartbeat(job.id, job.token, lease_seconds):
+                        break  # el alquiler caducó y otro proceso lo tiene
+                else:
+                    jq.heartbeat(job.id, job.token, lease_seconds)
+                    inbox.put(("end", job.id, job.token, job.dataset, n))
+            except Exception as e:
+                jq.fail(job.id, job.token, f"{type(e).__name__}: {e}")
+    finally:
+        jq.close()
+
+
+def _normalizer(dataset: str) -> Callable:
+    from src.transform.arrow_normalizers import normalize_comments_table, normalize_posts_table
+    return normalize_comments_table if dataset == "comments" else normalize_posts_table
+
+
+def _write_worker(
+    inbox,
+    queue_path: str,
+    base_dir: str,
+    partition_by: Tuple[str, ...],
+    batch_size: int,
+    flush_seconds: float,
+    max_attempts: int,
+    sketches: bool = False,
+) -> None:
+    from src.storage import ParquetStorage
+
+    jq = JobQueue(queue_path, max_attempts=max_attempts)
+    sketch_store = None
+    if sketches:
+        from src.transform.sketches import SketchStore
+        sketch_store = SketchStore(base_dir, "posts")
+    storages: Dict[str, ParquetStorage] = {}
+    tables: Dict[str, List] = {}
+    rows: Dict[str, int] = {}
+    owners: Dict[str, set] = {}              # trabajos con filas en el búfer
+    ends: Dict[str, List[Tuple[int, str]]] = {}
+    files = 0
+    last_flush = time.monotonic()
+
+    def flush(dataset: str) -> None:
+        nonlocal files
+        pending = tables.pop(dataset, [])
+        rows.pop(dataset, None)
+        jobs = owners.pop(dataset, set())
+        finished = ends.pop(dataset, [])
+        try:
+            if pending:
+                if dataset not in storages:
+                    storages[dataset] = ParquetStorage(base_dir, dataset, partition_by=partition_by)
+                files += 1
+                storages[dataset].save_batches(pending, suffix=f"w{os.getpid()}_{files}")
+                if sketch_store is not None and dataset == "posts":
+                    # Un fichero de sketches por escritor y flush: se fusionan al consultar
+                    for t in pending:
+                        sketch_store.update(t)
+                    sketch_store.flush()
+        except Exception as e:
+            for job_id, token in jobs | set(finished):
+                jq.fail(job_id, token, f"escritura: {type(e).__name__}: {e}")
+            return
+        for job_id, token in finished:
+            jq.complete(job_id, token)
+
+    try:
+        while True:
+            try:
+                msg = inbox.get(timeout=flush_seconds)
+            except queue.Empty:
+                msg = ()
+            if msg is None:
+                break
+            if msg:
+                kind, job_id, token, dataset, payload = msg
+                if kind == "chunk":
+                    t = _normalizer(dataset)(payload)
+                    tables.setdefault(dataset, []).append(t)
+                    rows[dataset] = rows.get(dataset, 0) + t.num_rows
+                    owners.setdefault(dataset, set()).add((job_id, token))
+                else:
+                    ends.setdefault(dataset, []).append((job_id, token))
+            stale = time.monotonic() - last_flush >= flush_seconds
+            for dataset in set(tables) | set(ends):
+                if rows.get(dataset, 0) >= batch_size or stale:
+                    flush(dataset)
+            if stale:
+                last_flush = time.monotonic()
+        for dataset in set(tables) | set(ends):
+            flush(dataset)
+    finally:
+        jq.close()
+
+
+# ---------------------- Planificador ----------------------
+
+@dataclass
+class RunReport:
+    counts: Dict[str, int]
+    failed: List[Dict]
+    elapsed: float
+
+    def summary(self) -> str:
+        c = self.counts
+        return (
+            f"{c['done']} trabajos completados, {c['failed']} fallidos, "
+            f"{c['pending'] + c['leased']} pendientes en {self.elapsed:.1f}s"
+        )
+
+
+@dataclass
+class IngestScheduler:
+    queue_path: str
+    base_dir: str
+    # Se llama como client_factory(rate_limiter=...) en cada proceso de red:
+    # debe poder serializarse (función de módulo o functools.partial)
+    client_factory: Callable
+    fetch_workers: int = 4
+    write_workers: int = 2
+    lease_seconds: float = 300.0
+    chunk_size: int = 500             # dicts por mensaje red -> escritor
+    batch_size: int = 5000            # filas acumuladas antes de escribir un Parquet
+    flush_seconds: float = 5.0
+    queue_size: int = 64              # mensajes en vuelo por escritor (contrapresión)
+    partition_by: Tuple[str, ...] = ()
+    rate_capacity: int = 100
+    rate_period: float = 60.0
+    max_attempts: int = 5
+    sketches: bool = False            # actualizar SketchStore (top-k, distintos) al escribir posts
+    # None = el de la plataforma ('fork' en Linux: arranque casi gratis);
+    # 'spawn'/'forkserver' reimportan en cada proceso (por eso los imports perezosos)
+    start_method: Optional[str] = None
+    poll: float = 0.5
+    jobs: JobQueue = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.jobs = JobQueue(self.queue_path, max_attempts=self.max_attempts)
+
+    @classmethod
+    def from_settings(cls, queue_path: str, base_dir: Optional[str] = None, **kwargs) -> "IngestScheduler":
+        from src.clients import RedditClient
+        from src.settings import get_settings
+
+        s = get_settings()
+        factory = partial(
+            RedditClient,
+            client_id=s.reddit_client_id,
+            client_secret=s.reddit_client_secret,
+            username=s.reddit_username,
+        )
+        base_dir = base_dir or os.path.join(s.data_storage_path, "reddit")
+        return cls(queue_path, base_dir, factory, **kwargs)
+
+    def plan(
+        self,
+        subreddits: Iterable[str] = (),
+        queries: Iterable[str] = (),
+        kinds: Sequence[str] = DEFAULT_KINDS,
+        max_items: int = 1000,
+        t: str = "day",
+        search_params: Optional[Dict] = None,
+    ) -> List[int]:
+        """
+        Encola un trabajo por (subreddit, kind in new/top) y uno por consulta.
+        Idempotente: volver a planificar reactiva los terminados.
+        """
+        ids = []
+        for sub in subreddits:
+            for kind in kinds:
+                if kind == "new":
+                    ids.append(self.jobs.enqueue("new", sub, {"max_items": max_items}))
+                elif kind == "top":
+                    ids.append(self.jobs.enqueue("top", sub, {"t": t, "max_items": max_items}, priority=-1))
+        for q in queries:
+            params = {"sort": "new", "max_items": max_items, **(search_params or {})}
+            ids.append(self.jobs.enqueue("search", q, params))
+        return ids
+
+    def plan_comments(self, post_ids: Iterable[str], **params) -> List[int]:
+        return [self.jobs.enqueue("comments", pid, params, priority=-2) for pid in post_ids]
+
+    def run(self) -> RunReport:
+        """
+        Lanza los procesos y espera a que no queden trabajos pendientes.
+        """
+        import multiprocessing
+
+        t0 = time.perf_counter()
+        ctx = multiprocessing.get_context(self.start_method)
+        limiter = SharedRateLimiter(self.rate_capacity, self.rate_period, ctx=ctx)
+        inboxes = [ctx.Queue(maxsize=self.queue_size) for _ in range(self.write_workers)]
+        writers = [
+            ctx.Process(
+                target=_instrumented,
+                args=(_write_worker, inbox, self.queue_path, self.base_dir, tuple(self.partition_by),
+                      self.batch_size, self.flush_seconds, self.max_attempts, self.sketches),
+                name=f"writer-{i}",
+            )
+            for i, inbox in enumerate(inboxes)
+        ]
+        fetchers = [
+            ctx.Process(
+                target=_instrumented,
+                args=(_fetch_worker, self.queue_path, self.client_factory, limiter, inboxes,
+                      self.lease_seconds, self.chunk_size, self.poll, self.max_attempts),
+                name=f"fetch-{i}",
+            )
+            for i in range(self.fetch_workers)
+        ]
+        for p in writers + fetchers:
+            p.start()
+        try:
+            while any(p.is_alive() for p in fetchers):
+                dead = [p.name for p in writers if p.exitcode not in (None, 0)]
+                if dead:
+                    raise RuntimeError(f"Proceso de escritura caído: {', '.join(dead)}")
+                time.sleep(self.poll)
+        except BaseException:
+            # Corte (Ctrl+C, escritor caído): los alquileres en curso caducarán
+            # y el siguiente run los retoma
+            for p in fetchers + writers:
+                p.terminate()
+            for p in fetchers + writers:
+                p.join()
+            for inbox in inboxes:
+                inbox.cancel_join_thread()  # nadie leerá lo que quede en la tubería
+            raise
+        for p in fetchers:
+            p.join()
+        for inbox in inboxes:
+            inbox.put(None)
+        for p in writers:
+            p.join()
+        return RunReport(self.jobs.counts(), self.jobs.failed(), time.perf_counter() - t0)
+
+    def close(self) -> None:
+        self.jobs.close()
+
+
+def main() -> None:
+    from src.settings import get_settings
+
+    ap = argparse.ArgumentParser(description="Ingesta multiproceso con cola persistente")
+    ap.add_argument("--queue", default=None, help="SQLite de la cola (por defecto en DATA_STORAGE_PATH)")
+    ap.add_argument("--queries", nargs="*", default=[])
+    ap.add_argument("--kinds", nargs="*", default=list(DEFAULT_KINDS), choices=["new", "top"])
+    ap.add_argument("--max-items", type=int, default=None)
+    ap.add_argument("--fetchers", type=int, default=4)
+    ap.add_argument("--writers", type=int, default=2)
+    ap.add_argument("--metrics-dir", default=None, help="un fichero Prometheus (.prom) por proceso")
+    ap.add_argument("--profile-dir", default=None, help="un volcado cProfile (.prof) por proceso")
+    args = ap.parse_args()
+
+    # Por entorno para que también lo vean los procesos hijos (spawn incluido)
+    if args.metrics_dir:
+        os.environ["TFM_METRICS"] = "1"
+        os.environ["TFM_METRICS_FILE"] = os.path.join(args.metrics_dir, "tfm_{pid}.prom")
+    if args.profile_dir:
+        os.makedirs(args.profile_dir, exist_ok=True)
+        os.environ["TFM_PROFILE"] = os.path.join(args.profile_dir, "tfm_{pid}.prof")
+    metrics.configure_from_env()
+
+    s = get_settings()
+    queue_path = args.queue or os.path.join(s.data_storage_path, "jobs.sqlite")
+    sched = IngestScheduler.from_settings(queue_path, fetch_workers=args.fetchers, write_workers=args.writers)
+    sched.plan(s.reddit_subreddits, args.queries, kinds=args.kinds, max_items=args.max_items or s.reddit_limit)
+    report = sched.run()
+    print(report.summary())
+    metrics.write_prometheus()
+    for f in report.failed:
+        print(f"  fallido {f['kind']}:{f['target']} ({f['attempts']} intentos): {f['last_error']}")
+    sched.close()
+
+
+if __name__ == "__main__":
+    main()
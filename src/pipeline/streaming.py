@@ -0,0 +1,157 @@
+# src/pipeline/streaming.py
+import asyncio
+import queue
+import threading
+from itertools import islice
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:  # pyarrow/pandas solo al normalizar: batched/iter_async no los necesitan
+    import pyarrow as pa
+    from src.storage import CheckpointStore, ParquetStorage
+    from src.transform.language import LanguageStage
+    from src.transform.sketches import SketchStore
+
+DEFAULT_BATCH_SIZE = 5000
+
+
+def batched(it: Iterable, size: int) -> Iterator[List]:
+    """
+    Agrupa un iterable en listas de `size` elementos (la última puede ser menor).
+    """
+    if size <= 0:
+        raise ValueError("size debe ser > 0")
+    it = iter(it)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_async(make_aiter: Callable[[], AsyncIterator], maxsize: int = 1000) -> Iterator:
+    """
+    Consume un async iterator (p.ej. AsyncRedditClient.crawl_comments) desde
+    código síncrono como save_batches(): el loop corre en un hilo propio y
+    entrega por una cola acotada, así la memoria es O(maxsize) y la red no
+    se adelanta a la escritura más de eso. Si el consumidor abandona, el hilo
+    deja de producir.
+    """
+    q: queue.Queue = queue.Queue(maxsize=maxsize)
+    done = object()
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    async def pump() -> None:
+        try:
+            async for item in make_aiter():
+                if not put(item):
+                    return
+        except BaseException as e:  # se relanza en el hilo consumidor
+            put(e)
+            return
+        put(done)
+
+    thread = threading.Thread(target=lambda: asyncio.run(pump()), daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = q.get()
+            if item is done:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+
+def iter_post_tables(posts: Iterable[Dict], batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator["pa.Table"]:
+    """
+    Consume un generador de posts (p.ej. RedditClient.listing) por lotes
+    y emite cada lote ya normalizado como pyarrow.Table (schema fijo).
+    """
+    from src.transform.arrow_normalizers import normalize_posts_table
+
+    for chunk in batched(posts, batch_size):
+        yield normalize_posts_table(chunk)
+
+
+def stream_posts_to_parquet(
+    posts: Iterable[Dict],
+    storage: "ParquetStorage",
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    suffix: Optional[str] = None,
+    sketches: Optional["SketchStore"] = None,
+    language: Optional["LanguageStage"] = None,
+    checkpoints: Optional["CheckpointStore"] = None,
+) -> Optional[str]:
+    """
+    fetch -> normalize -> write en streaming: memoria pico O(batch_size)
+    sea cual sea max_items. Devuelve la ruta escrita o None si no hubo posts.
+    Con `sketches`, cada lote actualiza también los sketches (top-k, distintos),
+    que se guardan al terminar. Con `language`, cada lote pasa antes por
+    LanguageStage.process (columnas lang/lang_conf y filtro de idiomas): los
+    sketches y el Parquet solo ven las filas que quedan. Con `checkpoints` (el
+    CheckpointStore del cliente), el watermark del listing se confirma cuando
+    el Parquet ya está escrito.
+
+        path = stream_posts_to_parquet(
+            rc.subreddit_new("sneakers", max_items=100_000), posts_storage,
+            suffix="new_sneakers", checkpoints=rc.checkpoints,
+        )
+    """
+    tables = iter_post_tables(posts, batch_size)
+    if language is not None:
+        tables = map(language.process, tables)
+    if sketches is not None:
+        tables = _tap(tables, sketches.update)
+    path = storage.save_batches(tables, suffix=suffix, checkpoints=checkpoints)
+    if sketches is not None:
+        sketches.flush()
+    return path
+
+
+def _tap(items: Iterable, fn: Callable) -> Iterator:
+    for item in items:
+        fn(item)
+        yield item
+
+
+def iter_comment_tables(comments: Iterable[Dict], batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator["pa.Table"]:
+    """
+    Como iter_post_tables, para comentarios (COMMENTS_ARROW_SCHEMA).
+    """
+    from src.transform.arrow_normalizers import normalize_comments_table
+
+    for chunk in batched(comments, batch_size):
+        yield normalize_comments_table(chunk)
+
+
+def stream_comments_to_parquet(
+    comments: Iterable[Dict],
+    storage: "ParquetStorage",
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    suffix: Optional[str] = None,
+    language: Optional["LanguageStage"] = None,
+) -> Optional[str]:
+    """
+    Comentarios en streaming al dataset 'comments' (junto a 'posts'):
+
+        comments_storage = ParquetStorage(base_dir="data/curated/reddit", dataset="comments")
+        stream_comments_to_parquet(rc.comments(post_ids), comments_storage, suffix="sneakers")
+
+    `language` como en stream_posts_to_parquet, con text_cols=("body",).
+    """
+    tables = iter_comment_tables(comments, batch_size)
+    if language is not None:
+        tables = map(language.process, tables)
+    return storage.save_batches(tables, suffix=suffix)
@@ -1,6 +1,7 @@
 # src/tfm/settings.py
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field, PositiveInt
+from functools import lru_cache
 from typing import List
 
 class Settings(BaseSettings):
@@ -27,4 +28,18 @@ class Settings(BaseSettings):
         populate_by_name=True,
     )
 
-settings = Settings()
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """
+    Settings se construye (lee .env y el entorno) la primera vez que se pide,
+    no al importar el módulo.
+    """
+    return Settings()
+
+
+def __getattr__(name):
+    # Compatibilidad: `from src.settings import settings` sigue funcionando
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1 +1,17 @@
-from .storage_manager import DuckDBIndex, ParquetStorage
+# src/storage/__init__.py
+# Exportaciones perezosas (PEP 562): CheckpointStore no arrastra duckdb/pyarrow/pandas.
+from src._lazy import lazy_exports
+
+_EXPORTS = {
+    "DuckDBIndex": ".storage_manager",
+    "ParquetStorage": ".storage_manager",
+    "MaterializedIndex": ".materialized",
+    "TrendIndex": ".trends",
+    "FullTextIndex": ".fulltext",
+    "DatasetSchema": ".schemas",
+    "get_schema": ".schemas",
+    "CheckpointStore": ".checkpoints",
+    "Watermark": ".checkpoints",
+}
+
+__all__, __getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
@@ -0,0 +1,149 @@
+# src/storage/checkpoints.py
+import json
+import os
+import threading
+from dataclasses import dataclass, asdict, field
+from typing import Optional, Dict
+
+
+# -----------------------------------------------------------
+# Watermark: el post más nuevo ya ingerido de una fuente
+# -----------------------------------------------------------
+
+@dataclass(frozen=True)
+class Watermark:
+    created_utc: float
+    fullname: str  # p.ej. "t3_abc123"
+
+    @classmethod
+    def from_post(cls, post: Dict) -> Optional["Watermark"]:
+        created = post.get("created_utc")
+        pid = post.get("id")
+        if created is None or not pid:
+            return None
+        return cls(float(created), post.get("name") or f"t3_{pid}")
+
+    def reached(self, post: Dict) -> bool:
+        """
+        True si `post` ya es territorio ingerido (mismo post o más antiguo).
+        Solo tiene sentido en listings cronológicos (new / search sort=new).
+        """
+        if post.get("stickied"):
+            return False  # los fijados no siguen el orden cronológico
+        pid = post.get("id")
+        if pid and (post.get("name") or f"t3_{pid}") == self.fullname:
+            return True
+        created = post.get("created_utc")
+        return created is not None and float(created) < self.created_utc
+
+    def newer_than(self, other: Optional["Watermark"]) -> bool:
+        return other is None or self.created_utc > other.created_utc
+
+
+# -----------------------------------------------------------
+# CheckpointStore: watermarks persistidos por fuente (JSON)
+# -----------------------------------------------------------
+
+@dataclass
+class CheckpointStore:
+    path: str  # p.ej. "data/state/reddit_checkpoints.json"
+    _marks: Dict[str, Watermark] = field(default_factory=dict, init=False, repr=False)
+    # Recorridos terminados cuyas filas aún no están en disco (ver stage/commit)
+    _pending: Dict[str, Watermark] = field(default_factory=dict, init=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def __post_init__(self):
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+            self._marks = {k: Watermark(**v) for k, v in raw.items()}
+
+    @staticmethod
+    def key(
+        endpoint: str,
+        subreddit: Optional[str] = None,
+        query: Optional[str] = None,
+        sort: Optional[str] = None,
+        t: Optional[str] = None,
+    ) -> str:
+        """
+        Clave estable de una fuente: (endpoint, subreddit, query, sort, t).
+        """
+        parts = [endpoint, (subreddit or "").lower(), query or "", sort or "", t or ""]
+        return "|".join(parts)
+
+    def get(self, key: str) -> Optional[Watermark]:
+        with self._lock:
+            return self._marks.get(key)
+
+    def advance(self, key: str, mark: Watermark) -> bool:
+        """
+        Avanza el watermark si `mark` es más nuevo. Persiste de forma atómica.
+        """
+        with self._lock:
+            if not mark.newer_than(self._marks.get(key)):
+                return False
+            self._marks[key] = mark
+            self._flush()
+            return True
+
+    def stage(self, key: str, mark: Watermark) -> None:
+        """
+        Deja `mark` pendiente (en memoria, sin persistir) hasta que quien
+        consume el listing haya escrito sus filas y llame a commit().
+        """
+        with self._lock:
+            if mark.newer_than(self._pending.get(key)):
+                self._pending[key] = mark
+
+    @property
+    def pending(self) -> Dict[str, Watermark]:
+        with self._lock:
+            return dict(self._pending)
+
+    def commit(self) -> int:
+        """
+        Avanza todos los watermarks pendientes (una sola escritura del JSON).
+        Llamar después de que la escritura de las filas haya terminado bien.
+        Devuelve cuántas fuentes avanzaron.
+        """
+        with self._lock:
+            advanced = 0
+            for key, mark in self._pending.items():
+                if mark.newer_than(self._marks.get(key)):
+                    self._marks[key] = mark
+                    advanced += 1
+            self._pending.clear()
+            if advanced:
+                self._flush()
+            return advanced
+
+    def discard(self) -> None:
+        """
+        Olvida los pendientes (la escritura falló): el próximo crawl repite
+        desde el watermark persistido.
+        """
+        with self._lock:
+            self._pending.clear()
+
+    def reset(self, key: Optional[str] = None) -> None:
+        """
+        Olvida una fuente (o todas) para forzar un crawl completo.
+        """
+        with self._lock:
+            if key is None:
+                self._marks.clear()
+                self._pending.clear()
+            else:
+                self._marks.pop(key, None)
+                self._pending.pop(key, None)
+            self._flush()
+
+    def _flush(self) -> None:
+        d = os.path.dirname(self.path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({k: asdict(v) for k, v in self._marks.items()}, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
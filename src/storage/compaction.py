@@ -0,0 +1,350 @@
+# src/storage/compaction.py
+"""
+Compactación de un dataset Parquet: junta los ficheros pequeños de cada
+directorio (el dataset plano o cada partición Hive) en ficheros grandes
+ordenados, quedándose con la versión más reciente (retrieved_at) de cada id.
+
+Intercambio seguro frente a lectores concurrentes:
+  1) los ficheros nuevos se escriben en <base_dir>/_staging (fuera del glob),
+  2) se mueven a su directorio con rename atómico,
+  3) los viejos se mueven a <base_dir>/_trash/<dataset>/<tag>/ (no se borran;
+     purge_trash() los elimina pasado un periodo de gracia).
+Un lector nunca ve un fichero a medias ni pierde filas; entre 2) y 3) puede ver
+un id duplicado, que las vistas con latest_only=True (DuckDBIndex) ya descartan.
+
+    python -m src.storage.compaction --base-dir data/curated/reddit --dataset posts
+"""
+import argparse
+import glob
+import os
+import shutil
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import duckdb
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .io_utils import open_parquet_writer
+from .storage_manager import ParquetStorage
+
+SMALL_FILE_BYTES = 32 * 1024 * 1024
+TARGET_ROWS_PER_FILE = 2_000_000
+SORT_BY = ("subreddit", "created_utc")
+
+
+@dataclass
+class CompactionReport:
+    files_before: int = 0
+    files_after: int = 0
+    rows_before: int = 0
+    rows_after: int = 0
+    bytes_before: int = 0
+    bytes_after: int = 0
+    dirs_compacted: int = 0
+    seconds: float = 0.0
+    latency_before_ms: Optional[float] = None
+    latency_after_ms: Optional[float] = None
+    trash_dir: str = ""
+    details: List[Dict] = field(default_factory=list)
+
+    def summary(self) -> str:
+        s = (
+            f"{self.files_before} -> {self.files_after} ficheros, "
+            f"{self.rows_before} -> {self.rows_after} filas, "
+            f"{self.bytes_before / 1e6:.1f} -> {self.bytes_after / 1e6:.1f} MB "
+            f"en {self.seconds:.2f}s"
+        )
+        if self.latency_before_ms is not None and self.latency_after_ms is not None:
+            s += f"; consulta {self.latency_before_ms:.1f} -> {self.latency_after_ms:.1f} ms"
+        return s
+
+
+# ---------------------- Planificación ----------------------
+
+def _data_files(directory: str, dataset: str) -> List[str]:
+    return sorted(glob.glob(os.path.join(directory, f"{dataset}_*.parquet")))
+
+
+def _leaf_dirs(storage: ParquetStorage) -> List[str]:
+    """
+    Directorios que contienen ficheros de datos (dataset_dir si es plano;
+    cada partición si es Hive).
+    """
+    files = glob.glob(os.path.join(storage.dataset_dir, "**", f"{storage.dataset}_*.parquet"), recursive=True)
+    return sorted({os.path.dirname(f) for f in files})
+
+
+def plan_compaction(
+    storage: ParquetStorage,
+    small_file_bytes: int = SMALL_FILE_BYTES,
+    min_files: int = 2,
+) -> Dict[str, List[str]]:
+    """
+    {directorio: ficheros a reescribir}. Un directorio entra si tiene al menos
+    `min_files` ficheros y alguno es pequeño; se reescribe entero para que la
+    deduplicación por id cubra también los ficheros grandes ya compactados.
+    """
+    plan = {}
+    for d in _leaf_dirs(storage):
+        files = _data_files(d, storage.dataset)
+        if len(files) >= min_files and any(os.path.getsize(f) < small_file_bytes for f in files):
+            plan[d] = files
+    return plan
+
+
+# ---------------------- Reescritura ----------------------
+
+def _partition_keys(directory: str, dataset_dir: str) -> List[str]:
+    """
+    Claves Hive del directorio (p.ej. ['subreddit', 'date']); [] si es plano.
+    """
+    rel = os.path.relpath(directory, dataset_dir)
+    return [part.split("=", 1)[0] for part in rel.split(os.sep) if "=" in part]
+
+
+def _target_schema(
+    files: List[str],
+    storage: Optional[ParquetStorage] = None,
+    partition_keys: Tuple[str, ...] = (),
+) -> pa.Schema:
+    """
+    Schema Arrow unificado de los ficheros (conserva diccionarios/categorías).
+    Con registro, los tipos canónicos de la versión vigente: la compactación
+    reescribe también los ficheros viejos con tipos dispares. Las claves de
+    partición no van en el fichero (están en la ruta), igual que al escribir.
+
+    Sin registro, los tipos que dejó pandas se ajustan a la unión de ficheros:
+    una columna nula en todos (p.ej. link_flair_text de un crawl sin flairs)
+    queda como string, porque DuckDB la lee como INTEGER y no hay cast de int32
+    a null; y las categorías pasan a índices int32, porque las int8 de cada
+    fichero se desbordan al juntar sus valores.
+    """
+    # permissive: null + el tipo de otro fichero -> ese tipo
+    unified = pa.unify_schemas([pq.read_schema(f) for f in files], promote_options="permissive")
+    if storage is not None and storage.spec is not None:
+        unified = storage.spec.conform_schema(unified)
+    fields = []
+    for f in unified:
+        if f.name in partition_keys:
+            continue
+        if pa.types.is_null(f.type):
+            f = f.with_type(pa.string())
+        elif pa.types.is_dictionary(f.type):
+            f = f.with_type(pa.dictionary(pa.int32(), f.type.value_type))
+        fields.append(f)
+    return pa.schema(fields, metadata=unified.metadata)
+
+
+def _merge_sql(files: List[str], schema: pa.Schema, sort_by: Tuple[str, ...] = SORT_BY) -> str:
+    file_list = ", ".join("'" + f.replace("\\", "/").replace("'", "''") + "'" for f in files)
+    cols = set(schema.names)
+    order = [c for c in sort_by if c in cols]
+    dedup = ""
+    if "id" in cols:
+        recency = "retrieved_at DESC NULLS LAST" if "retrieved_at" in cols else "1"
+        dedup = f"QUALIFY row_number() OVER (PARTITION BY id ORDER BY {recency}) = 1"
+    order_by = f"ORDER BY {', '.join(order)}" if order else ""
+    # Sin hive_partitioning: las claves de la ruta no son columnas del fichero
+    return (
+        f"SELECT * FROM read_parquet([{file_list}], union_by_name = true, hive_partitioning = false) "
+        f"{dedup} {order_by}"
+    )
+
+
+def _rewrite_dir(
+    directory: str,
+    files: List[str],
+    storage: ParquetStorage,
+    staging: str,
+    tag: str,
+    target_rows: int,
+) -> Tuple[List[str], int, int]:
+    """
+    Escribe en `staging` la versión compactada de `files`.
+    Devuelve (ficheros escritos, filas leídas, filas escritas).
+    """
+    schema = _target_schema(files, storage, tuple(_partition_keys(directory, storage.dataset_dir)))
+    spec = storage.spec
+    rows_in = sum(pq.ParquetFile(f).metadata.num_rows for f in files)
+    stamp = time.strftime("%Y%m%d_%H%M%S", time.gmtime())
+
+    written: List[str] = []
+    rows_out = 0
+    writer = None
+    in_file = 0
+    con = duckdb.connect()
+    try:
+        sql = _merge_sql(files, schema, spec.sort_by if spec is not None else SORT_BY)
+        reader = con.execute(sql).fetch_record_batch(64 * 1024)
+        for batch in reader:
+            if writer is None or in_file >= target_rows:
+                if writer is not None:
+                    writer.close()
+                path = os.path.join(staging, f"{storage.dataset}_{stamp}_compacted_{tag}-{len(written)}.parquet")
+                writer = open_parquet_writer(path, schema, storage._parquet_opts(schema))
+                written.append(path)
+                in_file = 0
+            table = pa.Table.from_batches([batch])
+            if spec is not None:
+                table = spec.conform(table)
+            table = table.select(schema.names).cast(schema)
+            writer.write_table(table, row_group_size=storage._row_group_rows)
+            in_file += table.num_rows
+            rows_out += table.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+        con.close()
+    return written, rows_in, rows_out
+
+
+def _remove_staging(staging: str) -> None:
+    """
+    Borra el staging de esta pasada y, si queda vacío, el <base_dir>/_staging común.
+    """
+    shutil.rmtree(staging, ignore_errors=True)
+    try:
+        os.rmdir(os.path.dirname(staging))
+    except OSError:
+        pass  # otro escritor lo está usando
+
+
+def _swap(directory: str, old: List[str], new_staged: List[str], trash: str, dataset_dir: str) -> List[str]:
+    """
+    Publica los nuevos (rename atómico) y después retira los viejos a la papelera,
+    conservando su ruta relativa (partición) dentro de ella.
+    """
+    published = []
+    for src in new_staged:
+        dst = os.path.join(directory, os.path.basename(src))
+        os.replace(src, dst)
+        published.append(dst)
+    for f in old:
+        dst = os.path.join(trash, os.path.relpath(f, dataset_dir))
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        os.replace(f, dst)
+    return published
+
+
+# ---------------------- API ----------------------
+
+def _probe_latency(storage: ParquetStorage, repeats: int = 3) -> float:
+    """
+    ms de un COUNT(*) / COUNT(DISTINCT id) sobre todo el dataset (mejor de N).
+    """
+    pattern = os.path.join(storage.dataset_dir, "**", f"{storage.dataset}_*.parquet").replace("\\", "/")
+    con = duckdb.connect()
+    best = float("inf")
+    try:
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            con.execute(
+                f"SELECT COUNT(*), COUNT(DISTINCT id) FROM read_parquet('{pattern}', union_by_name = true)"
+            ).fetchall()
+            best = min(best, time.perf_counter() - t0)
+    finally:
+        con.close()
+    return best * 1000
+
+
+def compact_dataset(
+    storage: ParquetStorage,
+    small_file_bytes: int = SMALL_FILE_BYTES,
+    min_files: int = 2,
+    target_rows: int = TARGET_ROWS_PER_FILE,
+    measure_latency: bool = False,
+) -> CompactionReport:
+    """
+    Compacta todos los directorios que lo necesiten. Ver docstring del módulo.
+    """
+    t0 = time.perf_counter()
+    report = CompactionReport()
+    plan = plan_compaction(storage, small_file_bytes=small_file_bytes, min_files=min_files)
+    if not plan:
+        report.seconds = time.perf_counter() - t0
+        return report
+
+    if measure_latency:
+        report.latency_before_ms = _probe_latency(storage)
+
+    tag = f"{time.strftime('%Y%m%d_%H%M%S', time.gmtime())}_{uuid.uuid4().hex[:6]}"
+    trash = os.path.join(storage.base_dir, "_trash", storage.dataset, tag)
+    report.trash_dir = trash
+
+    for directory, files in plan.items():
+        staging = os.path.join(storage.base_dir, "_staging", f"compact_{tag}")
+        os.makedirs(staging, exist_ok=True)
+        try:
+            bytes_before = sum(os.path.getsize(f) for f in files)
+            staged, rows_in, rows_out = _rewrite_dir(directory, files, storage, staging, tag, target_rows)
+            published = _swap(directory, files, staged, trash, storage.dataset_dir)
+        finally:
+            _remove_staging(staging)
+
+        bytes_after = sum(os.path.getsize(f) for f in published)
+        report.files_before += len(files)
+        report.files_after += len(published)
+        report.rows_before += rows_in
+        report.rows_after += rows_out
+        report.bytes_before += bytes_before
+        report.bytes_after += bytes_after
+        report.dirs_compacted += 1
+        report.details.append({
+            "dir": directory, "files_before": len(files), "files_after": len(published),
+            "rows_before": rows_in, "rows_after": rows_out,
+        })
+
+    if measure_latency:
+        report.latency_after_ms = _probe_latency(storage)
+    report.seconds = time.perf_counter() - t0
+    return report
+
+
+def purge_trash(base_dir: str, dataset: str, older_than_seconds: float = 3600) -> int:
+    """
+    Borra las papeleras de compactaciones más antiguas que el periodo de gracia.
+    Devuelve cuántos directorios se eliminaron.
+    """
+    root = os.path.join(base_dir, "_trash", dataset)
+    if not os.path.isdir(root):
+        return 0
+    now = time.time()
+    removed = 0
+    for name in os.listdir(root):
+        d = os.path.join(root, name)
+        if os.path.isdir(d) and now - os.path.getmtime(d) > older_than_seconds:
+            shutil.rmtree(d, ignore_errors=True)
+            removed += 1
+    return removed
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Compacta y deduplica un dataset Parquet.")
+    ap.add_argument("--base-dir", required=True)
+    ap.add_argument("--dataset", default="posts")
+    ap.add_argument("--small-mb", type=float, default=SMALL_FILE_BYTES / 1024 / 1024)
+    ap.add_argument("--target-rows", type=int, default=TARGET_ROWS_PER_FILE)
+    ap.add_argument("--grace-seconds", type=float, default=3600)
+    ap.add_argument("--every", type=float, default=0, help="segundos entre pasadas (0 = una sola)")
+    args = ap.parse_args()
+
+    storage = ParquetStorage(base_dir=args.base_dir, dataset=args.dataset)
+    while True:
+        report = compact_dataset(
+            storage,
+            small_file_bytes=int(args.small_mb * 1024 * 1024),
+            target_rows=args.target_rows,
+            measure_latency=True,
+        )
+        purged = purge_trash(args.base_dir, args.dataset, args.grace_seconds)
+        print(report.summary() + f"; papeleras purgadas: {purged}")
+        if not args.every:
+            break
+        time.sleep(args.every)
+
+
+if __name__ == "__main__":
+    main()
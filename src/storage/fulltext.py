@@ -0,0 +1,454 @@
+# src/storage/fulltext.py
+"""
+Índice invertido local (SQLite FTS5) sobre title + selftext de los posts
+guardados por ParquetStorage, para buscar un concepto sin gastar cuota de la
+API ni recorrer todo el texto con LIKE '%...%' sobre vw_posts.
+
+  - fts(title, selftext): tabla FTS5 sin contenido (solo posting lists,
+    comprimidas con varints por delta; el texto ya está en los Parquet) con
+    ranking BM25 (title pesa más), frases ("running shoes"), prefijos (runn*)
+    y AND/OR/NOT. Tokenizador unicode61 sin diacríticos: "cafe" encuentra
+    "café". Sin índices de prefijo (prefix=...): casi doblan el tamaño y solo
+    se notan con prefijos de 1-2 letras que abarcan miles de términos.
+  - docs(rowid, id, subreddit, created_utc, retrieved_at, text_hash): una fila
+    por id, la de retrieved_at más reciente; los filtros por subreddit/fecha van
+    aquí. Un post recrawleado con el mismo texto solo actualiza esta fila; si el
+    texto cambió se indexa con un rowid nuevo y el antiguo queda huérfano en fts
+    (nunca casa con docs; ver `stale`).
+  - manifest: ficheros ya indexados (tamaño, mtime). refresh() solo lee los
+    nuevos o modificados, como MaterializedIndex.refresh().
+
+Los ficheros que desaparecen (compactación) solo salen del manifiesto; los
+compactados se leen, pero sus filas no son más nuevas y no se reindexan.
+refresh(full=True) reconstruye desde cero (p.ej. tras borrar datos por retención).
+
+    index = FullTextIndex("data/state/fulltext.sqlite", base_dir="data/curated/reddit")
+    index.refresh()
+    index.search('"running shoes" OR sneaker*', subreddit="running", n=20)
+    index.search_concept("running shoes", expand=lambda w, n: generate_synonyms(w, n, cache=cache))
+
+Se eligió FTS5 (incluido en el sqlite3 de Python) frente a la extensión fts de
+DuckDB porque esta se instala por red en el primer uso.
+"""
+import glob
+import hashlib
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from src import metrics
+from src._sqlite import open_sqlite
+from src.clients.synonim_gen import generate_synonyms
+
+TEXT_COLUMNS = ("title", "selftext")
+META_COLUMNS = ("id", "subreddit", "created_utc", "retrieved_at")
+# Filas por INSERT a las tablas temporales (memoria acotada con ficheros grandes)
+CHUNK_ROWS = 50_000
+
+TimeBound = Union[None, int, float, str, datetime, pd.Timestamp]
+
+
+def _text_hash(title: Optional[str], selftext: Optional[str]) -> int:
+    h = hashlib.blake2b(f"{title or ''}\0{selftext or ''}".encode(), digest_size=8).digest()
+    return int.from_bytes(h, "little", signed=True)
+
+
+def fts_term(term: str) -> str:
+    """
+    Término como expresión FTS5 literal: frase entre comillas ("running shoes");
+    un * final lo convierte en prefijo ("runn" *).
+    """
+    term = term.strip()
+    prefix = term.endswith("*")
+    words = " ".join(term.rstrip("*").replace('"', " ").split())
+    if not words:
+        return ""
+    return f'"{words}"' + (" *" if prefix else "")
+
+
+def fts_or_query(terms: Iterable[str]) -> str:
+    """
+    "a" OR "b c" OR "d" * con los términos no vacíos, sin repetidos.
+    """
+    out, seen = [], set()
+    for t in terms:
+        q = fts_term(t)
+        if q and q.lower() not in seen:
+            seen.add(q.lower())
+            out.append(q)
+    if not out:
+        raise ValueError("La consulta necesita al menos un término")
+    return " OR ".join(out)
+
+
+def _epoch(value: TimeBound) -> Optional[int]:
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    ts = pd.Timestamp(value)
+    ts = ts.tz_localize("UTC") if ts.tzinfo is None else ts
+    return int(ts.timestamp())
+
+
+def _path_keys(path: str) -> Dict[str, str]:
+    """
+    Claves Hive de la ruta (subreddit=running/date=2024-05-01/...).
+    """
+    out = {}
+    for part in path.replace("\\", "/").split("/")[:-1]:
+        if "=" in part:
+            k, v = part.split("=", 1)
+            out[k] = v
+    return out
+
+
+@dataclass
+class FullTextReport:
+    dataset: str
+    files_new: int = 0
+    files_removed: int = 0
+    rows_read: int = 0
+    rows_indexed: int = 0
+    rows_updated: int = 0
+    docs_total: int = 0
+    seconds: float = 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.dataset}: +{self.files_new} ficheros (-{self.files_removed}), "
+            f"{self.rows_indexed}/{self.rows_read} filas indexadas "
+            f"({self.rows_updated} solo actualizadas), "
+            f"{self.docs_total} docs en índice en {self.seconds:.2f}s"
+        )
+
+
+class FullTextIndex:
+    """
+    Índice FTS5 persistente de un dataset de posts. Seguro entre hilos (una
+    conexión con lock); varios procesos pueden leer mientras uno hace refresh (WAL).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        base_dir: str = "data/curated/reddit",
+        dataset: str = "posts",
+        weights: Tuple[float, float] = (2.0, 1.0),   # bm25 de title y selftext
+    ):
+        self.path = path
+        self.base_dir = base_dir
+        self.dataset = dataset
+        self.weights = weights
+        self._lock = threading.Lock()
+        self._con = open_sqlite(path, synchronous="NORMAL")
+        self._con.execute("PRAGMA cache_size=-65536")     # 64 MB
+        self._con.execute("PRAGMA temp_store=MEMORY")
+        self._con.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS docs (
+                rowid INTEGER PRIMARY KEY AUTOINCREMENT,
+                id TEXT NOT NULL UNIQUE,
+                subreddit TEXT,
+                created_utc INTEGER,
+                retrieved_at INTEGER,
+                text_hash INTEGER
+            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS fts USING fts5(
+                title, selftext,
+                content = '',
+                tokenize = 'unicode61 remove_diacritics 2'
+            );
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER);
+            CREATE TABLE IF NOT EXISTS manifest (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                rows INTEGER NOT NULL,
+                indexed_at REAL NOT NULL
+            );
+            """
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._con.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._con.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    # ---------------------- Ficheros ----------------------
+
+    def _files_on_disk(self) -> Dict[str, Tuple[int, float]]:
+        pattern = os.path.join(self.base_dir, self.dataset, "**", f"{self.dataset}_*.parquet")
+        out = {}
+        for f in glob.glob(pattern, recursive=True):
+            st = os.stat(f)
+            out[f.replace("\\", "/")] = (st.st_size, st.st_mtime)
+        return out
+
+    def _manifest(self) -> Dict[str, Tuple[int, float]]:
+        rows = self._con.execute("SELECT path, size, mtime FROM manifest").fetchall()
+        return {p: (s, m) for p, s, m in rows}
+
+    @staticmethod
+    def _read_file(path: str) -> pa.Table:
+        """
+        Columnas de texto y metadatos del fichero; las que falten (claves Hive
+        en la ruta, retrieved_at en ficheros antiguos) se completan.
+        """
+        names = pq.read_schema(path).names
+        table = pq.read_table(path, columns=[c for c in TEXT_COLUMNS + META_COLUMNS if c in names])
+        keys = _path_keys(path)
+        for c in TEXT_COLUMNS + META_COLUMNS:
+            if c in table.column_names:
+                col = table[c]
+                if pa.types.is_dictionary(col.type):
+                    table = table.set_column(table.schema.get_field_index(c), c, pc.cast(col, col.type.value_type))
+                continue
+            value = keys.get(c)
+            table = table.append_column(c, pa.array([value] * table.num_rows, pa.string()))
+        return table
+
+    # ---------------------- Refresh ----------------------
+
+    def refresh(self, full: bool = False) -> FullTextReport:
+        """
+        Indexa los ficheros que el manifiesto no tiene (o cuyo tamaño/mtime ha
+        cambiado). Upsert por id: una fila solo sustituye a la indexada si su
+        retrieved_at es más reciente. Todo en una transacción.
+        """
+        t0 = time.perf_counter()
+        report = FullTextReport(self.dataset)
+        with self._lock, metrics.span("fulltext_refresh", dataset=self.dataset) as sp:
+            con = self._con
+            on_disk = self._files_on_disk()
+            known = {} if full else self._manifest()
+            new = sorted(p for p, meta in on_disk.items() if known.get(p) != meta)
+            removed = [p for p in known if p not in on_disk]
+            report.files_new = len(new)
+            report.files_removed = len(removed)
+
+            con.execute("BEGIN")
+            try:
+                if full:
+                    con.execute("DELETE FROM docs")
+                    con.execute("INSERT INTO fts(fts) VALUES ('delete-all')")
+                    con.execute("DELETE FROM manifest")
+                    con.execute("DELETE FROM meta WHERE name = 'stale'")
+                if removed:
+                    con.executemany("DELETE FROM manifest WHERE path = ?", [(p,) for p in removed])
+                for p in new:
+                    read, indexed, updated = self._index_file(p)
+                    report.rows_read += read
+                    report.rows_indexed += indexed
+                    report.rows_updated += updated
+                    con.execute(
+                        "INSERT OR REPLACE INTO manifest VALUES (?, ?, ?, ?, ?)",
+                        (p, on_disk[p][0], on_disk[p][1], read, time.time()),
+                    )
+                con.execute("COMMIT")
+            except BaseException:
+                con.execute("ROLLBACK")
+                raise
+            report.docs_total = con.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+            sp.set(files=report.files_new, rows=report.rows_indexed)
+        metrics.count("rows_total", report.rows_indexed, stage="fulltext_refresh")
+        report.seconds = time.perf_counter() - t0
+        return report
+
+    def _index_file(self, path: str) -> Tuple[int, int, int]:
+        """
+        Carga el fichero en _incoming (por trozos) y lo fusiona con docs/fts.
+        Devuelve (filas leídas, filas indexadas, filas solo actualizadas).
+        """
+        con = self._con
+        table = self._read_file(path)
+        con.execute(
+            """
+            CREATE TEMP TABLE IF NOT EXISTS _incoming (
+                id TEXT PRIMARY KEY, subreddit TEXT, created_utc INTEGER,
+                retrieved_at INTEGER, text_hash INTEGER, title TEXT, selftext TEXT
+            )
+            """
+        )
+        con.execute("DELETE FROM _incoming")
+        cols = ("id", "subreddit", "created_utc", "retrieved_at", "title", "selftext")
+        for batch in table.select(list(cols)).to_batches(CHUNK_ROWS):
+            data = batch.to_pydict()
+            rows = (
+                (pid, sub, created, retrieved, _text_hash(title, selftext), title, selftext)
+                for pid, sub, created, retrieved, title, selftext in zip(*(data[c] for c in cols))
+                if pid is not None
+            )
+            # Repetidos dentro del fichero: gana el de retrieved_at más reciente
+            con.executemany(
+                """
+                INSERT INTO _incoming VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    subreddit = excluded.subreddit, created_utc = excluded.created_utc,
+                    retrieved_at = excluded.retrieved_at, text_hash = excluded.text_hash,
+                    title = excluded.title, selftext = excluded.selftext
+                WHERE COALESCE(excluded.retrieved_at, 0) > COALESCE(_incoming.retrieved_at, 0)
+                """,
+                rows,
+            )
+
+        # Solo entran las filas más nuevas que las indexadas
+        con.execute(
+            """
+            DELETE FROM _incoming WHERE EXISTS (
+                SELECT 1 FROM docs d WHERE d.id = _incoming.id
+                AND COALESCE(d.retrieved_at, 0) >= COALESCE(_incoming.retrieved_at, 0)
+            )
+            """
+        )
+        # Mismo texto (lo normal al recrawlear): solo cambian los metadatos
+        updated = con.execute(
+            """
+            UPDATE docs SET subreddit = i.subreddit, created_utc = i.created_utc, retrieved_at = i.retrieved_at
+            FROM _incoming i WHERE docs.id = i.id AND docs.text_hash = i.text_hash
+            """
+        ).rowcount
+        if updated:
+            con.execute(
+                """
+                DELETE FROM _incoming WHERE EXISTS (
+                    SELECT 1 FROM docs d WHERE d.id = _incoming.id AND d.text_hash = _incoming.text_hash
+                )
+                """
+            )
+
+        # Texto editado: el doc pasa a un rowid nuevo y el antiguo queda huérfano en fts
+        stale = con.execute("DELETE FROM docs WHERE id IN (SELECT id FROM _incoming)").rowcount
+        if stale:
+            con.execute(
+                "INSERT INTO meta VALUES ('stale', ?) ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                (stale,),
+            )
+        con.execute(
+            """
+            INSERT INTO docs (id, subreddit, created_utc, retrieved_at, text_hash)
+            SELECT id, subreddit, created_utc, retrieved_at, text_hash FROM _incoming
+            """
+        )
+        indexed = con.execute(
+            """
+            INSERT INTO fts (rowid, title, selftext)
+            SELECT d.rowid, COALESCE(i.title, ''), COALESCE(i.selftext, '')
+            FROM _incoming i JOIN docs d USING (id)
+            """
+        ).rowcount
+        con.execute("DELETE FROM _incoming")
+        return table.num_rows, indexed, updated
+
+    @property
+    def stale(self) -> int:
+        """
+        Versiones antiguas de posts editados que siguen en fts (no salen en las
+        consultas, pero ocupan y sesgan algo las estadísticas de BM25).
+        """
+        with self._lock:
+            row = self._con.execute("SELECT value FROM meta WHERE name = 'stale'").fetchone()
+        return row[0] if row else 0
+
+    def optimize(self) -> None:
+        """
+        Fusiona los segmentos de FTS5 en uno (consultas algo más rápidas tras
+        muchos refresh pequeños). Reescribe el índice: para tareas de mantenimiento.
+        Las versiones huérfanas (stale) solo se van con refresh(full=True).
+        """
+        with self._lock:
+            self._con.execute("INSERT INTO fts(fts) VALUES ('optimize')")
+            self._con.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    # ---------------------- Consultas ----------------------
+
+    def _where(
+        self,
+        subreddit: Optional[Union[str, Sequence[str]]],
+        start: TimeBound,
+        end: TimeBound,
+    ) -> Tuple[str, List]:
+        clauses, params = [], []
+        if subreddit is not None:
+            subs = [subreddit] if isinstance(subreddit, str) else list(subreddit)
+            clauses.append(f"d.subreddit IN ({','.join('?' * len(subs))})")
+            params += subs
+        if start is not None:
+            clauses.append("d.created_utc >= ?")
+            params.append(_epoch(start))
+        if end is not None:
+            clauses.append("d.created_utc < ?")
+            params.append(_epoch(end))
+        return "".join(f" AND {c}" for c in clauses), params
+
+    def search(
+        self,
+        query: str,
+        n: Optional[int] = 50,
+        subreddit: Optional[Union[str, Sequence[str]]] = None,
+        start: TimeBound = None,
+        end: TimeBound = None,
+    ) -> pd.DataFrame:
+        """
+        Posts que casan con `query` (sintaxis FTS5: palabras = AND, "frase",
+        pref*, OR, NOT, NEAR(...)), de más a menos relevante por BM25.
+        Columnas: id, subreddit, created_utc y bm25 (mayor = más relevante);
+        el texto se lee de los Parquet por id. n=None devuelve todos.
+        """
+        where, params = self._where(subreddit, start, end)
+        sql = (
+            f"SELECT d.id, d.subreddit, d.created_utc, -bm25(fts, ?, ?) AS bm25 "
+            f"FROM fts JOIN docs d ON d.rowid = fts.rowid "
+            f"WHERE fts MATCH ?{where} ORDER BY bm25(fts, ?, ?)"
+            + (" LIMIT ?" if n is not None else "")
+        )
+        args = [*self.weights, query, *params, *self.weights] + ([n] if n is not None else [])
+        with self._lock, metrics.span("fulltext_search"):
+            cur = self._con.execute(sql, args)
+            rows = cur.fetchall()
+            columns = [c[0] for c in cur.description]
+        return pd.DataFrame(rows, columns=columns)
+
+    def count(
+        self,
+        query: str,
+        subreddit: Optional[Union[str, Sequence[str]]] = None,
+        start: TimeBound = None,
+        end: TimeBound = None,
+    ) -> int:
+        where, params = self._where(subreddit, start, end)
+        sql = f"SELECT COUNT(*) FROM fts JOIN docs d ON d.rowid = fts.rowid WHERE fts MATCH ?{where}"
+        with self._lock:
+            return self._con.execute(sql, [query, *params]).fetchone()[0]
+
+    def search_terms(self, terms: Iterable[str], n: Optional[int] = 50, **filters) -> pd.DataFrame:
+        """
+        search() con los términos como literales unidos por OR (sin sintaxis FTS5
+        que escapar; un * final sigue siendo prefijo).
+        """
+        return self.search(fts_or_query(terms), n=n, **filters)
+
+    def search_concept(
+        self,
+        concept: str,
+        n: Optional[int] = 50,
+        expand: Callable[[str, int], List[str]] = generate_synonyms,
+        max_variants: int = 15,
+        **filters,
+    ) -> pd.DataFrame:
+        """
+        El concepto y sus expansiones (generate_synonyms por defecto; mismo
+        `expand` que QueryPlanner, p.ej. con SynonymCache) en una sola consulta OR.
+        """
+        return self.search_terms([concept] + list(expand(concept, max_variants)), n=n, **filters)
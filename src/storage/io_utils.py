@@ -1,8 +1,11 @@
-from typing import Optional, Dict, List
+import os
+from typing import Optional, Dict, List, Union
 import pandas as pd
 import pyarrow as pa
 import pyarrow.parquet as pq
 
+from src import metrics
+
 DEFAULT_PARQUET_OPTS = dict(
     compression="zstd",
     compression_level=7,
@@ -22,9 +25,43 @@ def pandas_to_table(df: pd.DataFrame, schema: Optional[pa.Schema] = None) -> pa.
         table = pa.Table.from_pandas(df, preserve_index=False)
     return table
 
-def write_parquet(path: str, table: pa.Table, parquet_opts: Optional[Dict] = None) -> None:
+def to_table(
+    data: Union[pa.Table, pa.RecordBatch, pd.DataFrame],
+    schema: Optional[pa.Schema] = None,
+) -> pa.Table:
+    """
+    Table / RecordBatch / DataFrame -> pyarrow.Table. Lo que ya es Arrow no pasa
+    por pandas: se devuelve tal cual, o con un cast si el schema no coincide.
+    """
+    if isinstance(data, pa.RecordBatch):
+        data = pa.Table.from_batches([data])
+    if isinstance(data, pa.Table):
+        if schema is not None and not data.schema.equals(schema):
+            data = data.select(schema.names).cast(schema)
+        return data
+    return pandas_to_table(data, schema=schema)
+
+def write_parquet(
+    path: str,
+    table: pa.Table,
+    parquet_opts: Optional[Dict] = None,
+    row_group_size: Optional[int] = None,
+) -> None:
+    opts = {**DEFAULT_PARQUET_OPTS, **(parquet_opts or {})}
+    with metrics.span("write_parquet") as sp:
+        pq.write_table(table, path, row_group_size=row_group_size, **opts)
+    if metrics.is_enabled():
+        size = os.path.getsize(path)
+        sp.set(rows=table.num_rows, bytes=size)
+        metrics.count("rows_total", table.num_rows, stage="write_parquet")
+        metrics.count("parquet_bytes_total", size)
+
+def open_parquet_writer(path: str, schema: pa.Schema, parquet_opts: Optional[Dict] = None) -> pq.ParquetWriter:
+    """
+    Writer incremental: cada write_table() añade row groups al mismo fichero.
+    """
     opts = {**DEFAULT_PARQUET_OPTS, **(parquet_opts or {})}
-    pq.write_table(table, path, **opts)
+    return pq.ParquetWriter(path, schema, **opts)
 
 def enforce_dtypes(df: pd.DataFrame, dtype_map: Dict[str, str]) -> pd.DataFrame:
     """
@@ -0,0 +1,315 @@
+# src/storage/materialized.py
+"""
+Modo materializado de DuckDBIndex: en lugar de vistas sobre parquet_scan
+(que releen y decodifican todos los Parquet en cada consulta), mantiene
+
+  - una tabla nativa por dataset (mt_<dataset>), una fila por id (la de
+    retrieved_at más reciente),
+  - un manifiesto (_manifest) con los ficheros ya ingeridos: refresh() solo lee
+    los nuevos o modificados,
+  - rollups pre-agregados por (subreddit, hora): posts, suma de score y de
+    comentarios (rollup_<dataset>_hourly), recalculados solo en las horas tocadas,
+  - una conexión de larga duración (un cursor por hilo) en vez de una por consulta.
+
+    index = MaterializedIndex(db_path="data/reddit.duckdb", base_dir="data/curated/reddit")
+    index.refresh("posts")
+    index.query("SELECT * FROM rollup_posts_hourly WHERE subreddit = 'running'")
+
+Los ficheros que desaparecen del disco (p.ej. tras compactar) solo se quitan del
+manifiesto: sus filas ya están en los ficheros compactados. Si se borran datos de
+verdad (retención), refresh(dataset, full=True) reconstruye desde cero.
+"""
+import glob
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import duckdb
+import pandas as pd
+import pyarrow.parquet as pq
+
+from .storage_manager import DuckDBIndex
+
+MANIFEST_TABLE = "_manifest"
+
+# Columnas necesarias para el rollup horario
+ROLLUP_COLUMNS = ("subreddit", "created_utc", "score")
+
+
+@dataclass
+class RefreshReport:
+    dataset: str
+    files_new: int = 0
+    files_removed: int = 0
+    rows_ingested: int = 0
+    rows_total: int = 0
+    hours_rolled_up: int = 0
+    seconds: float = 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.dataset}: +{self.files_new} ficheros (-{self.files_removed}), "
+            f"{self.rows_ingested} filas ingeridas, {self.rows_total} en tabla, "
+            f"{self.hours_rolled_up} horas reagregadas en {self.seconds:.2f}s"
+        )
+
+
+@dataclass
+class MaterializedIndex(DuckDBIndex):
+    """
+    DuckDBIndex con tablas materializadas y conexión persistente.
+    Es opt-in: DuckDBIndex sigue funcionando igual (vistas, una conexión por consulta).
+    """
+    _con: Optional[duckdb.DuckDBPyConnection] = field(default=None, init=False, repr=False)
+    _local: threading.local = field(default_factory=threading.local, init=False, repr=False)
+    _write_lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    # ---------------------- Conexión ----------------------
+
+    def connection(self) -> duckdb.DuckDBPyConnection:
+        """
+        Conexión de larga duración (se abre la primera vez). La zona horaria se
+        fija a UTC (GLOBAL: también para los cursores) para que date_trunc sobre
+        to_timestamp() corte horas y días UTC, como la partición 'date' y los
+        sketches, sea cual sea el TZ de la máquina que refresca.
+        """
+        if self._con is None:
+            self._con = duckdb.connect(self.db_path, read_only=self.read_only)
+            self._con.execute("SET GLOBAL TimeZone = 'UTC'")
+            if not self.read_only:
+                self._ensure_manifest(self._con)
+        return self._con
+
+    def cursor(self) -> duckdb.DuckDBPyConnection:
+        """
+        Cursor del hilo actual sobre la conexión persistente (las conexiones
+        DuckDB no se deben usar a la vez desde varios hilos; los cursores sí).
+        """
+        cur = getattr(self._local, "cursor", None)
+        if cur is None:
+            cur = self.connection().cursor()
+            self._local.cursor = cur
+        return cur
+
+    def close(self) -> None:
+        if self._con is not None:
+            self._con.close()
+            self._con = None
+            self._local = threading.local()
+
+    def __enter__(self) -> "MaterializedIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def connect(self) -> duckdb.DuckDBPyConnection:
+        """
+        Los métodos heredados (query_arrow, query_batches, create_view_for_dataset)
+        abren y cierran "conexiones": aquí son cursores baratos sobre la persistente
+        (un segundo duckdb.connect() en escritura chocaría con el lock del fichero).
+        """
+        return self.connection().cursor()
+
+    def query(self, sql: str) -> pd.DataFrame:
+        return self.cursor().execute(sql).df()
+
+    # ---------------------- Manifiesto ----------------------
+
+    @staticmethod
+    def _ensure_manifest(con: duckdb.DuckDBPyConnection) -> None:
+        con.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {MANIFEST_TABLE} (
+                dataset VARCHAR NOT NULL,
+                path VARCHAR NOT NULL,
+                size BIGINT NOT NULL,
+                mtime DOUBLE NOT NULL,
+                rows BIGINT NOT NULL,
+                ingested_at TIMESTAMP NOT NULL,
+                PRIMARY KEY (dataset, path)
+            )
+            """
+        )
+
+    def _files_on_disk(self, dataset: str) -> Dict[str, Tuple[int, float]]:
+        pattern = os.path.join(self.base_dir, dataset, "**", f"{dataset}_*.parquet")
+        out = {}
+        for f in glob.glob(pattern, recursive=True):
+            st = os.stat(f)
+            out[f.replace("\\", "/")] = (st.st_size, st.st_mtime)
+        return out
+
+    def _manifest(self, con, dataset: str) -> Dict[str, Tuple[int, float]]:
+        rows = con.execute(
+            f"SELECT path, size, mtime FROM {MANIFEST_TABLE} WHERE dataset = ?", [dataset]
+        ).fetchall()
+        return {p: (s, m) for p, s, m in rows}
+
+    # ---------------------- Lectura de ficheros ----------------------
+
+    def _read_files_sql(self, dataset: str, files: List[str]) -> str:
+        """
+        SELECT sobre una lista concreta de ficheros, deduplicado por id.
+        En layout Hive las claves de partición salen de la ruta (como en dataset_source).
+        """
+        file_list = ", ".join("'" + f.replace("'", "''") + "'" for f in files)
+        keys = self._hive_keys(dataset)
+        opts = "union_by_name = true"
+        if keys:
+            types = ", ".join(f"'{k}': {'DATE' if k == 'date' else 'VARCHAR'}" for k in keys)
+            opts += f", hive_partitioning = true, hive_types = {{{types}}}"
+        return (
+            f"SELECT * FROM read_parquet([{file_list}], {opts}) "
+            f"QUALIFY row_number() OVER (PARTITION BY id ORDER BY retrieved_at DESC NULLS LAST) = 1"
+        )
+
+    @staticmethod
+    def table_name(dataset: str) -> str:
+        return f"mt_{dataset}"
+
+    @staticmethod
+    def rollup_name(dataset: str) -> str:
+        return f"rollup_{dataset}_hourly"
+
+    @staticmethod
+    def _columns(con, table: str) -> Dict[str, str]:
+        rows = con.execute(
+            "SELECT column_name, data_type FROM information_schema.columns WHERE table_name = ?",
+            [table],
+        ).fetchall()
+        return dict(rows)
+
+    def _table_exists(self, con, table: str) -> bool:
+        return bool(self._columns(con, table))
+
+    # ---------------------- Refresh ----------------------
+
+    def refresh(self, dataset: str, full: bool = False) -> RefreshReport:
+        """
+        Ingiere en mt_<dataset> los ficheros que el manifiesto no tiene
+        (o cuyo tamaño/mtime ha cambiado) y reagrega las horas afectadas.
+        Todo en una transacción: un lector ve el estado anterior o el nuevo.
+        """
+        if self.read_only:
+            raise RuntimeError("refresh() requiere read_only=False")
+        t0 = time.perf_counter()
+        report = RefreshReport(dataset)
+        table = self.table_name(dataset)
+
+        with self._write_lock:
+            con = self.cursor()
+            on_disk = self._files_on_disk(dataset)
+            known = {} if full else self._manifest(con, dataset)
+            new = sorted(p for p, meta in on_disk.items() if known.get(p) != meta)
+            removed = [p for p in known if p not in on_disk]
+            report.files_new = len(new)
+            report.files_removed = len(removed)
+
+            con.execute("BEGIN TRANSACTION")
+            try:
+                if full:
+                    con.execute(f"DROP TABLE IF EXISTS {table}")
+                    con.execute(f"DROP TABLE IF EXISTS {self.rollup_name(dataset)}")
+                    con.execute(f"DELETE FROM {MANIFEST_TABLE} WHERE dataset = ?", [dataset])
+                if removed:
+                    con.executemany(
+                        f"DELETE FROM {MANIFEST_TABLE} WHERE dataset = ? AND path = ?",
+                        [[dataset, p] for p in removed],
+                    )
+                if new:
+                    report.rows_ingested = self._ingest(con, dataset, new)
+                    report.hours_rolled_up = self._update_rollup(con, dataset)
+                    con.executemany(
+                        f"INSERT OR REPLACE INTO {MANIFEST_TABLE} VALUES (?, ?, ?, ?, ?, now())",
+                        [[dataset, p, on_disk[p][0], on_disk[p][1], self._file_rows(p)] for p in new],
+                    )
+                con.execute("DROP TABLE IF EXISTS _incoming")
+                con.execute("COMMIT")
+            except BaseException:
+                con.execute("ROLLBACK")
+                raise
+
+            if self._table_exists(con, table):
+                report.rows_total = con.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+        report.seconds = time.perf_counter() - t0
+        return report
+
+    @staticmethod
+    def _file_rows(path: str) -> int:
+        return pq.ParquetFile(path).metadata.num_rows
+
+    def _ingest(self, con, dataset: str, files: List[str]) -> int:
+        """
+        Upsert por id: las filas nuevas sustituyen a las de la tabla si son
+        más recientes (retrieved_at). Deja las filas entrantes en _incoming.
+        """
+        table = self.table_name(dataset)
+        con.execute(f"CREATE OR REPLACE TEMP TABLE _incoming AS {self._read_files_sql(dataset, files)}")
+
+        if not self._table_exists(con, table):
+            con.execute(f"CREATE TABLE {table} AS SELECT * FROM _incoming")
+            return con.execute("SELECT COUNT(*) FROM _incoming").fetchone()[0]
+
+        # Evolución de schema: columnas nuevas en los ficheros -> ALTER TABLE
+        current = self._columns(con, table)
+        for name, typ in self._columns(con, "_incoming").items():
+            if name not in current:
+                con.execute(f'ALTER TABLE {table} ADD COLUMN "{name}" {typ}')
+
+        # Solo entran las filas que son más nuevas que las que ya hay
+        con.execute(
+            f"""
+            DELETE FROM _incoming i USING {table} t
+            WHERE i.id = t.id AND COALESCE(i.retrieved_at, 0) < COALESCE(t.retrieved_at, 0)
+            """
+        )
+        con.execute(f"DELETE FROM {table} WHERE id IN (SELECT id FROM _incoming)")
+        con.execute(f"INSERT INTO {table} BY NAME SELECT * FROM _incoming")
+        return con.execute("SELECT COUNT(*) FROM _incoming").fetchone()[0]
+
+    # ---------------------- Rollups ----------------------
+
+    def _update_rollup(self, con, dataset: str) -> int:
+        """
+        Recalcula en rollup_<dataset>_hourly solo las (subreddit, hora) presentes
+        en _incoming. Un id conserva subreddit y created_utc entre crawls, así que
+        esas son todas las celdas que pueden haber cambiado.
+        """
+        table = self.table_name(dataset)
+        rollup = self.rollup_name(dataset)
+        if not set(ROLLUP_COLUMNS) <= set(self._columns(con, table)):
+            return 0
+        comments = "num_comments" in self._columns(con, table)
+        hour = "date_trunc('hour', to_timestamp(created_utc))"
+        aggregate = (
+            f"SELECT subreddit::VARCHAR AS subreddit, {hour} AS hour, "
+            f"COUNT(*) AS posts, SUM(score)::BIGINT AS score_sum, "
+            f"{'SUM(num_comments)::BIGINT' if comments else 'NULL::BIGINT'} AS comments_sum "
+            f"FROM {table} p WHERE created_utc IS NOT NULL"
+        )
+
+        con.execute(
+            f"CREATE OR REPLACE TEMP TABLE _touched AS "
+            f"SELECT DISTINCT subreddit::VARCHAR AS subreddit, {hour} AS hour "
+            f"FROM _incoming WHERE created_utc IS NOT NULL"
+        )
+        if not self._table_exists(con, rollup):
+            con.execute(f"CREATE TABLE {rollup} AS {aggregate} GROUP BY ALL")
+        else:
+            con.execute(
+                f"DELETE FROM {rollup} r USING _touched k "
+                f"WHERE r.subreddit IS NOT DISTINCT FROM k.subreddit AND r.hour = k.hour"
+            )
+            con.execute(
+                f"INSERT INTO {rollup} {aggregate} AND EXISTS ("
+                f"SELECT 1 FROM _touched k WHERE k.subreddit IS NOT DISTINCT FROM p.subreddit::VARCHAR "
+                f"AND k.hour = date_trunc('hour', to_timestamp(p.created_utc))) GROUP BY ALL"
+            )
+        n = con.execute("SELECT COUNT(*) FROM _touched").fetchone()[0]
+        con.execute("DROP TABLE _touched")
+        return n
+
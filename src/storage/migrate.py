@@ -0,0 +1,86 @@
+# src/storage/migrate.py
+"""
+Migra un dataset de layout plano (posts/posts_*.parquet) a layout Hive
+(posts/subreddit=.../date=.../). Los ficheros originales se mueven a
+<base_dir>/_backup/<dataset>_flat/ (o se borran con --remove-source), porque
+un mismo glob no puede mezclar ambos layouts.
+
+    python -m src.storage.migrate --base-dir data/curated/reddit --dataset posts
+"""
+import argparse
+import glob
+import os
+import shutil
+from dataclasses import dataclass, field
+from typing import List, Tuple
+
+import pyarrow.parquet as pq
+
+from .storage_manager import ParquetStorage
+
+
+@dataclass
+class MigrationReport:
+    files_in: int = 0
+    rows: int = 0
+    files_out: int = 0
+    moved_to: str = ""
+    sources: List[str] = field(default_factory=list)
+
+
+def migrate_to_partitioned(
+    base_dir: str,
+    dataset: str,
+    partition_by: Tuple[str, ...] = ("subreddit", "date"),
+    remove_source: bool = False,
+) -> MigrationReport:
+    """
+    Reescribe cada fichero plano en particiones (conservando su nombre como
+    sufijo para trazabilidad) y retira el original del directorio del dataset.
+    Es re-ejecutable: solo toca los ficheros planos que queden.
+    """
+    storage = ParquetStorage(base_dir=base_dir, dataset=dataset, partition_by=partition_by)
+    flat = sorted(glob.glob(os.path.join(storage.dataset_dir, f"{dataset}_*.parquet")))
+    backup = os.path.join(base_dir, "_backup", f"{dataset}_flat")
+    report = MigrationReport(moved_to="" if remove_source else backup)
+
+    for path in flat:
+        table = pq.read_table(path)
+        stem = os.path.splitext(os.path.basename(path))[0]
+        written = storage._write_partitioned(table, suffix=f"migrated_{stem}") if table.num_rows else []
+
+        report.files_in += 1
+        report.rows += table.num_rows
+        report.files_out += len(written)
+        report.sources.append(path)
+
+        if remove_source:
+            os.remove(path)
+        else:
+            os.makedirs(backup, exist_ok=True)
+            shutil.move(path, os.path.join(backup, os.path.basename(path)))
+    return report
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Migra un dataset Parquet plano a layout Hive.")
+    ap.add_argument("--base-dir", required=True)
+    ap.add_argument("--dataset", default="posts")
+    ap.add_argument("--partition-by", default="subreddit,date")
+    ap.add_argument("--remove-source", action="store_true")
+    args = ap.parse_args()
+
+    report = migrate_to_partitioned(
+        args.base_dir,
+        args.dataset,
+        partition_by=tuple(c.strip() for c in args.partition_by.split(",") if c.strip()),
+        remove_source=args.remove_source,
+    )
+    print(
+        f"{report.files_in} ficheros planos ({report.rows} filas) -> {report.files_out} ficheros "
+        f"particionados" + (f"; originales en {report.moved_to}" if report.moved_to else "")
+    )
+
+
+if __name__ == "__main__":
+    main()
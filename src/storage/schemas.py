@@ -0,0 +1,241 @@
+# src/storage/schemas.py
+"""
+Registro versionado de los schemas Parquet de cada dataset (posts, comments).
+
+Cada versión fija los tipos canónicos (nada de int8 en un fichero e int32 en
+otro según lo que decida el downcast de pandas) y cómo se escribe:
+  - orden de las filas (posts: subreddit, created_utc): las estadísticas min/max de
+    cada row group quedan estrechas y DuckDB descarta row groups enteros;
+  - tamaño de row group pensado para esa poda;
+  - codificación y compresión por columna: diccionario para las categóricas,
+    DELTA_BINARY_PACKED en timestamps casi ordenados, DELTA_BYTE_ARRAY en
+    rutas con prefijo común, ZSTD más alto en el texto largo y estadísticas
+    solo donde se filtra. upvote_ratio (float32) se queda con diccionario:
+    tiene pocos valores distintos y BYTE_STREAM_SPLIT lo triplicaba.
+
+La versión queda en los metadatos del fichero (clave b"tfm.schema", p.ej.
+"posts/v1"). Una versión nueva se registra con register() y conform() adapta
+por nombre: columnas nuevas -> nulos, tipos -> cast seguro.
+
+    spec = get_schema("posts")
+    table = spec.sort(spec.conform(table))
+    pq.write_table(table, path, row_group_size=spec.row_group_rows, **spec.parquet_options(table.schema))
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+SCHEMA_KEY = b"tfm.schema"
+
+_DICT = pa.dictionary(pa.int32(), pa.string())
+
+POSTS_ARROW_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("subreddit", _DICT),
+    ("author", _DICT),
+    ("title", pa.string()),
+    ("selftext", pa.string()),
+    ("created_utc", pa.int64()),
+    ("num_comments", pa.int32()),
+    ("score", pa.int32()),
+    ("upvote_ratio", pa.float32()),
+    ("url", pa.string()),
+    ("permalink", pa.string()),
+    ("over_18", pa.bool_()),
+    ("is_self", pa.bool_()),
+    ("domain", _DICT),
+    ("link_flair_text", _DICT),
+    ("subreddit_subscribers", pa.int32()),
+    ("retrieved_at", pa.int64()),
+    ("source", _DICT),
+])
+
+COMMENTS_ARROW_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("link_id", pa.string()),      # id corto del post
+    ("parent_id", pa.string()),    # fullname del padre: t3_* (post) o t1_* (comentario)
+    ("subreddit", _DICT),
+    ("author", _DICT),
+    ("body", pa.string()),
+    ("created_utc", pa.int64()),
+    ("score", pa.int32()),
+    ("depth", pa.int16()),
+    ("controversiality", pa.int8()),
+    ("is_submitter", pa.bool_()),
+    ("stickied", pa.bool_()),
+    ("distinguished", _DICT),
+    ("retrieved_at", pa.int64()),
+    ("source", _DICT),
+])
+
+
+@dataclass(frozen=True)
+class DatasetSchema:
+    dataset: str
+    version: int
+    schema: pa.Schema
+    sort_by: Tuple[str, ...] = ("subreddit", "created_utc")
+    # ~128k filas: unos pocos MB comprimidos por row group, y suficientes
+    # row groups por fichero compactado para que la poda por min/max sirva
+    row_group_rows: int = 128 * 1024
+    level: int = 3                                   # ZSTD por defecto (columnas cortas)
+    levels: Dict[str, int] = field(default_factory=dict)        # ZSTD por columna
+    encodings: Dict[str, str] = field(default_factory=dict)     # column_encoding (sin diccionario)
+    statistics: Tuple[str, ...] = ()                 # columnas con min/max
+
+    @property
+    def tag(self) -> str:
+        return f"{self.dataset}/v{self.version}"
+
+    # ---------------------- Tipos ----------------------
+
+    def conform_schema(self, schema: pa.Schema, keep_extra: bool = True) -> pa.Schema:
+        """
+        Campos canónicos en su orden, más (opcionalmente) los extra de `schema`
+        al final (emb_row, lang...), con la versión en los metadatos.
+        """
+        fields = list(self.schema)
+        if keep_extra:
+            fields += [f for f in schema if f.name not in self.schema.names and f.name != "__index_level_0__"]
+        return pa.schema(fields, metadata={SCHEMA_KEY: self.tag.encode()})
+
+    def conform(self, table: pa.Table, keep_extra: bool = True) -> pa.Table:
+        """
+        Tabla con los tipos canónicos: las columnas que falten van a nulos y los
+        tipos distintos (int8 de un downcast, categorías de pandas...) se castean.
+        Un cast con pérdida (p.ej. un score fuera de int32) es un error.
+        """
+        target = self.conform_schema(table.schema, keep_extra)
+        columns = []
+        for f in target:
+            if f.name not in table.column_names:
+                columns.append(pa.chunked_array([pa.nulls(table.num_rows, f.type)]))
+                continue
+            col = table[f.name]
+            if not col.type.equals(f.type):
+                try:
+                    col = pc.cast(col, f.type)
+                except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+                    raise ValueError(f"{self.tag}: columna {f.name!r} ({col.type}) no convertible a {f.type}: {e}") from e
+            columns.append(col)
+        return pa.Table.from_arrays(columns, schema=target)
+
+    # ---------------------- Orden ----------------------
+
+    def sort(self, table: pa.Table) -> pa.Table:
+        """
+        Ordena por sort_by. sort_by de Arrow no admite diccionarios: se ordena
+        por los valores decodificados y se aplica la permutación.
+        """
+        keys = [c for c in self.sort_by if c in table.column_names]
+        if not keys or table.num_rows < 2:
+            return table
+        cols = {}
+        for c in keys:
+            col = table[c]
+            cols[c] = pc.cast(col, col.type.value_type) if pa.types.is_dictionary(col.type) else col
+        order = pc.sort_indices(pa.table(cols), sort_keys=[(c, "ascending") for c in keys])
+        return table.take(order)
+
+    def sorting_columns(self, schema: pa.Schema) -> Optional[List[pq.SortingColumn]]:
+        keys = [c for c in self.sort_by if c in schema.names]
+        if len(keys) < len(self.sort_by):
+            return None
+        return [pq.SortingColumn(schema.get_field_index(c), nulls_first=False) for c in keys]
+
+    # ---------------------- Opciones de escritura ----------------------
+
+    def parquet_options(self, schema: pa.Schema, sorted_rows: bool = True) -> Dict:
+        """
+        kwargs de pq.write_table / ParquetWriter para `schema` (el de la tabla a
+        escribir, con sus columnas extra). row_group_size va aparte: es un
+        argumento de write_table, no del writer.
+        """
+        names = schema.names
+        categorical = {f.name for f in schema if pa.types.is_dictionary(f.type)}
+        encodings = {c: e for c, e in self.encodings.items() if c in names and c not in categorical}
+        opts: Dict = {
+            "compression": {c: "zstd" for c in names},
+            "compression_level": {c: self.levels.get(c, self.level) for c in names},
+            # Diccionario en todo lo demás: el writer vuelve a PLAIN solo si no compensa
+            "use_dictionary": [c for c in names if c not in encodings],
+            "write_statistics": [c for c in self.statistics if c in names],
+        }
+        if encodings:
+            opts["column_encoding"] = encodings
+        if sorted_rows:
+            sorting = self.sorting_columns(schema)
+            if sorting:
+                opts["sorting_columns"] = sorting
+        return opts
+
+
+# ---------------------- Registro ----------------------
+
+_REGISTRY: Dict[str, Dict[int, DatasetSchema]] = {}
+
+
+def register(spec: DatasetSchema) -> DatasetSchema:
+    versions = _REGISTRY.setdefault(spec.dataset, {})
+    if spec.version in versions and versions[spec.version] != spec:
+        raise ValueError(f"{spec.tag} ya está registrado con otra definición")
+    versions[spec.version] = spec
+    return spec
+
+
+def get_schema(dataset: str, version: Optional[int] = None) -> Optional[DatasetSchema]:
+    """
+    Versión pedida o la última; None si el dataset no está registrado.
+    """
+    versions = _REGISTRY.get(dataset)
+    if not versions:
+        return None
+    if version is None:
+        return versions[max(versions)]
+    if version not in versions:
+        raise KeyError(f"{dataset}: versión {version} no registrada ({sorted(versions)})")
+    return versions[version]
+
+
+def file_schema_tag(path: str) -> Optional[str]:
+    """
+    'posts/v1' para ficheros escritos con el registro; None para los anteriores.
+    """
+    meta = pq.read_schema(path).metadata or {}
+    tag = meta.get(SCHEMA_KEY)
+    return tag.decode() if tag else None
+
+
+# Texto largo: ZSTD 7 (lo que antes se aplicaba a todo); el resto, nivel 3
+_TEXT = {"title": 7, "selftext": 7, "body": 7, "url": 7, "permalink": 7}
+
+register(DatasetSchema(
+    "posts", 1, POSTS_ARROW_SCHEMA,
+    levels=_TEXT,
+    encodings={
+        "id": "PLAIN",
+        "score": "PLAIN",
+        "subreddit_subscribers": "PLAIN",
+        "created_utc": "DELTA_BINARY_PACKED",
+        "permalink": "DELTA_BYTE_ARRAY",
+        "url": "DELTA_BYTE_ARRAY",
+    },
+    statistics=("subreddit", "created_utc", "score", "num_comments", "retrieved_at", "domain", "author"),
+))
+
+register(DatasetSchema(
+    "comments", 1, COMMENTS_ARROW_SCHEMA,
+    sort_by=("link_id", "created_utc"),   # árboles de un post contiguos
+    levels=_TEXT,
+    encodings={
+        "id": "PLAIN",
+        "score": "PLAIN",
+        "created_utc": "DELTA_BINARY_PACKED",
+        "parent_id": "DELTA_BYTE_ARRAY",
+        "link_id": "DELTA_BYTE_ARRAY",
+    },
+    statistics=("subreddit", "created_utc", "score", "link_id", "retrieved_at", "author"),
+))
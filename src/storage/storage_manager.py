@@ -1,13 +1,33 @@
 import os
 import time
 import glob
-from dataclasses import dataclass
-from typing import Optional, Dict, List
+import shutil
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Optional, Dict, List, Iterable, Set, Union, Tuple
+import numpy as np
 import pandas as pd
 import duckdb
 import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from src import metrics
+from .io_utils import pandas_to_table, to_table, write_parquet, open_parquet_writer, DEFAULT_PARQUET_OPTS
+from .schemas import DatasetSchema, get_schema
+from .checkpoints import CheckpointStore
+
+def _first_rows(pos: np.ndarray) -> np.ndarray:
+    """
+    Máscara de la primera aparición de cada valor, dado su índice en
+    pc.unique() (que conserva el orden de aparición): una fila es la primera
+    de su valor si su índice supera a todos los anteriores.
+    """
+    if len(pos) == 0:
+        return np.zeros(0, dtype=bool)
+    return pos > np.maximum.accumulate(np.concatenate(([-1], pos[:-1])))
 
-from .io_utils import pandas_to_table, write_parquet
 
 # -----------------------------------------------------------
 # ParquetStorage: guarda DataFrames ultra-compactos en Parquet (ZSTD)
@@ -19,9 +39,23 @@ class ParquetStorage:
     dataset: str   # p.ej. "posts" | "comments"
     schema: Optional[pa.Schema] = None  # opcional: schema consistente
     ensure_dirs: bool = True
+    # Layout Hive opcional, p.ej. ("subreddit", "date") ->
+    #   posts/subreddit=python/date=2024-05-01/posts_YYYYMMDD_HHMMSS_<suffix>_<tag>-0.parquet
+    # 'date' (YYYY-MM-DD, UTC) se deriva de created_utc.
+    partition_by: Tuple[str, ...] = ()
+    # Registro de schemas (storage.schemas): tipos canónicos, orden y opciones
+    # por columna. None = última versión; se ignora si se pasa `schema`.
+    schema_version: Optional[int] = None
+    use_registry: bool = True
+    last_written: List[str] = field(default_factory=list, init=False, repr=False)
 
     def __post_init__(self):
         self.dataset_dir = os.path.join(self.base_dir, self.dataset)
+        self.partition_by = tuple(self.partition_by)
+        self.spec: Optional[DatasetSchema] = (
+            get_schema(self.dataset, self.schema_version)
+            if self.use_registry and self.schema is None else None
+        )
         if self.ensure_dirs:
             os.makedirs(self.dataset_dir, exist_ok=True)
 
@@ -43,25 +77,294 @@ class ParquetStorage:
             return df.drop_duplicates(subset=["id"]).reset_index(drop=True)
         return df
 
-    def save_df(self, df: pd.DataFrame, suffix: Optional[str] = None) -> str:
+    def save_df(
+        self,
+        df: pd.DataFrame,
+        suffix: Optional[str] = None,
+        checkpoints: Optional[CheckpointStore] = None,
+    ) -> str:
         """
         Escribe un DataFrame como un único Parquet comprimido (ZSTD).
         No duplica datos en DB; solo disco. Devuelve la ruta escrita.
+        En layout particionado escribe un fichero por partición y devuelve
+        dataset_dir; las rutas concretas quedan en `last_written`.
+
+        Con `checkpoints`, los watermarks pendientes de los listings que
+        produjeron `df` se confirman solo si la escritura termina bien.
         """
-        df = self.dedup(df)
-        if df is None or df.empty:
-            raise ValueError("DataFrame vacío; nada que guardar.")
-        table = pandas_to_table(df, schema=self.schema)
+        with self._committing(checkpoints):
+            df = self.dedup(df)
+            if df is None or df.empty:
+                raise ValueError("DataFrame vacío; nada que guardar.")
+            return self._write_table(pandas_to_table(df, schema=self.schema), suffix)
+
+    def save_table(
+        self,
+        table: Union[pa.Table, pa.RecordBatch],
+        suffix: Optional[str] = None,
+        checkpoints: Optional[CheckpointStore] = None,
+    ) -> str:
+        """
+        Como save_df pero para datos que ya están en Arrow (query_arrow, el
+        normalizador columnar...): sin ida y vuelta por pandas ni recrear categorías.
+        """
+        with self._committing(checkpoints):
+            table = self.dedup_table(to_table(table, schema=self.schema))
+            if table.num_rows == 0:
+                raise ValueError("Tabla vacía; nada que guardar.")
+            return self._write_table(table, suffix)
+
+    @staticmethod
+    @contextmanager
+    def _committing(checkpoints: Optional[CheckpointStore]):
+        """
+        Watermarks pendientes (CheckpointStore.stage) -> commit si el bloque
+        termina bien, discard si falla: nunca avanzan por delante de las filas.
+        """
+        if checkpoints is None:
+            yield
+            return
+        try:
+            yield
+        except BaseException:
+            checkpoints.discard()
+            raise
+        checkpoints.commit()
+
+    @staticmethod
+    def dedup_table(table: pa.Table) -> pa.Table:
+        """
+        Versión Arrow de dedup(): primera fila de cada id, en el orden original.
+        """
+        if "id" not in table.column_names or table.num_rows == 0:
+            return table
+        rows = pa.array(np.arange(table.num_rows, dtype=np.int64))
+        first = (
+            pa.table({"id": table["id"], "_row": rows})
+            .group_by("id", use_threads=False)
+            .aggregate([("_row", "min")])["_row_min"]
+        )
+        if len(first) == table.num_rows:
+            return table
+        return table.take(first.take(pc.sort_indices(first)))
+
+    def _prepare(self, table: pa.Table) -> pa.Table:
+        """
+        Con registro: tipos canónicos y filas en el orden de sort_by.
+        """
+        if self.spec is None:
+            return table
+        return self.spec.sort(self.spec.conform(table))
+
+    def _parquet_opts(self, schema: pa.Schema, sorted_rows: bool = True) -> Dict:
+        return self.spec.parquet_options(schema, sorted_rows) if self.spec is not None else {}
+
+    @property
+    def _row_group_rows(self) -> Optional[int]:
+        return self.spec.row_group_rows if self.spec is not None else None
+
+    def _write_table(self, table: pa.Table, suffix: Optional[str] = None) -> str:
+        if self.partition_by:
+            self.last_written = self._write_partitioned(table, suffix)
+            return self.dataset_dir
         path = self._file_path(suffix)
-        write_parquet(path, table)
+        table = self._prepare(table)
+        write_parquet(path, table, self._parquet_opts(table.schema), row_group_size=self._row_group_rows)
+        self.last_written = [path]
         return path
 
+    # ---------------------- Layout particionado ----------------------
+
+    @staticmethod
+    def with_date_column(table: pa.Table) -> pa.Table:
+        """
+        Añade 'date' (YYYY-MM-DD UTC) a partir de created_utc si no existe.
+        """
+        if "date" in table.column_names or "created_utc" not in table.column_names:
+            return table
+        ts = pc.cast(pc.cast(table["created_utc"], pa.int64()), pa.timestamp("s"))
+        return table.append_column("date", pc.strftime(ts, "%Y-%m-%d"))
+
+    def _partition_table(self, table: pa.Table) -> pa.Table:
+        if "date" in self.partition_by:
+            table = self.with_date_column(table)
+        missing = [c for c in self.partition_by if c not in table.column_names]
+        if missing:
+            raise ValueError(f"Faltan columnas de partición: {missing}")
+        # Las claves de partición viajan en la ruta como texto
+        for c in self.partition_by:
+            i = table.column_names.index(c)
+            table = table.set_column(i, c, pc.cast(table[c], pa.string()))
+        return table
+
+    def _write_partitioned(self, table: pa.Table, suffix: Optional[str] = None) -> List[str]:
+        """
+        Escribe `table` en layout Hive. Se escribe primero en un staging fuera
+        del dataset y luego se mueve fichero a fichero (rename atómico), así
+        los lectores nunca ven ficheros a medias.
+        """
+        table = self._partition_table(self._prepare(table))
+        name = f"{self.dataset}_{self._timestamp()}"
+        if suffix:
+            name += f"_{suffix}"
+        tag = uuid.uuid4().hex[:8]
+        staging = os.path.join(self.base_dir, "_staging", f"{self.dataset}_{tag}")
+
+        part_schema = pa.schema([(c, pa.string()) for c in self.partition_by])
+        # Las claves de partición no se guardan en el fichero: opciones sobre el resto
+        file_schema = pa.schema([f for f in table.schema if f.name not in self.partition_by])
+        opts = ds.ParquetFileFormat().make_write_options(
+            **{**DEFAULT_PARQUET_OPTS, **self._parquet_opts(file_schema, sorted_rows=False)}
+        )
+        rows_per_group = {"max_rows_per_group": self._row_group_rows} if self._row_group_rows else {}
+        staged: List[str] = []
+        try:
+            ds.write_dataset(
+                table,
+                staging,
+                schema=table.schema,   # conserva los metadatos (versión del registro)
+                format="parquet",
+                partitioning=ds.partitioning(part_schema, flavor="hive"),
+                basename_template=f"{name}_{tag}-{{i}}.parquet",
+                file_options=opts,
+                existing_data_behavior="overwrite_or_ignore",
+                file_visitor=lambda f: staged.append(f.path),
+                **rows_per_group,
+            )
+            written = []
+            for src in staged:
+                dst = os.path.join(self.dataset_dir, os.path.relpath(src, staging))
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
+                os.replace(src, dst)
+                written.append(dst)
+            return sorted(written)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    @property
+    def is_partitioned(self) -> bool:
+        """
+        True si el dataset ya tiene directorios clave=valor en disco.
+        """
+        if not os.path.isdir(self.dataset_dir):
+            return False
+        return any("=" in d for d in os.listdir(self.dataset_dir))
+
+    @staticmethod
+    def _dedup_table(table: pa.Table, seen: Set[str]) -> pa.Table:
+        """
+        Quita de `table` los ids ya vistos (en este lote o en anteriores).
+        La máscara se calcula en bloque; `seen` solo recibe operaciones de
+        conjunto en C (isdisjoint/update), sin bucle Python por fila.
+        """
+        if "id" not in table.column_names or table.num_rows == 0:
+            return table
+        ids = table["id"]
+        values = ids.to_pylist()
+        before = len(seen)
+        if seen.isdisjoint(values):
+            # Caso habitual (páginas de un listing): nada repetido entre lotes
+            keep = None
+        else:
+            keep = ~np.fromiter(map(seen.__contains__, values), dtype=bool, count=len(values))
+        seen.update(values)
+        fresh = len(values) if keep is None else int(keep.sum())
+        if len(seen) - before < fresh:
+            # Repetidos dentro del lote: se queda la primera aparición
+            pos = pc.index_in(ids, value_set=pc.unique(ids)).to_numpy()
+            first = _first_rows(pos)
+            keep = first if keep is None else keep & first
+        if keep is None:
+            return table
+        return table.filter(pa.array(keep))
+
+    def save_batches(
+        self,
+        batches: Iterable[Union[pa.Table, pa.RecordBatch, pd.DataFrame]],
+        suffix: Optional[str] = None,
+        checkpoints: Optional[CheckpointStore] = None,
+    ) -> Optional[str]:
+        """
+        Escribe un flujo de lotes en un único Parquet, un row group por lote,
+        con un ParquetWriter abierto: la memoria es O(lote), no O(total).
+        Deduplica por id entre lotes (solo guarda el set de ids vistos).
+
+        Se escribe sobre un fichero oculto y se renombra al cerrar, así nadie
+        lee un Parquet a medias. Devuelve la ruta, o None si no llegó ninguna fila.
+
+        En layout particionado cada lote se escribe por particiones (varios
+        ficheros pequeños; la compactación los agrupa después) y se devuelve
+        dataset_dir, con las rutas en `last_written`.
+
+        `checkpoints` como en save_df: el listing deja su watermark pendiente al
+        agotarse (dentro de este bucle) y se confirma tras el rename final.
+        """
+        with self._committing(checkpoints):
+            if self.partition_by:
+                return self._save_batches_partitioned(batches, suffix)
+            return self._save_batches_flat(batches, suffix)
+
+    def _save_batches_flat(
+        self,
+        batches: Iterable[Union[pa.Table, pa.RecordBatch, pd.DataFrame]],
+        suffix: Optional[str] = None,
+    ) -> Optional[str]:
+        path = self._file_path(suffix)
+        tmp = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.tmp")
+        writer = None
+        seen: Set[str] = set()
+        try:
+            for batch in batches:
+                table = to_table(batch, schema=self.schema)
+                table = self._dedup_table(table, seen)
+                if table.num_rows == 0:
+                    continue
+                # Con registro cada lote (row group) sale ordenado: sus min/max
+                # son estrechos aunque el fichero entero no lo esté
+                table = self._prepare(table)
+                if writer is None:
+                    schema = self.schema or table.schema
+                    writer = open_parquet_writer(tmp, schema, self._parquet_opts(schema))
+                with metrics.span("write_row_group"):
+                    writer.write_table(table.cast(writer.schema), row_group_size=self._row_group_rows)
+                metrics.count("rows_total", table.num_rows, stage="write_row_group")
+        except BaseException:
+            if writer is not None:
+                writer.close()
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+        if writer is None:
+            return None
+        writer.close()
+        metrics.count("parquet_bytes_total", os.path.getsize(tmp))
+        os.replace(tmp, path)
+        self.last_written = [path]
+        return path
+
+    def _save_batches_partitioned(
+        self,
+        batches: Iterable[Union[pa.Table, pa.RecordBatch, pd.DataFrame]],
+        suffix: Optional[str] = None,
+    ) -> Optional[str]:
+        seen: Set[str] = set()
+        written: List[str] = []
+        for batch in batches:
+            table = to_table(batch, schema=self.schema)
+            table = self._dedup_table(table, seen)
+            if table.num_rows:
+                written.extend(self._write_partitioned(table, suffix))
+        self.last_written = written
+        return self.dataset_dir if written else None
+
     def latest_paths(self, n: int = 5) -> List[str]:
-        files = sorted(glob.glob(os.path.join(self.dataset_dir, f"{self.dataset}_*.parquet")))
-        return files[-n:]
+        # Recursivo: vale para layout plano y particionado; orden por nombre (timestamp)
+        files = glob.glob(os.path.join(self.dataset_dir, "**", f"{self.dataset}_*.parquet"), recursive=True)
+        return sorted(files, key=os.path.basename)[-n:]
 
     def scan_paths(self, pattern: str = "*.parquet") -> List[str]:
-        return sorted(glob.glob(os.path.join(self.dataset_dir, pattern)))
+        return sorted(glob.glob(os.path.join(self.dataset_dir, "**", pattern), recursive=True))
 
 # -----------------------------------------------------------
 # DuckDBIndex: vistas que consultan Parquet sin importarlos
@@ -76,17 +379,98 @@ class DuckDBIndex:
     def connect(self):
         return duckdb.connect(self.db_path, read_only=self.read_only)
 
-    def create_view_for_dataset(self, dataset: str, view_name: Optional[str] = None) -> None:
+    def _hive_keys(self, dataset: str) -> List[str]:
+        """
+        Claves de partición en disco (p.ej. ['subreddit', 'date']), o [] si es plano.
+        """
+        keys: List[str] = []
+        d = os.path.join(self.base_dir, dataset)
+        while os.path.isdir(d):
+            subdirs = sorted(x for x in os.listdir(d) if "=" in x and os.path.isdir(os.path.join(d, x)))
+            if not subdirs:
+                break
+            keys.append(subdirs[0].split("=", 1)[0])
+            d = os.path.join(d, subdirs[0])
+        return keys
+
+    def dataset_source(self, dataset: str, hive: Optional[bool] = None) -> str:
+        """
+        Expresión FROM que lee el dataset. En layout Hive usa hive_partitioning,
+        así los filtros sobre las claves (date, subreddit) descartan ficheros enteros.
+        """
+        keys = self._hive_keys(dataset)
+        if hive is None:
+            hive = bool(keys)
+        if hive:
+            pattern = os.path.join(self.base_dir, dataset, "**", f"{dataset}_*.parquet").replace("\\", "/")
+            # Tipos fijos: sin esto un subreddit como '2007' se autodetectaría como entero
+            types = ", ".join(f"'{k}': {'DATE' if k == 'date' else 'VARCHAR'}" for k in keys)
+            hive_types = f", hive_types = {{{types}}}" if types else ""
+            return (
+                f"read_parquet('{pattern}', hive_partitioning = true, "
+                f"union_by_name = true{hive_types})"
+            )
+        pattern = os.path.join(self.base_dir, dataset, f"{dataset}_*.parquet").replace("\\","/")
+        return f"parquet_scan('{pattern}')"
+
+    def view_sql(
+        self,
+        dataset: str,
+        view_name: Optional[str] = None,
+        hive: Optional[bool] = None,
+        latest_only: bool = False,
+    ) -> str:
+        view = view_name or f"vw_{dataset}"
+        sql = f"CREATE OR REPLACE VIEW {view} AS SELECT * FROM {self.dataset_source(dataset, hive)}"
+        if latest_only:
+            sql += " QUALIFY row_number() OVER (PARTITION BY id ORDER BY retrieved_at DESC NULLS LAST) = 1"
+        return sql + ";"
+
+    def create_view_for_dataset(
+        self,
+        dataset: str,
+        view_name: Optional[str] = None,
+        hive: Optional[bool] = None,
+        latest_only: bool = False,
+    ) -> None:
         """
         Crea/actualiza una VIEW que lee todos los parquet de un dataset
         usando parquet_scan(). No duplica datos.
+        hive: None autodetecta el layout particionado (directorios clave=valor).
+        latest_only: una fila por id (la de retrieved_at más reciente), para que
+        crawls solapados o una compactación en curso no dupliquen posts.
         """
-        view = view_name or f"vw_{dataset}"
-        pattern = os.path.join(self.base_dir, dataset, f"{dataset}_*.parquet").replace("\\","/")
-        sql = f"CREATE OR REPLACE VIEW {view} AS SELECT * FROM parquet_scan('{pattern}');"
         with self.connect() as con:
-            con.execute(sql)
+            con.execute(self.view_sql(dataset, view_name, hive, latest_only))
 
     def query(self, sql: str) -> pd.DataFrame:
         with self.connect() as con:
             return con.execute(sql).df()
+
+    def query_arrow(self, sql: str) -> pa.Table:
+        """
+        Resultado como pyarrow.Table, sin pasar por pandas.
+        """
+        with self.connect() as con:
+            return con.execute(sql).fetch_arrow_table()
+
+    def query_batches(self, sql: str, batch_size: int = 64 * 1024) -> pa.RecordBatchReader:
+        """
+        Resultado en streaming (RecordBatchReader): memoria O(batch_size), apto
+        para save_batches() o para iterar resultados grandes. La conexión se
+        cierra al agotar (o abandonar) el reader.
+        """
+        con = self.connect()
+        try:
+            reader = con.execute(sql).fetch_record_batch(batch_size)
+        except BaseException:
+            con.close()
+            raise
+
+        def batches():
+            try:
+                yield from reader
+            finally:
+                con.close()
+
+        return pa.RecordBatchReader.from_batches(reader.schema, batches())
@@ -0,0 +1,298 @@
+# src/storage/trends.py
+"""
+Métricas de tendencia incrementales sobre MaterializedIndex.
+
+Agregados por (subreddit, concepto, bucket) en trend_<dataset>:
+  posts, score_sum, comments_sum, ratio_sum/ratio_n (upvote_ratio),
+  controversy_sum (1 - |2*upvote_ratio - 1|: 1 = votos al 50%, 0 = unánime),
+  sentiment_sum/sentiment_n (si el dataset trae columna 'sentiment').
+
+Un concepto es una lista de términos (p.ej. QueryPlanner.variants()) que se
+busca como palabra completa en title + selftext; '*' es el concepto implícito
+con todos los posts. Se actualiza dentro del mismo refresh() que la tabla
+materializada y solo para los (subreddit, bucket) que traen los ficheros
+nuevos; cambiar los términos de un concepto lo recalcula entero.
+
+Las curvas se leen de los agregados, O(buckets) y no O(posts):
+  volume        posts por bucket (con huecos rellenados a 0)
+  velocity      diferencia de la media móvil de volume entre buckets
+  acceleration  diferencia de velocity
+
+    index = TrendIndex(db_path="data/reddit.duckdb", base_dir="data/curated/reddit")
+    index.set_concepts({"running shoes": ["running shoes", "trainers", "sneakers"]})
+    index.refresh("posts")
+    curve = index.series("running shoes", start="2024-05-01")
+"""
+import json
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+
+from .materialized import MaterializedIndex
+
+ALL_CONCEPT = "*"
+CONCEPTS_TABLE = "_trend_concepts"
+BUCKETS = ("hour", "day", "week")
+
+_RE_SPECIAL = re.compile(r"([\\.^$|?*+()\[\]{}])")
+
+
+def term_pattern(terms: Iterable[str]) -> str:
+    """
+    Regex (RE2, para DuckDB) que casa cualquiera de los términos como palabra
+    completa, sin distinguir mayúsculas (el texto se compara en minúsculas).
+    """
+    alts = []
+    for t in terms:
+        words = [_RE_SPECIAL.sub(r"\\\1", w) for w in t.lower().split()]
+        if words:
+            alts.append(r"\s+".join(words))
+    if not alts:
+        raise ValueError("Un concepto necesita al menos un término")
+    return r"\b(" + "|".join(sorted(set(alts))) + r")\b"
+
+
+def _sql_str(s: str) -> str:
+    return "'" + s.replace("'", "''") + "'"
+
+
+@dataclass
+class TrendIndex(MaterializedIndex):
+    trend_dataset: str = "posts"
+    bucket: str = "hour"
+
+    def __post_init__(self):
+        if self.bucket not in BUCKETS:
+            raise ValueError(f"bucket debe ser uno de {BUCKETS}")
+
+    @staticmethod
+    def trend_name(dataset: str) -> str:
+        return f"trend_{dataset}"
+
+    # ---------------------- Conceptos ----------------------
+
+    def _ensure_concepts(self, con) -> None:
+        con.execute(
+            f"CREATE TABLE IF NOT EXISTS {CONCEPTS_TABLE} "
+            f"(concept VARCHAR PRIMARY KEY, terms VARCHAR NOT NULL, pattern VARCHAR NOT NULL)"
+        )
+
+    def concepts(self) -> Dict[str, str]:
+        con = self.cursor()
+        self._ensure_concepts(con)
+        return dict(con.execute(f"SELECT concept, pattern FROM {CONCEPTS_TABLE} ORDER BY concept").fetchall())
+
+    def set_concepts(self, concepts: Dict[str, Sequence[str]], replace: bool = False) -> List[str]:
+        """
+        Registra conceptos -> términos. Los nuevos o con términos distintos se
+        recalculan sobre toda la tabla; con replace=True se borran los que no
+        estén en `concepts`. Devuelve los conceptos recalculados.
+        """
+        if ALL_CONCEPT in concepts:
+            raise ValueError(f"'{ALL_CONCEPT}' es el concepto implícito (todos los posts)")
+        wanted = {c: term_pattern(terms) for c, terms in concepts.items()}
+        with self._write_lock:
+            con = self.cursor()
+            self._ensure_concepts(con)
+            current = dict(con.execute(f"SELECT concept, pattern FROM {CONCEPTS_TABLE}").fetchall())
+            changed = sorted(c for c, p in wanted.items() if current.get(c) != p)
+            dropped = sorted(set(current) - set(wanted)) if replace else []
+            trend = self.trend_name(self.trend_dataset)
+            has_trend = self._table_exists(con, trend)
+
+            con.execute("BEGIN TRANSACTION")
+            try:
+                for c in changed + dropped:
+                    con.execute(f"DELETE FROM {CONCEPTS_TABLE} WHERE concept = ?", [c])
+                    if has_trend:
+                        con.execute(f"DELETE FROM {trend} WHERE concept = ?", [c])
+                for c in changed:
+                    con.execute(
+                        f"INSERT INTO {CONCEPTS_TABLE} VALUES (?, ?, ?)",
+                        [c, json.dumps(list(concepts[c])), wanted[c]],
+                    )
+                table = self.table_name(self.trend_dataset)
+                if changed and has_trend and self._table_exists(con, table):
+                    con.execute(
+                        f"INSERT INTO {trend} "
+                        f"{self._aggregate_sql(con, table, [(c, wanted[c]) for c in changed], include_all=False)}"
+                    )
+                con.execute("COMMIT")
+            except BaseException:
+                con.execute("ROLLBACK")
+                raise
+        return changed
+
+    # ---------------------- Agregación ----------------------
+
+    def _bucket_expr(self, col: str = "created_utc") -> str:
+        # Buckets UTC: connection() fija TimeZone = 'UTC' (ver MaterializedIndex)
+        return f"date_trunc('{self.bucket}', to_timestamp({col}))"
+
+    def _aggregate_sql(
+        self,
+        con,
+        table: str,
+        concepts: List[Tuple[str, str]],
+        include_all: bool = True,
+        where: str = "",
+    ) -> str:
+        """
+        SELECT con los agregados por (subreddit, concepto, bucket) de `table`.
+        Cada concepto es una rama UNION ALL con su regex constante (DuckDB la
+        compila una vez), sobre un CTE que solo lee las columnas necesarias.
+        """
+        cols = self._columns(con, table)
+
+        def col(name: str, cast: str) -> str:
+            return f"{name}::{cast}" if name in cols else f"NULL::{cast}"
+
+        text = (
+            "lower(coalesce(title, '') || ' ' || coalesce(selftext, ''))"
+            if "title" in cols else "''"
+        )
+        src = (
+            f"SELECT subreddit::VARCHAR AS subreddit, {self._bucket_expr()} AS bucket, "
+            f"{col('score', 'BIGINT')} AS score, {col('num_comments', 'BIGINT')} AS num_comments, "
+            f"{col('upvote_ratio', 'DOUBLE')} AS upvote_ratio, {col('sentiment', 'DOUBLE')} AS sentiment, "
+            f"{text} AS text "
+            f"FROM {table} p WHERE created_utc IS NOT NULL {where}"
+        )
+        branches = [f"SELECT '{ALL_CONCEPT}' AS concept, * FROM _src"] if include_all else []
+        for name, pattern in concepts:
+            branches.append(
+                f"SELECT {_sql_str(name)} AS concept, * FROM _src WHERE regexp_matches(text, {_sql_str(pattern)})"
+            )
+        if not branches:
+            branches = ["SELECT NULL::VARCHAR AS concept, * FROM _src WHERE false"]
+        return (
+            f"WITH _src AS ({src}), _matched AS ({' UNION ALL '.join(branches)}) "
+            f"SELECT subreddit, concept, bucket, COUNT(*) AS posts, "
+            f"SUM(score)::BIGINT AS score_sum, SUM(num_comments)::BIGINT AS comments_sum, "
+            f"SUM(upvote_ratio) AS ratio_sum, COUNT(upvote_ratio) AS ratio_n, "
+            f"SUM(1 - abs(2 * upvote_ratio - 1)) AS controversy_sum, "
+            f"SUM(sentiment) AS sentiment_sum, COUNT(sentiment) AS sentiment_n "
+            f"FROM _matched GROUP BY ALL"
+        )
+
+    def _update_rollup(self, con, dataset: str) -> int:
+        n = super()._update_rollup(con, dataset)
+        if dataset == self.trend_dataset:
+            self._update_trends(con, dataset)
+        return n
+
+    def _update_trends(self, con, dataset: str) -> int:
+        """
+        Recalcula trend_<dataset> para los (subreddit, bucket) presentes en
+        _incoming, todos los conceptos a la vez.
+        """
+        table = self.table_name(dataset)
+        trend = self.trend_name(dataset)
+        if "created_utc" not in self._columns(con, table):
+            return 0
+        self._ensure_concepts(con)
+        concepts = con.execute(f"SELECT concept, pattern FROM {CONCEPTS_TABLE} ORDER BY concept").fetchall()
+
+        if not self._table_exists(con, trend):
+            con.execute(f"CREATE TABLE {trend} AS {self._aggregate_sql(con, table, concepts)}")
+            return con.execute(f"SELECT COUNT(DISTINCT (subreddit, bucket)) FROM {trend}").fetchone()[0]
+
+        con.execute(
+            f"CREATE OR REPLACE TEMP TABLE _trend_touched AS "
+            f"SELECT DISTINCT subreddit::VARCHAR AS subreddit, {self._bucket_expr()} AS bucket "
+            f"FROM _incoming WHERE created_utc IS NOT NULL"
+        )
+        con.execute(
+            f"DELETE FROM {trend} t USING _trend_touched k "
+            f"WHERE t.subreddit IS NOT DISTINCT FROM k.subreddit AND t.bucket = k.bucket"
+        )
+        where = (
+            f"AND EXISTS (SELECT 1 FROM _trend_touched k WHERE k.subreddit IS NOT DISTINCT FROM "
+            f"p.subreddit::VARCHAR AND k.bucket = {self._bucket_expr('p.created_utc')})"
+        )
+        con.execute(f"INSERT INTO {trend} {self._aggregate_sql(con, table, concepts, where=where)}")
+        n = con.execute("SELECT COUNT(*) FROM _trend_touched").fetchone()[0]
+        con.execute("DROP TABLE _trend_touched")
+        return n
+
+    # ---------------------- Lectura ----------------------
+
+    def series(
+        self,
+        concept: str = ALL_CONCEPT,
+        subreddit: Optional[Union[str, Sequence[str]]] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        smooth: int = 3,
+    ) -> pd.DataFrame:
+        """
+        Curva por bucket de un concepto (sumando los subreddits pedidos, o todos):
+        volume, velocity, acceleration, mean_score, mean_comments,
+        mean_upvote_ratio, controversy y sentiment. Los buckets sin posts entre
+        el primero y el último salen con volume 0. `smooth` es la ventana (en
+        buckets) de la media móvil sobre la que se derivan velocity/acceleration.
+        """
+        trend = self.trend_name(self.trend_dataset)
+        filters, params = ["concept = ?"], [concept]
+        if subreddit is not None:
+            subs = [subreddit] if isinstance(subreddit, str) else list(subreddit)
+            filters.append(f"subreddit IN ({', '.join('?' * len(subs))})")
+            params.extend(subs)
+        if start is not None:
+            filters.append("bucket >= ?::TIMESTAMPTZ")
+            params.append(start)
+        if end is not None:
+            filters.append("bucket < ?::TIMESTAMPTZ")
+            params.append(end)
+        preceding = max(smooth, 1) - 1
+        sql = f"""
+            WITH agg AS (
+                SELECT bucket, SUM(posts) AS posts, SUM(score_sum) AS score_sum,
+                       SUM(comments_sum) AS comments_sum, SUM(ratio_sum) AS ratio_sum,
+                       SUM(ratio_n) AS ratio_n, SUM(controversy_sum) AS controversy_sum,
+                       SUM(sentiment_sum) AS sentiment_sum, SUM(sentiment_n) AS sentiment_n
+                FROM {trend} WHERE {' AND '.join(filters)} GROUP BY bucket
+            ),
+            grid AS (
+                SELECT unnest(generate_series(min(bucket), max(bucket), INTERVAL 1 {self.bucket})) AS bucket
+                FROM agg
+            ),
+            filled AS (
+                SELECT g.bucket, COALESCE(a.posts, 0) AS volume, a.*  EXCLUDE (bucket, posts)
+                FROM grid g LEFT JOIN agg a USING (bucket)
+            ),
+            smoothed AS (
+                SELECT *, AVG(volume) OVER (ORDER BY bucket ROWS BETWEEN {preceding} PRECEDING AND CURRENT ROW) AS volume_ma
+                FROM filled
+            ),
+            velocity AS (
+                SELECT *, volume_ma - LAG(volume_ma) OVER (ORDER BY bucket) AS velocity FROM smoothed
+            )
+            SELECT bucket, volume, volume_ma, velocity,
+                   velocity - LAG(velocity) OVER (ORDER BY bucket) AS acceleration,
+                   score_sum / NULLIF(volume, 0) AS mean_score,
+                   comments_sum / NULLIF(volume, 0) AS mean_comments,
+                   ratio_sum / NULLIF(ratio_n, 0) AS mean_upvote_ratio,
+                   controversy_sum / NULLIF(ratio_n, 0) AS controversy,
+                   sentiment_sum / NULLIF(sentiment_n, 0) AS sentiment
+            FROM velocity ORDER BY bucket
+        """
+        return self.cursor().execute(sql, params).df()
+
+    def leaders(self, bucket: str, concept: str = ALL_CONCEPT, by: str = "posts", n: int = 20) -> pd.DataFrame:
+        """
+        Subreddits con más `by` (posts | score_sum | comments_sum | controversy_sum)
+        en un bucket concreto: lectura directa de trend_<dataset>. `bucket` sin
+        zona horaria ('2024-05-01') se interpreta en UTC.
+        """
+        if by not in ("posts", "score_sum", "comments_sum", "controversy_sum"):
+            raise ValueError(f"by no válido: {by}")
+        trend = self.trend_name(self.trend_dataset)
+        return self.cursor().execute(
+            f"SELECT subreddit, posts, score_sum, comments_sum, controversy_sum / NULLIF(ratio_n, 0) AS controversy "
+            f"FROM {trend} WHERE concept = ? AND bucket = date_trunc('{self.bucket}', ?::TIMESTAMPTZ) "
+            f"ORDER BY {by} DESC LIMIT ?",
+            [concept, bucket, n],
+        ).df()
@@ -0,0 +1,231 @@
+# src/transform/arrow_normalizers.py
+"""
+Normalización columnar de posts: construye arrays pyarrow directamente desde los
+children del listing y limpia/castea en bloque con kernels de pyarrow.compute.
+
+Equivale a normalizers.normalize_posts (mismas columnas, mismos valores), pero:
+  - una sola pasada de limpieza por string (no dos),
+  - html.unescape solo en las filas con entidades poco comunes,
+  - casts numéricos en bloque (con fallback por elemento solo si hay basura),
+  - un único time.time() por lote.
+
+Tipos: normalize_posts_table emite los del registro (storage.schemas, lo que
+acaba en Parquet: int32, diccionarios...). normalize_posts_arrow, que sustituye
+a normalize_posts, devuelve exactamente los dtypes de la vía por filas.
+"""
+import html
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from src import metrics
+from src.storage.schemas import COMMENTS_ARROW_SCHEMA, POSTS_ARROW_SCHEMA  # tipos canónicos (registro v1)
+from .normalizers import USEFUL_COLS, _to_float, _bool, _post_dtypes
+
+# Entidades habituales en Reddit; '&amp;' va la última para no desescapar dos veces
+_COMMON_ENTITIES = [
+    ("&lt;", "<"),
+    ("&gt;", ">"),
+    ("&quot;", '"'),
+    ("&#39;", "'"),
+    ("&#x200B;", "\u200b"),
+    ("&amp;", "&"),
+]
+_COMMON_ENTITIES_RE = r"&(lt|gt|quot|#39|#x200B|amp);"
+
+# ---------------------- Construcción de arrays ----------------------
+
+def _strict_array(values: List, typ: pa.DataType, fallback: Callable) -> pa.Array:
+    """
+    Intenta el cast en bloque; si hay valores de tipo inesperado, limpia
+    elemento a elemento con la misma función que el normalizador por filas.
+    """
+    try:
+        return pa.array(values, type=typ)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, ValueError, OverflowError):
+        return pa.array([fallback(v) for v in values], type=typ)
+
+
+def _str_or_none(v) -> Optional[str]:
+    return v if isinstance(v, str) and v else None
+
+
+def _as_str(v) -> Optional[str]:
+    return v if isinstance(v, str) else None
+
+
+def _int_array(values: List, typ: pa.DataType) -> pa.Array:
+    # float64 primero: Reddit manda created_utc como 1700000000.0
+    arr = _strict_array(values, pa.float64(), _to_float)
+    # pc.cast con safe=False trunca hacia cero, igual que int(x)
+    return pc.cast(arr, typ, safe=False)
+
+
+# ---------------------- Limpieza de texto ----------------------
+
+def _unescape(arr: pa.Array) -> pa.Array:
+    """
+    html.unescape sobre filas que contienen '&'. Si solo llevan entidades
+    comunes, reemplazo en bloque; si no, html.unescape exacto (son pocas).
+    """
+    stripped = pc.replace_substring_regex(arr, _COMMON_ENTITIES_RE, "")
+    rare = pc.fill_null(pc.match_substring(stripped, "&"), False)
+
+    unescaped = arr
+    for ent, ch in _COMMON_ENTITIES:
+        unescaped = pc.replace_substring(unescaped, ent, ch)
+
+    if not pc.any(rare).as_py():
+        return unescaped
+    exact = pa.array([html.unescape(v) for v in arr.filter(rare).to_pylist()], type=pa.string())
+    return pc.replace_with_mask(unescaped, rare, exact)
+
+
+def clean_text_array(arr: pa.Array) -> pa.Array:
+    """
+    Versión vectorizada de normalizers._clean_text:
+    html.unescape -> colapsar espacios -> strip -> '' a null.
+    """
+    arr = pc.cast(arr, pa.string())
+    if len(arr) == 0:
+        return arr
+
+    # Solo las filas con '&' pueden llevar entidades
+    has_amp = pc.fill_null(pc.match_substring(arr, "&"), False)
+    if pc.any(has_amp).as_py():
+        arr = pc.replace_with_mask(arr, has_amp, _unescape(arr.filter(has_amp)))
+
+    # split + join por espacios Unicode (+ trim de los bordes vacíos)
+    # == re.sub(r"\s+", " ", s).strip()
+    arr = pc.utf8_trim(pc.binary_join(pc.utf8_split_whitespace(arr), " "), " ")
+    return pc.if_else(pc.equal(arr, ""), pa.scalar(None, pa.string()), arr)
+
+
+def _permalink_array(values: List) -> pa.Array:
+    arr = _strict_array(values, pa.string(), _as_str)
+    arr = pc.if_else(pc.equal(arr, ""), pa.scalar(None, pa.string()), arr)
+    absolute = pc.binary_join_element_wise("https://reddit.com", arr, "")
+    return pc.if_else(pc.fill_null(pc.starts_with(arr, "http"), True), arr, absolute)
+
+
+# ---------------------- API ----------------------
+
+@metrics.timed("normalize_posts_table", rows=lambda t: t.num_rows)
+def normalize_posts_table(items: Iterable[Dict]) -> pa.Table:
+    """
+    Lista de posts crudos (dicts del listing, envueltos o no en 'data')
+    -> pyarrow.Table con POSTS_ARROW_SCHEMA, sin ids nulos ni duplicados.
+    """
+    recs = [d.get("data", d) for d in items]
+    n = len(recs)
+
+    def col(name: str) -> List:
+        return [r.get(name) for r in recs]
+
+    arrays = {
+        "id": _strict_array(col("id"), pa.string(), _str_or_none),
+        "subreddit": _strict_array(col("subreddit"), pa.string(), _str_or_none),
+        "author": _strict_array(col("author"), pa.string(), _str_or_none),
+        "title": clean_text_array(_strict_array(col("title"), pa.string(), _as_str)),
+        "selftext": clean_text_array(_strict_array(col("selftext"), pa.string(), _as_str)),
+        "created_utc": _int_array(col("created_utc"), pa.int64()),
+        "num_comments": _int_array(col("num_comments"), pa.int32()),
+        "score": _int_array(col("score"), pa.int32()),
+        "upvote_ratio": pc.cast(_strict_array(col("upvote_ratio"), pa.float64(), _to_float), pa.float32()),
+        "url": clean_text_array(_strict_array(col("url"), pa.string(), _as_str)),
+        "permalink": clean_text_array(_permalink_array(col("permalink"))),
+        "over_18": _strict_array(col("over_18"), pa.bool_(), _bool),
+        "is_self": _strict_array(col("is_self"), pa.bool_(), _bool),
+        "domain": _strict_array(col("domain"), pa.string(), _as_str),
+        "link_flair_text": _strict_array(col("link_flair_text"), pa.string(), _as_str),
+        "subreddit_subscribers": _int_array(col("subreddit_subscribers"), pa.int32()),
+        "retrieved_at": pa.array([int(time.time())] * n, type=pa.int64()),
+        "source": pa.array(["reddit"] * n, type=pa.string()),
+    }
+    # '' -> null en las columnas de identidad (como normalize_post_dict)
+    for c in ("id", "subreddit", "author"):
+        arrays[c] = pc.if_else(pc.equal(arrays[c], ""), pa.scalar(None, pa.string()), arrays[c])
+
+    table = pa.table([arrays[f.name] for f in POSTS_ARROW_SCHEMA], names=POSTS_ARROW_SCHEMA.names)
+
+    # Sin id -> fuera; duplicados -> se queda el primero
+    table = table.filter(pc.is_valid(table["id"]))
+    if table.num_rows:
+        dup = table["id"].to_pandas().duplicated(keep="first").to_numpy()
+        if dup.any():
+            table = table.filter(pa.array(~dup))
+
+    return table.cast(POSTS_ARROW_SCHEMA)
+
+
+@metrics.timed("normalize_comments_table", rows=lambda t: t.num_rows)
+def normalize_comments_table(items: Iterable[Dict]) -> pa.Table:
+    """
+    Comentarios crudos (t1 aplanados por CommentTreeWalk, envueltos o no en 'data')
+    -> pyarrow.Table con COMMENTS_ARROW_SCHEMA, sin ids nulos ni duplicados.
+    """
+    recs = [d.get("data", d) for d in items]
+    n = len(recs)
+
+    def col(name: str) -> List:
+        return [r.get(name) for r in recs]
+
+    link_ids = _strict_array(col("link_id"), pa.string(), _as_str)
+    arrays = {
+        "id": _strict_array(col("id"), pa.string(), _str_or_none),
+        "link_id": pc.replace_substring_regex(link_ids, "^t3_", ""),
+        "parent_id": _strict_array(col("parent_id"), pa.string(), _str_or_none),
+        "subreddit": _strict_array(col("subreddit"), pa.string(), _str_or_none),
+        "author": _strict_array(col("author"), pa.string(), _str_or_none),
+        "body": clean_text_array(_strict_array(col("body"), pa.string(), _as_str)),
+        "created_utc": _int_array(col("created_utc"), pa.int64()),
+        "score": _int_array(col("score"), pa.int32()),
+        "depth": _int_array(col("depth"), pa.int16()),
+        "controversiality": _int_array(col("controversiality"), pa.int8()),
+        "is_submitter": _strict_array(col("is_submitter"), pa.bool_(), _bool),
+        "stickied": _strict_array(col("stickied"), pa.bool_(), _bool),
+        "distinguished": _strict_array(col("distinguished"), pa.string(), _as_str),
+        "retrieved_at": pa.array([int(time.time())] * n, type=pa.int64()),
+        "source": pa.array(["reddit"] * n, type=pa.string()),
+    }
+    for c in ("id", "subreddit", "author"):
+        arrays[c] = pc.if_else(pc.equal(arrays[c], ""), pa.scalar(None, pa.string()), arrays[c])
+
+    table = pa.table([arrays[f.name] for f in COMMENTS_ARROW_SCHEMA], names=COMMENTS_ARROW_SCHEMA.names)
+    table = table.filter(pc.is_valid(table["id"]))
+    if table.num_rows:
+        dup = table["id"].to_pandas().duplicated(keep="first").to_numpy()
+        if dup.any():
+            table = table.filter(pa.array(~dup))
+    return table.cast(COMMENTS_ARROW_SCHEMA)
+
+
+def normalize_posts_arrow(items: Iterable[Dict]) -> pd.DataFrame:
+    """
+    Igual que normalize_posts pero por la vía columnar, con sus mismos dtypes
+    (enteros con downcast, 'category' con las categorías ordenadas...): los
+    diccionarios se decodifican y se pasan por el mismo _post_dtypes.
+    """
+    table = normalize_posts_table(items)
+    cols = [c for c in USEFUL_COLS + ["retrieved_at", "source"] if c in table.column_names]
+    table = table.select(cols)
+    for i, f in enumerate(table.schema):
+        if pa.types.is_dictionary(f.type):
+            table = table.set_column(i, f.name, pc.cast(table[f.name], f.type.value_type))
+    return _post_dtypes(table.to_pandas())
+
+
+def _pandas_types(typ: pa.DataType):
+    if pa.types.is_boolean(typ):
+        return pd.BooleanDtype()
+    if pa.types.is_integer(typ):
+        return {
+            pa.int8(): pd.Int8Dtype(),
+            pa.int16(): pd.Int16Dtype(),
+            pa.int32(): pd.Int32Dtype(),
+            pa.int64(): pd.Int64Dtype(),
+        }.get(typ)
+    return None
@@ -0,0 +1,393 @@
+# src/transform/embeddings.py
+"""
+Embeddings de posts con caché en disco direccionada por contenido.
+
+  1) Texto a codificar = title + selftext (recortado a max_chars). Su hash
+     (blake2b de 16 bytes) es la clave: el mismo texto en posts distintos, o en
+     días distintos, se codifica una sola vez.
+  2) EmbeddingStore: matriz (filas x dim) en un fichero memmap float16/float32
+     + índice SQLite hash -> fila. Solo se leen las filas que se piden.
+  3) EmbeddingStage: deduplica el lote por hash, busca en el store y codifica
+     solo los fallos, ordenados por longitud y en lotes con un tope de
+     caracteres (lotes de textos parecidos = poco relleno en el modelo).
+
+El codificador es enchufable (Encoder): SentenceTransformerEncoder para el
+modelo real, HashingEncoder (solo NumPy, determinista) para pruebas y
+máquinas sin modelo.
+
+    store = EmbeddingStore("data/state/embeddings", dim=384, dtype="float16", model="all-MiniLM-L6-v2")
+    stage = EmbeddingStage(SentenceTransformerEncoder(), store)
+    table = annotate_embeddings(table, stage)      # añade emb_row
+    vecs = store.get(table["emb_row"].to_numpy())
+"""
+import hashlib
+import os
+import re
+import threading
+import zlib
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Protocol, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from src._sqlite import open_sqlite
+
+MAX_CHARS = 2000
+BATCH_SIZE = 64
+MAX_BATCH_CHARS = 64 * 512
+
+_WS_RE = re.compile(r"\s+")
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+# ---------------------- Texto y claves ----------------------
+
+def embedding_text(title: Optional[str], selftext: Optional[str], max_chars: int = MAX_CHARS) -> str:
+    """
+    Texto que se codifica: título y cuerpo con espacios colapsados, recortado.
+    """
+    s = f"{title or ''}\n{selftext or ''}"
+    return _WS_RE.sub(" ", s).strip()[:max_chars]
+
+
+def content_hash(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def length_buckets(
+    lengths: Sequence[int],
+    batch_size: int = BATCH_SIZE,
+    max_batch_chars: int = MAX_BATCH_CHARS,
+) -> Iterator[List[int]]:
+    """
+    Índices agrupados en lotes de longitud parecida: se ordena por longitud y se
+    corta al llegar a batch_size o cuando (tamaño del lote x texto más largo)
+    superaría max_batch_chars, que es lo que cuesta un lote con relleno.
+    """
+    batch: List[int] = []
+    for i in sorted(range(len(lengths)), key=lambda k: lengths[k]):
+        longest = max(lengths[i], 1)
+        if batch and (len(batch) >= batch_size or (len(batch) + 1) * longest > max_batch_chars):
+            yield batch
+            batch = []
+        batch.append(i)
+    if batch:
+        yield batch
+
+
+# ---------------------- Codificadores ----------------------
+
+class Encoder(Protocol):
+    name: str
+    dim: int
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """(len(texts), dim) float32."""
+        ...
+
+
+class HashingEncoder:
+    """
+    Vectorizador por hashing de unigramas y bigramas (con signo), normalizado L2.
+    Sin modelo ni dependencias: sirve para pruebas y como base barata.
+    """
+
+    def __init__(self, dim: int = 256, seed: int = 0):
+        self.dim = dim
+        self.seed = seed
+        self.name = f"hashing-{dim}-{seed}"
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        seed = self.seed
+        for row, text in enumerate(texts):
+            toks = _TOKEN_RE.findall(text.lower())
+            feats = toks + [f"{a} {b}" for a, b in zip(toks, toks[1:])]
+            if not feats:
+                continue
+            h = np.fromiter((zlib.crc32(f.encode("utf-8"), seed) for f in feats), dtype=np.uint32, count=len(feats))
+            sign = np.where(h & np.uint32(1 << 31), -1.0, 1.0).astype(np.float32)
+            np.add.at(out[row], (h % np.uint32(self.dim)).astype(np.intp), sign)
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        np.divide(out, norms, out=out, where=norms > 0)
+        return out
+
+
+class SentenceTransformerEncoder:
+    """
+    Sentence-Transformers en CPU (se importa al crear el codificador, no al
+    importar este módulo). Embeddings normalizados L2.
+    """
+
+    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2", device: str = "cpu"):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "SentenceTransformerEncoder necesita `pip install sentence-transformers`"
+            ) from e
+        self.model = SentenceTransformer(model_name, device=device)
+        self.name = model_name
+        self.dim = int(self.model.get_sentence_embedding_dimension())
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        vecs = self.model.encode(
+            texts, batch_size=len(texts), convert_to_numpy=True,
+            normalize_embeddings=True, show_progress_bar=False,
+        )
+        return np.asarray(vecs, dtype=np.float32)
+
+
+# ---------------------- Store en disco ----------------------
+
+class EmbeddingStore:
+    """
+    Directorio con:
+      - vectors.bin : matriz memmap (capacidad x dim) del dtype elegido; crece
+        duplicando la capacidad.
+      - index.sqlite: hash -> fila, y meta (dim, dtype, model, rows).
+
+    Los vectores se escriben y se vuelcan a disco ANTES de registrar sus hashes,
+    así un corte a mitad nunca deja un hash apuntando a una fila sin escribir.
+    Pensado para un único proceso escritor (lock interno para hilos).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        dim: int,
+        dtype: str = "float16",
+        model: str = "",
+        initial_capacity: int = 1024,
+    ):
+        if dtype not in ("float16", "float32"):
+            raise ValueError("dtype debe ser 'float16' o 'float32'")
+        self.path = path
+        self._lock = threading.Lock()
+        self._con = open_sqlite(os.path.join(path, "index.sqlite"))
+        self._con.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._con.execute("CREATE TABLE IF NOT EXISTS keys (hash BLOB PRIMARY KEY, row INTEGER NOT NULL) WITHOUT ROWID")
+        self._check_meta(dim, dtype, model)
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.model = model
+        self.rows = int(self._meta("rows") or 0)
+        self._file = os.path.join(path, "vectors.bin")
+        self._mm: Optional[np.memmap] = None
+        self._open(max(initial_capacity, self.rows))
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._con.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _check_meta(self, dim: int, dtype: str, model: str) -> None:
+        stored = {k: self._meta(k) for k in ("dim", "dtype", "model")}
+        if stored["dim"] is None:
+            self._con.executemany(
+                "INSERT INTO meta VALUES (?, ?)", [("dim", str(dim)), ("dtype", dtype), ("model", model), ("rows", "0")]
+            )
+            return
+        if (int(stored["dim"]), stored["dtype"], stored["model"]) != (dim, dtype, model):
+            raise ValueError(
+                f"El store {self.path} es de dim={stored['dim']} dtype={stored['dtype']} "
+                f"model={stored['model']!r}; no se pueden mezclar embeddings de otro modelo"
+            )
+
+    def _open(self, capacity: int) -> None:
+        row_bytes = self.dim * self.dtype.itemsize
+        size = os.path.getsize(self._file) if os.path.exists(self._file) else 0
+        if size < capacity * row_bytes:
+            with open(self._file, "ab") as f:
+                f.truncate(capacity * row_bytes)
+            size = capacity * row_bytes
+        if self._mm is not None:
+            self._mm.flush()
+            del self._mm
+        self._mm = np.memmap(self._file, dtype=self.dtype, mode="r+", shape=(size // row_bytes, self.dim))
+
+    @property
+    def capacity(self) -> int:
+        return self._mm.shape[0]
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def lookup(self, hashes: Sequence[bytes]) -> np.ndarray:
+        """
+        Fila de cada hash, o -1 si no está.
+        """
+        out = np.full(len(hashes), -1, dtype=np.int64)
+        pos = {h: i for i, h in enumerate(hashes)}
+        keys = list(pos)
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                marks = ",".join("?" * len(chunk))
+                for h, row in self._con.execute(f"SELECT hash, row FROM keys WHERE hash IN ({marks})", chunk):
+                    out[pos[h]] = row
+        # Hashes repetidos en la entrada
+        if len(pos) != len(hashes):
+            out = out[[pos[h] for h in hashes]]
+        return out
+
+    def add(self, hashes: Sequence[bytes], vectors: np.ndarray) -> np.ndarray:
+        """
+        Añade vectores nuevos (hashes no presentes) y devuelve sus filas.
+        """
+        n = len(hashes)
+        if vectors.shape != (n, self.dim):
+            raise ValueError(f"Se esperaban vectores ({n}, {self.dim}), llegó {vectors.shape}")
+        with self._lock:
+            start = self.rows
+            if start + n > self.capacity:
+                cap = self.capacity
+                while cap < start + n:
+                    cap *= 2
+                self._open(cap)
+            self._mm[start:start + n] = vectors.astype(self.dtype, copy=False)
+            self._mm.flush()
+            rows = np.arange(start, start + n, dtype=np.int64)
+            self._con.execute("BEGIN")
+            try:
+                self._con.executemany(
+                    "INSERT INTO keys VALUES (?, ?)", zip(hashes, rows.tolist())
+                )
+                self._con.execute("UPDATE meta SET value = ? WHERE key = 'rows'", (str(start + n),))
+                self._con.execute("COMMIT")
+            except BaseException:
+                self._con.execute("ROLLBACK")
+                raise
+            self.rows = start + n
+        return rows
+
+    def get(self, rows: Union[Sequence[int], np.ndarray]) -> np.ndarray:
+        """
+        Vectores (float32) de las filas pedidas; -1 da una fila de NaN.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        out = np.full((len(rows), self.dim), np.nan, dtype=np.float32)
+        ok = rows >= 0
+        if ok.any():
+            out[ok] = self._mm[rows[ok]]
+        return out
+
+    def close(self) -> None:
+        with self._lock:
+            if self._mm is not None:
+                self._mm.flush()
+                self._mm = None
+            self._con.close()
+
+    def __enter__(self) -> "EmbeddingStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+# ---------------------- Etapa ----------------------
+
+@dataclass
+class EmbeddingStats:
+    texts: int = 0
+    unique: int = 0
+    hits: int = 0
+    encoded: int = 0
+    batches: int = 0
+    chars: int = 0
+    padded_chars: int = 0   # sum(tamaño lote x texto más largo): coste con relleno
+
+    def summary(self) -> str:
+        pad = self.chars / self.padded_chars if self.padded_chars else 1.0
+        return (
+            f"{self.texts} textos, {self.unique} únicos, {self.hits} en caché, "
+            f"{self.encoded} codificados en {self.batches} lotes (aprovechamiento {pad:.0%})"
+        )
+
+
+class EmbeddingStage:
+    def __init__(
+        self,
+        encoder: Encoder,
+        store: EmbeddingStore,
+        batch_size: int = BATCH_SIZE,
+        max_batch_chars: int = MAX_BATCH_CHARS,
+    ):
+        if encoder.dim != store.dim:
+            raise ValueError(f"El codificador da dim={encoder.dim} y el store espera {store.dim}")
+        self.encoder = encoder
+        self.store = store
+        self.batch_size = batch_size
+        self.max_batch_chars = max_batch_chars
+        self.stats = EmbeddingStats()
+
+    def rows(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Fila del store de cada texto; codifica y guarda los que falten.
+        """
+        keys = [content_hash(t) for t in texts]
+        first = {}
+        for i, k in enumerate(keys):
+            first.setdefault(k, i)
+        uniq = list(first)
+        found = self.store.lookup(uniq)
+
+        st = self.stats
+        st.texts += len(texts)
+        st.unique += len(uniq)
+        st.hits += int((found >= 0).sum())
+
+        miss = np.flatnonzero(found < 0)
+        if len(miss):
+            miss_texts = [texts[first[uniq[j]]] for j in miss]
+            lengths = [len(t) for t in miss_texts]
+            for bucket in length_buckets(lengths, self.batch_size, self.max_batch_chars):
+                vecs = self.encoder.encode([miss_texts[b] for b in bucket])
+                found[miss[bucket]] = self.store.add([uniq[miss[b]] for b in bucket], vecs)
+                st.encoded += len(bucket)
+                st.batches += 1
+                st.chars += sum(lengths[b] for b in bucket)
+                st.padded_chars += len(bucket) * max(lengths[b] for b in bucket)
+
+        by_key = dict(zip(uniq, found.tolist()))
+        return np.fromiter((by_key[k] for k in keys), dtype=np.int64, count=len(keys))
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        return self.store.get(self.rows(texts))
+
+
+def _post_texts(data: Union[pa.Table, pd.DataFrame], text_cols: Tuple[str, str], max_chars: int) -> List[str]:
+    title_col, body_col = text_cols
+    if isinstance(data, pa.Table):
+        n = data.num_rows
+        titles = data[title_col].to_pylist() if title_col in data.column_names else [None] * n
+        bodies = data[body_col].to_pylist() if body_col in data.column_names else [None] * n
+    else:
+        n = len(data)
+        titles = data[title_col].tolist() if title_col in data.columns else [None] * n
+        bodies = data[body_col].tolist() if body_col in data.columns else [None] * n
+    return [embedding_text(t if isinstance(t, str) else None, b if isinstance(b, str) else None, max_chars)
+            for t, b in zip(titles, bodies)]
+
+
+def annotate_embeddings(
+    data: Union[pa.Table, pd.DataFrame],
+    stage: EmbeddingStage,
+    text_cols: Tuple[str, str] = ("title", "selftext"),
+    max_chars: int = MAX_CHARS,
+) -> Union[pa.Table, pd.DataFrame]:
+    """
+    Añade la columna 'emb_row' (fila del EmbeddingStore). Los vectores se leen
+    después con stage.store.get(...). Acepta y devuelve pyarrow.Table o DataFrame.
+    """
+    rows = stage.rows(_post_texts(data, text_cols, max_chars))
+    if isinstance(data, pa.Table):
+        col = pa.array(rows, type=pa.int64())
+        if "emb_row" in data.column_names:
+            return data.set_column(data.column_names.index("emb_row"), "emb_row", col)
+        return data.append_column("emb_row", col)
+    out = data.copy()
+    out["emb_row"] = rows
+    return out
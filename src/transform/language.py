@@ -0,0 +1,395 @@
+# src/transform/language.py
+"""
+Detección de idioma por lotes, repartida en varios procesos.
+
+  1) Texto a clasificar = title + selftext (o body) recortado a max_chars, en
+     minúsculas y sin URLs, markdown ni marcadores de borrado ([removed],
+     [deleted]): lo que confunde al detector sin aportar idioma.
+  2) Detector enchufable (LanguageDetector): StopwordDetector (palabras
+     funcionales de es/en/pt/fr/de/it, sin dependencias ni modelo) o
+     FastTextDetector (lid.176 de fastText, 176 idiomas).
+  3) LanguageStage reparte cada lote en shards entre un Pool de procesos. Los
+     textos no se serializan con pickle: el lote se escribe una vez como
+     fichero Arrow IPC en memoria compartida (/dev/shm) y cada worker lo mapea
+     sin copiar y lee su shard; devuelve lang/lang_conf como buffers Arrow.
+     Lotes pequeños (< min_parallel_rows) se procesan en el propio proceso.
+
+Añade las columnas 'lang' (ISO 639-1, 'und' si no hay evidencia) y
+'lang_conf' (0-1) y, con `keep`, descarta en el mismo paso las filas de otros
+idiomas para que dedup, embeddings y escritura no las procesen.
+
+    with LanguageStage(workers=4, keep=("es", "en")) as stage:
+        for table in iter_post_tables(posts):
+            table = stage.process(table)        # + lang, lang_conf; sin otros idiomas
+    print(stage.stats.summary())
+"""
+import functools
+import math
+import os
+import re
+import tempfile
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Protocol, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from src import metrics
+
+UNDETERMINED = "und"
+MAX_CHARS = 1000
+SHARD_ROWS = 512
+MIN_PARALLEL_ROWS = 2048
+
+_URL_RE = re.compile(r"https?://\S+|www\.\S+|/?[ru]/\w+")
+_MARKDOWN_RE = re.compile(r"\[(removed|deleted)\]|[*_~`>#|\[\]()]+|&\w+;")
+_WORD_RE = re.compile(r"[^\W\d_]+")
+
+# Palabras funcionales más frecuentes de cada idioma. Las compartidas (de, a,
+# que, en...) reparten su peso entre los idiomas que las tienen.
+STOPWORDS: Dict[str, str] = {
+    "es": "de la que el en y los del se las por un para con no una su al lo como más pero sus le ya "
+          "o este sí porque esta entre cuando muy sin sobre también me hasta hay donde desde todo nos "
+          "todos les ni otros ese eso esto yo otro otra él tanto esa estos mucho nada muchos poco ella "
+          "estar estas algo es son está están tengo tiene hace puedo alguien saben mejor gracias",
+    "en": "the be to of and a in that have i it for not on with he as you do at this but his by from "
+          "they we say her she or an will my one all would there their what so up out if about who get "
+          "which go me when make can like no just him know take people into your some could them than "
+          "then now only its over think also after how our well even want because any these is are was "
+          "were has had been does anyone thanks",
+    "pt": "de a o que e do da em um para é com não uma os no se na por mais as dos como mas foi ao ele "
+          "das tem à seu sua ou ser quando muito há nos já está eu também só pelo pela até isso ela entre "
+          "era depois sem mesmo aos ter seus quem nas esse eles estão você tinha foram essa num nem suas "
+          "meu às minha têm numa pelos elas qual nós tenho lhe deles essas esses pelas este dele obrigado",
+    "fr": "de la le et les des en un du une que est pour qui dans par plus pas au sur ne se ce il sont "
+          "avec ou son aux je nous vous mais été ses elle on cette leur ont y sa fait comme tout bien sans "
+          "même aussi très peut merci avez suis",
+    "de": "der die und in den von zu das mit sich des auf für ist im dem nicht ein eine als auch es an "
+          "werden aus er hat dass sie nach wird bei einer um am sind noch wie einem über einen so zum war "
+          "haben nur oder aber vor zur bis mehr durch man sehr ich habe kann jemand danke",
+    "it": "di e il la che in a per un è del non una con i le si da sono al lo come più ma anche della "
+          "delle dei ha nel alla questo ci se gli mi io ho suo sua molto qualcuno grazie sei",
+}
+# Caracteres casi exclusivos de un idioma (cuentan como una palabra más)
+CHAR_HINTS: Dict[str, str] = {"es": "ñ¿¡", "pt": "ãõ", "de": "ßäöü", "fr": "œêû", "it": "ì"}
+
+
+# ---------------------- Texto ----------------------
+
+def detection_text(title: Optional[str], body: Optional[str], max_chars: int = MAX_CHARS) -> str:
+    """
+    Texto que se clasifica: sin URLs, markdown ni [removed]/[deleted], en minúsculas.
+    """
+    s = f"{title or ''} {body or ''}"[: max_chars * 2]
+    s = _MARKDOWN_RE.sub(" ", _URL_RE.sub(" ", s))
+    return s.lower()[:max_chars]
+
+
+def detection_text_array(title: pa.Array, body: Optional[pa.Array] = None, max_chars: int = MAX_CHARS) -> pa.Array:
+    """
+    Versión vectorizada de detection_text (kernels de pyarrow.compute, sin el GIL).
+    """
+    empty = pa.scalar("", pa.string())
+    s = pc.fill_null(pc.cast(title, pa.string()), empty)
+    if body is not None:
+        s = pc.binary_join_element_wise(s, pc.fill_null(pc.cast(body, pa.string()), empty), " ")
+    s = pc.utf8_slice_codeunits(s, 0, max_chars * 2)
+    s = pc.replace_substring_regex(s, _URL_RE.pattern, " ")
+    s = pc.replace_substring_regex(s, _MARKDOWN_RE.pattern, " ")
+    return pc.utf8_slice_codeunits(pc.utf8_lower(s), 0, max_chars)
+
+
+# ---------------------- Detectores ----------------------
+
+class LanguageDetector(Protocol):
+    name: str
+
+    def detect(self, texts: List[str]) -> Tuple[List[str], np.ndarray]:
+        """(códigos ISO 639-1 o 'und', confianza float32 en [0, 1])."""
+        ...
+
+
+class StopwordDetector:
+    """
+    Cuenta palabras funcionales de cada idioma (más algunos caracteres
+    distintivos). Confianza = cuota del idioma ganador x evidencia
+    (1 - e^(-palabras/3)): un título de dos palabras nunca llega a 0.5.
+    Sin modelo ni dependencias; suficiente para separar es/en/pt/fr/de/it.
+    """
+
+    def __init__(self, languages: Optional[Sequence[str]] = None):
+        self.languages = tuple(languages or STOPWORDS)
+        unknown = [l for l in self.languages if l not in STOPWORDS]
+        if unknown:
+            raise ValueError(f"Sin lista de palabras para {unknown}; disponibles: {sorted(STOPWORDS)}")
+        owners: Dict[str, List[int]] = {}
+        for i, lang in enumerate(self.languages):
+            for w in set(STOPWORDS[lang].split()):
+                owners.setdefault(w, []).append(i)
+        # palabra -> ((idioma, peso), ...): una compartida por k idiomas pesa 1/k en cada uno
+        self.weights = {w: tuple((i, 1 / len(idx)) for i in idx) for w, idx in owners.items()}
+        self.hints = {
+            ch: i for i, lang in enumerate(self.languages) for ch in CHAR_HINTS.get(lang, "")
+        }
+        self.name = "stopwords-" + "-".join(self.languages)
+
+    def detect(self, texts: List[str]) -> Tuple[List[str], np.ndarray]:
+        n_lang = len(self.languages)
+        langs: List[str] = []
+        conf = np.zeros(len(texts), dtype=np.float32)
+        # Bucle en Python puro: con 6 idiomas, listas y tuplas son ~2x más
+        # rápidas que operar con arrays de NumPy palabra a palabra
+        get, findall, hints = self.weights.get, _WORD_RE.findall, self.hints.items()
+        for row, text in enumerate(texts):
+            scores = [0.0] * n_lang
+            for w in findall(text):
+                owners = get(w)
+                if owners:
+                    for i, wt in owners:
+                        scores[i] += wt
+            for ch, i in hints:
+                if ch in text:
+                    scores[i] += 1
+            total = sum(scores)
+            if not total:
+                langs.append(UNDETERMINED)
+                continue
+            best = max(range(n_lang), key=scores.__getitem__)
+            langs.append(self.languages[best])
+            conf[row] = scores[best] / total * (1 - math.exp(-total / 3))
+        return langs, conf
+
+
+class FastTextDetector:
+    """
+    Modelo lid.176 de fastText (.bin o .ftz). El modelo se carga en cada proceso
+    la primera vez que se usa (no viaja en pickle al Pool).
+    """
+
+    def __init__(self, model_path: str):
+        try:
+            import fasttext  # noqa: F401
+        except ImportError as e:
+            raise ImportError("FastTextDetector necesita `pip install fasttext`") from e
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(
+                f"{model_path}: descarga lid.176.ftz de https://fasttext.cc/docs/en/language-identification.html"
+            )
+        self.model_path = model_path
+        self.name = f"fasttext-{os.path.basename(model_path)}"
+        self._model = None
+
+    def __getstate__(self) -> Dict:
+        return {**self.__dict__, "_model": None}
+
+    def detect(self, texts: List[str]) -> Tuple[List[str], np.ndarray]:
+        if self._model is None:
+            import fasttext
+            self._model = fasttext.load_model(self.model_path)
+        labels, probs = self._model.predict([t.replace("\n", " ") for t in texts], k=1)
+        langs = [l[0].replace("__label__", "") if l and t.strip() else UNDETERMINED for l, t in zip(labels, texts)]
+        conf = np.array([p[0] if len(p) else 0.0 for p in probs], dtype=np.float32)
+        conf[[i for i, l in enumerate(langs) if l == UNDETERMINED]] = 0.0
+        return langs, conf
+
+
+# ---------------------- Trabajo por shard ----------------------
+
+def _detect_batch(
+    detector: LanguageDetector,
+    batch: Union[pa.RecordBatch, pa.Table],
+    text_cols: Sequence[str],
+    max_chars: int,
+) -> pa.RecordBatch:
+    cols = [batch.column(batch.schema.get_field_index(c)) for c in text_cols]
+    texts = detection_text_array(*cols, max_chars=max_chars).to_pylist()
+    langs, conf = detector.detect(texts)
+    return pa.record_batch(
+        [pa.array(langs, pa.string()), pa.array(conf, pa.float32())], names=["lang", "lang_conf"]
+    )
+
+
+_worker: Dict = {}
+
+
+def _init_worker(detector: LanguageDetector, text_cols: Tuple[str, ...], max_chars: int) -> None:
+    _worker.update(detector=detector, text_cols=text_cols, max_chars=max_chars)
+
+
+def _detect_shard(path: str, shard: int) -> pa.Buffer:
+    """
+    En el worker: mapea el fichero IPC del lote (sin copia), clasifica el
+    shard y devuelve el resultado serializado como stream Arrow.
+    """
+    with pa.memory_map(path) as source:
+        batch = pa.ipc.open_file(source).get_batch(shard)
+        out = _detect_batch(_worker["detector"], batch, _worker["text_cols"], _worker["max_chars"])
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, out.schema) as writer:
+        writer.write_batch(out)
+    return sink.getvalue()
+
+
+# ---------------------- Etapa ----------------------
+
+@dataclass
+class LanguageStats:
+    rows: int = 0
+    dropped: int = 0
+    parallel_batches: int = 0
+    local_batches: int = 0
+    languages: Counter = field(default_factory=Counter)
+
+    def summary(self) -> str:
+        top = ", ".join(f"{l} {n}" for l, n in self.languages.most_common(6))
+        return (
+            f"{self.rows} filas ({self.dropped} descartadas por idioma), "
+            f"{self.parallel_batches} lotes en paralelo y {self.local_batches} locales; {top}"
+        )
+
+
+class LanguageStage:
+    """
+    Pool de `workers` procesos (se crea con el primer lote grande y vive hasta
+    close()). workers=1 no crea Pool. `keep`: idiomas que pasan; las filas con
+    confianza < min_confidence (textos cortos, 'und') pasan siempre salvo
+    drop_uncertain=True.
+    """
+
+    def __init__(
+        self,
+        detector: Optional[LanguageDetector] = None,
+        workers: Optional[int] = None,
+        text_cols: Sequence[str] = ("title", "selftext"),
+        keep: Optional[Sequence[str]] = None,
+        min_confidence: float = 0.5,
+        drop_uncertain: bool = False,
+        max_chars: int = MAX_CHARS,
+        shard_rows: int = SHARD_ROWS,
+        min_parallel_rows: int = MIN_PARALLEL_ROWS,
+        start_method: Optional[str] = None,
+        shm_dir: Optional[str] = None,
+    ):
+        if not 1 <= len(text_cols) <= 2:
+            raise ValueError("text_cols: una columna (body) o dos (title, selftext)")
+        self.detector = detector or StopwordDetector()
+        self.workers = workers or os.cpu_count() or 1
+        self.text_cols = tuple(text_cols)
+        self.keep = set(keep) if keep else None
+        self.min_confidence = min_confidence
+        self.drop_uncertain = drop_uncertain
+        self.max_chars = max_chars
+        self.shard_rows = shard_rows
+        self.min_parallel_rows = min_parallel_rows
+        self.start_method = start_method
+        # /dev/shm: el fichero IPC del lote vive en RAM compartida, no en disco
+        self.shm_dir = shm_dir or ("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir())
+        self.stats = LanguageStats()
+        self._pool = None
+
+    # ---------------------- Pool ----------------------
+
+    def _get_pool(self):
+        if self._pool is None:
+            import multiprocessing
+
+            ctx = multiprocessing.get_context(self.start_method)
+            self._pool = ctx.Pool(
+                self.workers, initializer=_init_worker,
+                initargs=(self.detector, self.text_cols, self.max_chars),
+            )
+        return self._pool
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self) -> "LanguageStage":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ---------------------- Detección ----------------------
+
+    def detect(self, table: pa.Table) -> pa.Table:
+        """
+        Tabla (lang, lang_conf) alineada con `table`.
+        """
+        texts = table.select(list(self.text_cols))
+        if self.workers <= 1 or table.num_rows < self.min_parallel_rows:
+            self.stats.local_batches += 1
+            return pa.Table.from_batches([_detect_batch(self.detector, texts, self.text_cols, self.max_chars)])
+
+        self.stats.parallel_batches += 1
+        texts = texts.combine_chunks()
+        # ~4 shards por worker (reparto equilibrado), de al menos shard_rows filas
+        rows = max(self.shard_rows, math.ceil(table.num_rows / (self.workers * 4)))
+        path = os.path.join(self.shm_dir, f"tfm_lang_{os.getpid()}_{uuid.uuid4().hex}.arrow")
+        try:
+            with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, texts.schema) as writer:
+                for start in range(0, table.num_rows, rows):
+                    writer.write_batch(texts.slice(start, rows).to_batches()[0])
+            n_shards = math.ceil(table.num_rows / rows)
+            results = self._get_pool().map(functools.partial(_detect_shard, path), range(n_shards), chunksize=1)
+        finally:
+            os.unlink(path)
+        return pa.concat_tables(pa.ipc.open_stream(buf).read_all() for buf in results)
+
+    def annotate(self, table: pa.Table) -> pa.Table:
+        """
+        Añade (o sustituye) 'lang' (diccionario) y 'lang_conf'.
+        """
+        with metrics.span("language_detect", detector=self.detector.name) as sp:
+            result = self.detect(table)
+            sp.set(rows=table.num_rows)
+        lang = pc.dictionary_encode(result["lang"]).combine_chunks()
+        conf = result["lang_conf"].combine_chunks()
+        counts = pc.value_counts(result["lang"])
+        for name, col in (("lang", lang), ("lang_conf", conf)):
+            if name in table.column_names:
+                table = table.set_column(table.column_names.index(name), name, col)
+            else:
+                table = table.append_column(name, col)
+        self.stats.rows += table.num_rows
+        self.stats.languages.update(dict(zip(counts.field("values").to_pylist(), counts.field("counts").to_pylist())))
+        metrics.count("rows_total", table.num_rows, stage="language_detect")
+        return table
+
+    def filter(self, table: pa.Table) -> pa.Table:
+        """
+        Filas en un idioma de `keep` (y las inciertas, salvo drop_uncertain).
+        """
+        if self.keep is None:
+            return table
+        lang = pc.cast(table["lang"], pa.string())
+        mask = pc.is_in(lang, pa.array(sorted(self.keep), pa.string()))
+        if not self.drop_uncertain:
+            mask = pc.or_(mask, pc.less(table["lang_conf"], self.min_confidence))
+        out = table.filter(mask)
+        dropped = table.num_rows - out.num_rows
+        self.stats.dropped += dropped
+        metrics.count("rows_dropped_total", dropped, stage="language_filter")
+        return out
+
+    def process(self, table: pa.Table) -> pa.Table:
+        return self.filter(self.annotate(table))
+
+
+def annotate_language(
+    data: Union[pa.Table, pd.DataFrame],
+    stage: LanguageStage,
+) -> Union[pa.Table, pd.DataFrame]:
+    """
+    stage.process sobre un pyarrow.Table o DataFrame (devuelve el mismo tipo).
+    """
+    if isinstance(data, pa.Table):
+        return stage.process(data)
+    out = stage.process(pa.Table.from_pandas(data, preserve_index=False))
+    return out.to_pandas()
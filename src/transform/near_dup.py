@@ -0,0 +1,381 @@
+# src/transform/near_dup.py
+"""
+Detección de casi-duplicados (cross-posts, copypasta, spam con pequeñas
+ediciones) con MinHash + LSH.
+
+  1) Texto = title + selftext, en minúsculas y con espacios colapsados.
+  2) Shingles de 8 bytes: cada ventana de 8 bytes del UTF-8 se empaqueta en un
+     uint64 (sin colisiones) y se mezcla con splitmix64. Todo en NumPy y por lote
+     (se concatenan los textos y se descartan las ventanas que cruzan documentos).
+  3) MinHash: num_perm permutaciones (a*x + b) mod 2^32 sobre los 32 bits altos
+     del shingle; el mínimo por documento sale de np.minimum.reduceat.
+  4) LSH: la firma se parte en `bands` bandas de `rows` filas; dos posts son
+     candidatos si coinciden en alguna banda. Solo los candidatos se comparan
+     (Jaccard estimada = fracción de posiciones iguales de la firma).
+
+El índice persiste en SQLite (bandas + firmas), así cada lote nuevo se compara
+solo contra sus candidatos, nunca todos contra todos. Los casi-duplicados se
+enlazan al post canónico (el primero que se vio).
+
+    index = NearDupIndex("data/state/near_dup.sqlite")
+    table = annotate_near_duplicates(table, index)   # añade dup_of
+"""
+import re
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from src._sqlite import open_sqlite
+
+SHINGLE_BYTES = 8
+NUM_PERM = 128
+BANDS = 16
+THRESHOLD = 0.8
+
+_WS_RE = re.compile(r"\s+")
+
+
+# ---------------------- Texto y shingles ----------------------
+
+def dedup_text(title: Optional[str], selftext: Optional[str]) -> str:
+    """
+    Texto que se compara: title + selftext normalizados (minúsculas, espacios).
+    """
+    s = f"{title or ''} {selftext or ''}".lower()
+    return _WS_RE.sub(" ", s).strip()
+
+
+def _splitmix64(x: np.ndarray) -> np.ndarray:
+    x = x + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def shingle_hashes(texts: Sequence[str], k: int = SHINGLE_BYTES) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Hashes de los shingles de todos los textos, concatenados.
+    Devuelve (hashes uint64, offsets) con offsets[i] = inicio del doc i; un doc
+    vacío no aporta shingles (offsets[i] == offsets[i+1]). Un texto más corto
+    que k bytes es un único shingle.
+    """
+    encoded = [t.encode("utf-8") for t in texts]
+    # Relleno de k-1 bytes a cero por doc: las ventanas que empiezan en el
+    # relleno cruzarían al doc siguiente y se descartan
+    pad = b"\x00" * (k - 1)
+    buf = np.frombuffer(b"".join(e + pad for e in encoded) + pad, dtype=np.uint8)
+    lens = np.fromiter((len(e) for e in encoded), dtype=np.int64, count=len(encoded))
+    starts = np.concatenate(([0], np.cumsum(lens + (k - 1))[:-1])) if len(lens) else lens
+
+    if buf.size < k:
+        return np.empty(0, dtype=np.uint64), np.zeros(len(texts) + 1, dtype=np.int64)
+    windows = np.lib.stride_tricks.sliding_window_view(buf, k)
+    packed = np.zeros(len(windows), dtype=np.uint64)
+    for j in range(k):
+        packed |= windows[:, j].astype(np.uint64) << np.uint64(8 * (k - 1 - j))
+
+    # Ventanas válidas del doc i: [start, start + max(len - k + 1, 1)) si len > 0
+    n_win = np.where(lens > 0, np.maximum(lens - k + 1, 1), 0)
+    pos = np.repeat(starts, n_win) + (np.arange(n_win.sum()) - np.repeat(np.cumsum(n_win) - n_win, n_win))
+    hashes = _splitmix64(packed[pos])
+    offsets = np.concatenate(([0], np.cumsum(n_win)))
+    return hashes, offsets
+
+
+# ---------------------- MinHash ----------------------
+
+class MinHasher:
+    """
+    Firmas MinHash vectorizadas (uint32, num_perm por documento).
+    Misma semilla -> mismas permutaciones: las firmas persistidas siguen valiendo.
+    """
+
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 1, chunk: int = 1 << 16):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        # a impar -> x -> a*x + b (mod 2^32) es una permutación de los uint32
+        self.a = rng.integers(0, 2**32, size=num_perm, dtype=np.uint32) | np.uint32(1)
+        self.b = rng.integers(0, 2**32, size=num_perm, dtype=np.uint32)
+        self.chunk = chunk  # shingles por bloque (memoria: chunk * num_perm * 4 bytes)
+
+    def signatures(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        (n, num_perm) uint32. Los docs vacíos quedan con todo 0xFFFFFFFF.
+        """
+        hashes, offsets = shingle_hashes(texts)
+        n = len(texts)
+        sig = np.full((n, self.num_perm), 0xFFFFFFFF, dtype=np.uint32)
+        nonempty = np.flatnonzero(offsets[1:] > offsets[:-1])
+        if not len(nonempty):
+            return sig
+
+        # Bloques de documentos enteros de ~chunk shingles
+        doc = 0
+        while doc < len(nonempty):
+            first = nonempty[doc]
+            stop = doc + 1
+            while stop < len(nonempty) and offsets[nonempty[stop] + 1] - offsets[first] <= self.chunk:
+                stop += 1
+            docs = nonempty[doc:stop]
+            lo, hi = offsets[first], offsets[docs[-1] + 1]
+            # 32 bits altos del hash del shingle (ya mezclado por splitmix64)
+            h = (hashes[lo:hi] >> np.uint64(32)).astype(np.uint32)
+            # Operaciones in situ en uint32 (desbordan módulo 2^32): un solo buffer
+            perm = np.multiply.outer(self.a, h)
+            perm += self.b[:, None]
+            # reduceat sobre los inicios de cada doc del bloque
+            sig[docs] = np.minimum.reduceat(perm, offsets[docs] - lo, axis=1).T
+            doc = stop
+        return sig
+
+
+# ---------------------- Índice LSH persistente ----------------------
+
+class NearDupIndex:
+    """
+    Índice LSH en SQLite:
+      docs(seq, id, canonical, sig)  -- seq = orden de llegada
+      bands(band, key, seq)          -- una fila por banda y doc, índice (band, key)
+
+    check() inserta un lote y devuelve, para cada id, el id canónico del que es
+    casi-duplicado (o None). Un id ya indexado devuelve lo que se decidió entonces.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        num_perm: int = NUM_PERM,
+        bands: int = BANDS,
+        threshold: float = THRESHOLD,
+        seed: int = 1,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm debe ser múltiplo de bands")
+        self.path = path
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm=num_perm, seed=seed)
+        self._lock = threading.Lock()
+        self._con = open_sqlite(path, synchronous="NORMAL")
+        self._con.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS docs (
+                seq INTEGER PRIMARY KEY,
+                id TEXT NOT NULL UNIQUE,
+                canonical TEXT,
+                sig BLOB
+            );
+            CREATE TABLE IF NOT EXISTS bands (
+                band INTEGER NOT NULL,
+                key INTEGER NOT NULL,
+                seq INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_bands ON bands(band, key);
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT);
+            """
+        )
+        self._check_params(num_perm, seed)
+
+    def _check_params(self, num_perm: int, seed: int) -> None:
+        params = {"num_perm": str(num_perm), "bands": str(self.bands), "seed": str(seed)}
+        stored = dict(self._con.execute("SELECT name, value FROM meta").fetchall())
+        if stored and stored != params:
+            raise ValueError(f"Índice creado con otros parámetros: {stored}")
+        self._con.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", params.items())
+
+    # ---------------------- Bandas ----------------------
+
+    def band_keys(self, sig: np.ndarray) -> np.ndarray:
+        """
+        (n, bands) int64: hash de las `rows` posiciones de cada banda.
+        """
+        s = sig.astype(np.uint64).reshape(len(sig), self.bands, self.rows)
+        key = np.zeros(s.shape[:2], dtype=np.uint64)
+        for r in range(self.rows):
+            key = _splitmix64(key ^ s[:, :, r])
+        return key.view(np.int64)
+
+    @staticmethod
+    def similarity(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        """
+        Jaccard estimada entre la firma `a` y cada fila de `b`.
+        """
+        return (b == a).mean(axis=1)
+
+    # ---------------------- API ----------------------
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._con.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def check(self, ids: Sequence[str], texts: Sequence[str]) -> List[Optional[str]]:
+        """
+        Indexa el lote y devuelve dup_of por posición (None = original).
+        Los textos vacíos no se indexan como candidatos (no hay nada que comparar).
+        """
+        out: List[Optional[str]] = [None] * len(ids)
+        with self._lock:
+            con = self._con
+            con.execute("BEGIN")
+            try:
+                known = self._known(ids)
+                new_pos, seen_in_batch = [], set()
+                for i, pid in enumerate(ids):
+                    if pid in known:
+                        out[i] = known[pid]
+                    elif pid is not None and pid not in seen_in_batch:
+                        seen_in_batch.add(pid)
+                        new_pos.append(i)
+                if new_pos:
+                    self._index_batch(ids, texts, new_pos, out)
+                con.execute("COMMIT")
+            except BaseException:
+                con.execute("ROLLBACK")
+                raise
+        # Repetidos dentro del mismo lote: misma respuesta que su primera aparición
+        first = {}
+        for i, pid in enumerate(ids):
+            if pid in first:
+                out[i] = out[first[pid]]
+            else:
+                first[pid] = i
+        return out
+
+    def _known(self, ids: Sequence[str]) -> Dict[str, Optional[str]]:
+        found = {}
+        uniq = list({p for p in ids if p is not None})
+        for k in range(0, len(uniq), 900):  # límite de parámetros de SQLite
+            part = uniq[k:k + 900]
+            q = f"SELECT id, canonical FROM docs WHERE id IN ({','.join('?' * len(part))})"
+            found.update({pid: (c if c != pid else None) for pid, c in self._con.execute(q, part)})
+        return found
+
+    def _index_batch(
+        self,
+        ids: Sequence[str],
+        texts: Sequence[str],
+        new_pos: List[int],
+        out: List[Optional[str]],
+    ) -> None:
+        con = self._con
+        sigs = self.hasher.signatures([texts[i] or "" for i in new_pos])
+        nonempty = np.array([bool(texts[i]) for i in new_pos])
+        keys = self.band_keys(sigs)
+
+        base = con.execute("SELECT COALESCE(MAX(seq), 0) FROM docs").fetchone()[0] + 1
+        seqs = np.arange(base, base + len(new_pos), dtype=np.int64)
+
+        # Bandas del lote en una tabla temporal: un único JOIN contra el índice
+        con.execute("CREATE TEMP TABLE IF NOT EXISTS _batch (band INTEGER, key INTEGER, seq INTEGER)")
+        con.execute("DELETE FROM _batch")
+        rows = [
+            (b, int(keys[j, b]), int(seqs[j]))
+            for j in np.flatnonzero(nonempty) for b in range(self.bands)
+        ]
+        con.executemany("INSERT INTO _batch VALUES (?, ?, ?)", rows)
+        con.execute("INSERT INTO bands SELECT band, key, seq FROM _batch")
+
+        # Candidatos: misma banda, llegado antes (otro lote o antes en este)
+        pairs = con.execute(
+            """
+            SELECT DISTINCT n.seq, o.seq FROM _batch n
+            JOIN bands o ON o.band = n.band AND o.key = n.key AND o.seq < n.seq
+            """
+        ).fetchall()
+        candidates: Dict[int, List[int]] = {}
+        for s_new, s_old in pairs:
+            candidates.setdefault(s_new, []).append(s_old)
+
+        canonical: Dict[int, str] = {}
+        old_seqs = sorted({o for c in candidates.values() for o in c if o < base})
+        old_sig, old_canon = self._load(old_seqs)
+
+        for j, pos in enumerate(new_pos):
+            s = int(seqs[j])
+            pid = ids[pos]
+            best = None
+            cands = sorted(candidates.get(s, ()))
+            if cands:
+                cand_sigs = np.stack([old_sig[c] if c < base else sigs[c - base] for c in cands])
+                sim = self.similarity(sigs[j], cand_sigs)
+                hits = np.flatnonzero(sim >= self.threshold)
+                if len(hits):
+                    c = cands[hits[0]]  # el más antiguo que supera el umbral
+                    best = old_canon[c] if c < base else canonical[c]
+            canonical[s] = best or pid
+            out[pos] = best
+
+        con.executemany(
+            "INSERT INTO docs (seq, id, canonical, sig) VALUES (?, ?, ?, ?)",
+            [
+                (int(seqs[j]), ids[pos], canonical[int(seqs[j])], sigs[j].tobytes() if nonempty[j] else None)
+                for j, pos in enumerate(new_pos)
+            ],
+        )
+
+    def _load(self, seqs: List[int]) -> Tuple[Dict[int, np.ndarray], Dict[int, str]]:
+        sig, canon = {}, {}
+        for k in range(0, len(seqs), 900):
+            part = seqs[k:k + 900]
+            q = f"SELECT seq, sig, canonical FROM docs WHERE seq IN ({','.join('?' * len(part))})"
+            for s, blob, c in self._con.execute(q, part):
+                sig[s] = np.frombuffer(blob, dtype=np.uint32)
+                canon[s] = c
+        return sig, canon
+
+    def close(self) -> None:
+        with self._lock:
+            self._con.close()
+
+
+# ---------------------- Integración con tablas ----------------------
+
+def annotate_near_duplicates(
+    data: Union[pa.Table, pd.DataFrame],
+    index: NearDupIndex,
+    text_cols: Tuple[str, str] = ("title", "selftext"),
+) -> Union[pa.Table, pd.DataFrame]:
+    """
+    Añade la columna 'dup_of' (id canónico, o null si es original).
+    Acepta y devuelve pyarrow.Table o DataFrame.
+    """
+    title_col, body_col = text_cols
+    if isinstance(data, pa.Table):
+        ids = data["id"].to_pylist()
+        titles = data[title_col].to_pylist() if title_col in data.column_names else [None] * len(ids)
+        bodies = data[body_col].to_pylist() if body_col in data.column_names else [None] * len(ids)
+    else:
+        ids = data["id"].tolist()
+        titles = data[title_col].tolist() if title_col in data.columns else [None] * len(ids)
+        bodies = data[body_col].tolist() if body_col in data.columns else [None] * len(ids)
+
+    texts = [dedup_text(t if isinstance(t, str) else None, b if isinstance(b, str) else None)
+             for t, b in zip(titles, bodies)]
+    dup_of = index.check(ids, texts)
+
+    if isinstance(data, pa.Table):
+        col = pa.array(dup_of, type=pa.string())
+        if "dup_of" in data.column_names:
+            return data.set_column(data.column_names.index("dup_of"), "dup_of", col)
+        return data.append_column("dup_of", col)
+    out = data.copy()
+    out["dup_of"] = dup_of
+    return out
+
+
+def drop_near_duplicates(
+    data: Union[pa.Table, pd.DataFrame],
+    index: NearDupIndex,
+) -> Union[pa.Table, pd.DataFrame]:
+    """
+    Se queda solo con los originales (dup_of nulo); los duplicados quedan en el índice.
+    """
+    annotated = annotate_near_duplicates(data, index)
+    if isinstance(annotated, pa.Table):
+        return annotated.filter(pc.is_null(annotated["dup_of"])).drop_columns(["dup_of"])
+    return annotated[annotated["dup_of"].isna()].drop(columns=["dup_of"]).reset_index(drop=True)
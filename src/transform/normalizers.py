@@ -4,6 +4,8 @@ from typing import Dict, Iterable, List, Optional
 import pandas as pd
 import numpy as np
 
+from src import metrics
+
 USEFUL_COLS = [
     "id","subreddit","author","title","selftext","created_utc",
     "num_comments","score","upvote_ratio","url","permalink",
@@ -75,17 +77,12 @@ def normalize_post_dict(d: Dict) -> Dict:
     }
     return row
 
-def normalize_posts(items: Iterable[Dict]) -> pd.DataFrame:
-    rows: List[Dict] = [normalize_post_dict(d) for d in items]
-    df = pd.DataFrame(rows)
-
-    if "id" in df.columns:
-        df = df[df["id"].notna()].drop_duplicates(subset=["id"])
-
-    base_cols = USEFUL_COLS + ["retrieved_at","source"]
-    cols = [c for c in base_cols if c in df.columns]
-    df = df.reindex(columns=cols)
-
+def _post_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    dtypes del DataFrame de posts (también los de engine='arrow'): enteros con
+    downcast de numpy (float64 si hay nulos), ratio float32, booleanos
+    nullable y categorías.
+    """
     for c in ["created_utc","num_comments","score","subreddit_subscribers","retrieved_at"]:
         if c in df.columns:
             df[c] = pd.to_numeric(df[c], errors="coerce", downcast="integer")
@@ -100,9 +97,40 @@ def normalize_posts(items: Iterable[Dict]) -> pd.DataFrame:
     for c in ["subreddit","author","domain","link_flair_text","source"]:
         if c in df.columns:
             df[c] = df[c].astype("category")
+    return df
 
-    for c in ["title","selftext","url","permalink"]:
+@metrics.timed("normalize_posts", rows=len)
+def normalize_posts(items: Iterable[Dict], engine: str = "python") -> pd.DataFrame:
+    """
+    engine: 'python' (fila a fila, por defecto) | 'arrow' (columnar, ver arrow_normalizers).
+    """
+    if engine == "arrow":
+        from .arrow_normalizers import normalize_posts_arrow
+        return normalize_posts_arrow(items)
+    if engine != "python":
+        raise ValueError(f"engine no soportado: {engine!r}")
+
+    rows: List[Dict] = [normalize_post_dict(d) for d in items]
+    df = pd.DataFrame(rows)
+
+    if "id" in df.columns:
+        df = df[df["id"].notna()].drop_duplicates(subset=["id"])
+
+    base_cols = USEFUL_COLS + ["retrieved_at","source"]
+    cols = [c for c in base_cols if c in df.columns]
+    df = _post_dtypes(df.reindex(columns=cols))
+
+    # title/selftext ya salen limpios de normalize_post_dict
+    for c in ["url","permalink"]:
         if c in df.columns:
             df[c] = df[c].apply(lambda x: _clean_text(x) if isinstance(x, str) else x)
 
     return df
+
+def normalize_comments(items: Iterable[Dict]) -> pd.DataFrame:
+    """
+    Comentarios (ver clients.comments) -> DataFrame. Solo hay vía columnar:
+    diccionarios como 'category' y enteros con nulos como Int*.
+    """
+    from .arrow_normalizers import normalize_comments_table, _pandas_types
+    return normalize_comments_table(items).to_pandas(types_mapper=_pandas_types)
@@ -0,0 +1,429 @@
+# src/transform/sketches.py
+"""
+Sketches en streaming para "lo más mencionado" sin GROUP BY sobre todo el corpus:
+
+  - CountMinSketch : frecuencia aproximada de cualquier elemento (sobreestima
+                     como mucho e/width * N con prob. 1 - e^-depth).
+  - SpaceSaving     : top-k con cuenta y cota de error por elemento (error <= N/k).
+  - HyperLogLog     : número de distintos (error típico 1.04/sqrt(2^p)).
+
+Los tres se actualizan por lote (hashes de 64 bits de pandas.util.hash_array,
+iguales en todos los procesos) y se fusionan: CMS sumando, HLL con el máximo
+por registro y Space-Saving con la regla de los resúmenes fusionables.
+
+SketchStore guarda un SketchSet por día (created_utc, UTC) y dimensión
+(dominio, autor, flair, subreddit, entidades del título) en
+<base_dir>/<dataset>/_sketches/<día>/<tag>.npz. Cada flush escribe ficheros
+nuevos con un tag único, así varios procesos pueden escribir a la vez; las
+consultas fusionan los días pedidos y compact() junta los ficheros de un día.
+Cuentan filas escritas: un post que se vuelve a ingerir cuenta otra vez (los
+distintos de HLL no cambian), así que conviene alimentarlos con lotes ya
+deduplicados.
+
+    sketches = SketchStore("data/curated/reddit", "posts")
+    sketches.update(table)            # cada lote normalizado
+    sketches.flush()
+    sketches.top("domain", k=20, start="2024-05-01")
+    sketches.distinct("author")
+"""
+import glob
+import heapq
+import json
+import os
+import re
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+DIMENSIONS = ("domain", "author", "link_flair_text", "subreddit", "entity")
+SKETCH_DIR = "_sketches"
+
+# Entidades sin NER: secuencias de palabras con mayúscula en el título
+# ("Nike Air Max", "Black Friday"). Una sola palabra al inicio de frase no
+# cuenta: su mayúscula no dice nada.
+_ENTITY_RE = re.compile(r"\b[A-Z][\w'&-]+(?:\s+[A-Z][\w'&-]+)*")
+_SENTENCE_END_RE = re.compile(r"[.!?:]\s*$")
+_IGNORED_AUTHORS = {"[deleted]", "AutoModerator"}
+
+
+def hash_values(values: Sequence[str]) -> np.ndarray:
+    """
+    Hash de 64 bits estable entre procesos y ejecuciones (siphash de pandas con clave fija).
+    """
+    if len(values) == 0:
+        return np.empty(0, dtype=np.uint64)
+    return pd.util.hash_array(np.asarray(values, dtype=object), categorize=False)
+
+
+def extract_entities(title: Optional[str]) -> List[str]:
+    if not title:
+        return []
+    out = []
+    for m in _ENTITY_RE.finditer(title):
+        sentence_start = m.start() == 0 or _SENTENCE_END_RE.search(title[: m.start()])
+        if sentence_start and " " not in m.group(0):
+            continue
+        out.append(" ".join(m.group(0).split()))
+    return out
+
+
+# ---------------------- Count-Min ----------------------
+
+class CountMinSketch:
+    # Multiplicadores impares por fila (hashing multiply-shift sobre el hash de 64 bits)
+    _MULTIPLIERS = np.array(
+        [0x9E3779B97F4A7C15, 0xBF58476D1CE4E5B9, 0x94D049BB133111EB, 0xD6E8FEB86659FD93,
+         0xA0761D6478BD642F, 0xE7037ED1A0B428DB, 0x8EBC6AF09C88C6E3, 0x589965CC75374CC3],
+        dtype=np.uint64,
+    )
+
+    def __init__(self, width: int = 2048, depth: int = 4, table: Optional[np.ndarray] = None):
+        if width & (width - 1) or not 1 <= depth <= len(self._MULTIPLIERS):
+            raise ValueError(f"width debe ser potencia de 2 y depth <= {len(self._MULTIPLIERS)}")
+        self.width = width
+        self.depth = depth
+        self.table = table if table is not None else np.zeros((depth, width), dtype=np.uint32)
+        self._shift = np.uint64(64 - (width.bit_length() - 1))
+
+    def _cols(self, hashes: np.ndarray) -> np.ndarray:
+        return (hashes[None, :] * self._MULTIPLIERS[: self.depth, None]) >> self._shift
+
+    def add(self, hashes: np.ndarray, counts: Optional[np.ndarray] = None) -> None:
+        counts = np.ones(len(hashes), dtype=np.uint32) if counts is None else counts.astype(np.uint32)
+        cols = self._cols(hashes).astype(np.intp)
+        for r in range(self.depth):
+            np.add.at(self.table[r], cols[r], counts)
+
+    def estimate(self, hashes: np.ndarray) -> np.ndarray:
+        cols = self._cols(hashes).astype(np.intp)
+        return self.table[np.arange(self.depth)[:, None], cols].min(axis=0)
+
+    def merge(self, other: "CountMinSketch") -> "CountMinSketch":
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError("Solo se fusionan Count-Min de igual width/depth")
+        self.table += other.table
+        return self
+
+
+# ---------------------- Space-Saving ----------------------
+
+class SpaceSaving:
+    """
+    Top-k por Space-Saving con actualizaciones por lote: el lote se cuenta
+    exacto y se fusiona con el resumen (Agarwal et al., "Mergeable summaries"):
+    a un elemento ausente de un resumen lleno se le suma la cuenta mínima de
+    ese resumen, que es lo más que pudo tener. count sobreestima; count - error
+    es una cota inferior.
+    """
+
+    def __init__(self, k: int = 1000):
+        self.k = k
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+
+    def _floor(self) -> int:
+        return min(self.counts.values()) if len(self.counts) >= self.k else 0
+
+    def update(self, items: Sequence[str]) -> None:
+        if len(items) == 0:
+            return
+        vc = pd.Series(items, dtype=object).value_counts(sort=False)
+        other = SpaceSaving(self.k)
+        other.counts = dict(zip(vc.index, vc.to_numpy().tolist()))
+        other.errors = dict.fromkeys(other.counts, 0)
+        self._merge(other, other_floor=0)
+
+    def merge(self, other: "SpaceSaving") -> "SpaceSaving":
+        self._merge(other, other._floor())
+        return self
+
+    def _merge(self, other: "SpaceSaving", other_floor: int) -> None:
+        m1 = self._floor()
+        counts, errors = {}, {}
+        for x in self.counts.keys() | other.counts.keys():
+            counts[x] = self.counts.get(x, m1) + other.counts.get(x, other_floor)
+            errors[x] = self.errors.get(x, m1) + other.errors.get(x, other_floor)
+        keep = heapq.nlargest(self.k, counts, key=counts.__getitem__) if len(counts) > self.k else counts
+        self.counts = {x: counts[x] for x in keep}
+        self.errors = {x: errors[x] for x in keep}
+
+    @classmethod
+    def combine(cls, summaries: Sequence["SpaceSaving"], k: Optional[int] = None) -> "SpaceSaving":
+        """
+        Fusión de N resúmenes de una vez (vectorizada): cuenta(x) = suma de los
+        suelos + suma de (c_i(x) - suelo_i) donde x aparece. Misma cota que
+        fusionar por pares, sin recortar a k en cada paso.
+        """
+        out = cls(k or max((s.k for s in summaries), default=1000))
+        parts = [s for s in summaries if s.counts]
+        if not parts:
+            return out
+        floors = [s._floor() for s in parts]
+        df = pd.DataFrame({
+            "item": [x for s in parts for x in s.counts],
+            "c": [c - f for s, f in zip(parts, floors) for c in s.counts.values()],
+            "e": [e - f for s, f in zip(parts, floors) for e in s.errors.values()],
+        })
+        g = df.groupby("item", sort=False).sum()
+        base = sum(floors)
+        g = g.nlargest(out.k, "c") if len(g) > out.k else g
+        out.counts = dict(zip(g.index, (g["c"].to_numpy() + base).tolist()))
+        out.errors = dict(zip(g.index, (g["e"].to_numpy() + base).tolist()))
+        return out
+
+    def top(self, n: int) -> List[Tuple[str, int, int]]:
+        """
+        [(elemento, cuenta, error)] de mayor a menor cuenta.
+        """
+        best = heapq.nlargest(n, self.counts.items(), key=lambda kv: (kv[1], kv[0]))
+        return [(x, c, self.errors[x]) for x, c in best]
+
+
+# ---------------------- HyperLogLog ----------------------
+
+class HyperLogLog:
+    def __init__(self, p: int = 14, registers: Optional[np.ndarray] = None):
+        if not 4 <= p <= 18:
+            raise ValueError("p debe estar entre 4 y 18")
+        self.p = p
+        self.m = 1 << p
+        self.registers = registers if registers is not None else np.zeros(self.m, dtype=np.uint8)
+
+    @staticmethod
+    def _bit_length(x: np.ndarray) -> np.ndarray:
+        # Exacto en float64: cada mitad de 32 bits cabe en la mantisa
+        hi = (x >> np.uint64(32)).astype(np.float64)
+        lo = (x & np.uint64(0xFFFFFFFF)).astype(np.float64)
+        return np.where(hi > 0, 32 + np.frexp(hi)[1], np.frexp(lo)[1])
+
+    def add(self, hashes: np.ndarray) -> None:
+        if len(hashes) == 0:
+            return
+        idx = (hashes >> np.uint64(64 - self.p)).astype(np.intp)
+        rest = hashes << np.uint64(self.p)
+        rho = np.minimum(64 - self._bit_length(rest) + 1, 64 - self.p + 1).astype(np.uint8)
+        np.maximum.at(self.registers, idx, rho)
+
+    def count(self) -> float:
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        est = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int((self.registers == 0).sum())
+        if est <= 2.5 * m and zeros:
+            return m * np.log(m / zeros)  # conteo lineal para cardinalidades pequeñas
+        return float(est)
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        if other.p != self.p:
+            raise ValueError("Solo se fusionan HyperLogLog de igual p")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+
+# ---------------------- Conjunto por bucket ----------------------
+
+class SketchSet:
+    """
+    CMS + Space-Saving + HLL por dimensión, y n (elementos vistos) por dimensión.
+    """
+
+    def __init__(self, dims: Sequence[str] = DIMENSIONS, k: int = 1000, width: int = 2048, depth: int = 4, p: int = 14):
+        self.params = {"k": k, "width": width, "depth": depth, "p": p}
+        self.cms = {d: CountMinSketch(width, depth) for d in dims}
+        self.topk = {d: SpaceSaving(k) for d in dims}
+        self.hll = {d: HyperLogLog(p) for d in dims}
+        self.n = dict.fromkeys(dims, 0)
+
+    @property
+    def dims(self) -> List[str]:
+        return list(self.cms)
+
+    def add(self, dim: str, items: Sequence[str]) -> None:
+        if len(items) == 0:
+            return
+        h = hash_values(items)
+        self.cms[dim].add(h)
+        self.hll[dim].add(h)
+        self.topk[dim].update(items)
+        self.n[dim] += len(items)
+
+    def merge(self, other: "SketchSet") -> "SketchSet":
+        if other.params != self.params:
+            raise ValueError(f"Parámetros distintos: {self.params} vs {other.params}")
+        for d in other.dims:
+            if d not in self.cms:
+                self.cms[d] = CountMinSketch(self.params["width"], self.params["depth"])
+                self.topk[d] = SpaceSaving(self.params["k"])
+                self.hll[d] = HyperLogLog(self.params["p"])
+                self.n[d] = 0
+            self.cms[d].merge(other.cms[d])
+            self.topk[d].merge(other.topk[d])
+            self.hll[d].merge(other.hll[d])
+            self.n[d] += other.n[d]
+        return self
+
+    # ---------------------- Persistencia ----------------------
+
+    def save(self, path: str) -> None:
+        arrays = {"meta": np.array(json.dumps({"params": self.params, "n": self.n}))}
+        for d in self.dims:
+            ss = self.topk[d]
+            items = list(ss.counts)
+            arrays[f"{d}.cms"] = self.cms[d].table
+            arrays[f"{d}.hll"] = self.hll[d].registers
+            arrays[f"{d}.items"] = np.array(items, dtype=str)
+            arrays[f"{d}.counts"] = np.array([ss.counts[x] for x in items], dtype=np.int64)
+            arrays[f"{d}.errors"] = np.array([ss.errors[x] for x in items], dtype=np.int64)
+        tmp = f"{path}.tmp.npz"
+        np.savez_compressed(tmp, **arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "SketchSet":
+        with np.load(path) as z:
+            meta = json.loads(str(z["meta"]))
+            out = cls(dims=list(meta["n"]), **meta["params"])
+            out.n = meta["n"]
+            for d in out.dims:
+                out.cms[d].table = z[f"{d}.cms"]
+                out.hll[d].registers = z[f"{d}.hll"]
+                items = z[f"{d}.items"].tolist()
+                out.topk[d].counts = dict(zip(items, z[f"{d}.counts"].tolist()))
+                out.topk[d].errors = dict(zip(items, z[f"{d}.errors"].tolist()))
+        return out
+
+
+# ---------------------- Store por día ----------------------
+
+def _day_str(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+class SketchStore:
+    def __init__(self, base_dir: str, dataset: str = "posts", dims: Sequence[str] = DIMENSIONS, **params):
+        self.dir = os.path.join(base_dir, dataset, SKETCH_DIR)
+        self.dims = tuple(dims)
+        self.params = params
+        self._pending: Dict[str, SketchSet] = {}
+        self._loaded: Dict[str, SketchSet] = {}   # los .npz no se modifican: caché por ruta
+
+    def _new(self) -> SketchSet:
+        return SketchSet(self.dims, **self.params)
+
+    def update(self, data: Union[pa.Table, pd.DataFrame]) -> None:
+        """
+        Añade un lote normalizado (normalize_posts / normalize_posts_table).
+        """
+        df = data.to_pandas() if isinstance(data, pa.Table) else data
+        if df.empty or "created_utc" not in df.columns:
+            return
+        df = df[df["created_utc"].notna()]
+        days = pd.to_datetime(df["created_utc"], unit="s", utc=True).dt.strftime("%Y-%m-%d")
+        for day, part in df.groupby(days.to_numpy(), sort=False):
+            sk = self._pending.setdefault(day, self._new())
+            for dim in self.dims:
+                sk.add(dim, self._items(part, dim))
+
+    @staticmethod
+    def _items(part: pd.DataFrame, dim: str) -> List[str]:
+        if dim == "entity":
+            titles = part["title"] if "title" in part.columns else []
+            return [e for t in titles if isinstance(t, str) for e in extract_entities(t)]
+        if dim not in part.columns:
+            return []
+        col = part[dim].dropna().astype(str)
+        if dim == "author":
+            col = col[~col.isin(_IGNORED_AUTHORS)]
+        return col[col != ""].tolist()
+
+    def flush(self) -> List[str]:
+        """
+        Escribe los sketches pendientes: un fichero nuevo por día (tag único).
+        """
+        written = []
+        tag = f"{os.getpid()}_{uuid.uuid4().hex[:8]}"
+        for day, sk in self._pending.items():
+            d = os.path.join(self.dir, day)
+            os.makedirs(d, exist_ok=True)
+            path = os.path.join(d, f"{tag}.npz")
+            sk.save(path)
+            written.append(path)
+        self._pending = {}
+        return written
+
+    def days(self) -> List[str]:
+        if not os.path.isdir(self.dir):
+            return []
+        return sorted(d for d in os.listdir(self.dir) if os.path.isdir(os.path.join(self.dir, d)))
+
+    def _in_range(self, day: str, start: Optional[str], end: Optional[str]) -> bool:
+        return not ((start and day < start) or (end and day >= end))
+
+    def _sets(self, start: Optional[str] = None, end: Optional[str] = None) -> List[SketchSet]:
+        """
+        SketchSets de los días en [start, end) (YYYY-MM-DD), incluidos los pendientes.
+        """
+        out = []
+        for day in self.days():
+            if not self._in_range(day, start, end):
+                continue
+            for f in sorted(glob.glob(os.path.join(self.dir, day, "*.npz"))):
+                if f not in self._loaded:
+                    self._loaded[f] = SketchSet.load(f)
+                out.append(self._loaded[f])
+        out.extend(sk for day, sk in self._pending.items() if self._in_range(day, start, end))
+        return out
+
+    def load(self, start: Optional[str] = None, end: Optional[str] = None) -> SketchSet:
+        """
+        Fusión completa de los días en [start, end).
+        """
+        out = self._new()
+        for sk in self._sets(start, end):
+            out.merge(sk)
+        return out
+
+    def compact(self, day: str) -> Optional[str]:
+        """
+        Junta los ficheros de un día en uno (las cuentas no cambian).
+        """
+        files = sorted(glob.glob(os.path.join(self.dir, day, "*.npz")))
+        if len(files) < 2:
+            return files[0] if files else None
+        merged = self._new()
+        for f in files:
+            merged.merge(SketchSet.load(f))
+        path = os.path.join(self.dir, day, f"compact_{uuid.uuid4().hex[:8]}.npz")
+        merged.save(path)
+        for f in files:
+            os.remove(f)
+            self._loaded.pop(f, None)
+        return path
+
+    # ---------------------- Consultas ----------------------
+
+    # Cada consulta fusiona solo la dimensión pedida
+
+    def top(self, dim: str, k: int = 20, start: Optional[str] = None, end: Optional[str] = None) -> pd.DataFrame:
+        sets = [sk for sk in self._sets(start, end) if dim in sk.topk]
+        rows = SpaceSaving.combine([sk.topk[dim] for sk in sets]).top(k)
+        return pd.DataFrame(rows, columns=[dim, "count", "max_error"])
+
+    def count(self, dim: str, items: Iterable[str], start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, int]:
+        items = list(items)
+        cms = CountMinSketch(self.params.get("width", 2048), self.params.get("depth", 4))
+        for sk in self._sets(start, end):
+            if dim in sk.cms:
+                cms.merge(sk.cms[dim])
+        return dict(zip(items, cms.estimate(hash_values(items)).tolist()))
+
+    def distinct(self, dim: str, start: Optional[str] = None, end: Optional[str] = None) -> int:
+        hll = HyperLogLog(self.params.get("p", 14))
+        for sk in self._sets(start, end):
+            if dim in sk.hll:
+                hll.merge(sk.hll[dim])
+        return int(round(hll.count()))
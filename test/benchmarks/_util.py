@@ -0,0 +1,28 @@
+# test/benchmarks/_util.py
+"""
+Utilidades compartidas por los benchmarks de consultas (materialized, trends,
+fulltext): mediana de tiempos y escritura de posts sintéticos a Parquet.
+"""
+import statistics
+import time
+from typing import Callable, Dict, List
+
+from src.storage import ParquetStorage
+from src.transform.arrow_normalizers import normalize_posts_table
+
+
+def timed_median(fn: Callable[[], object], repeats: int, warmup: bool = False) -> float:
+    """Mediana en ms de `repeats` llamadas a fn; warmup descarta una primera llamada."""
+    if warmup:
+        fn()
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times) * 1000
+
+
+def write_posts(storage: ParquetStorage, posts: List[Dict], suffix: str) -> None:
+    """Normaliza `posts` y los guarda como un fichero más del dataset."""
+    storage.save_batches([normalize_posts_table(posts)], suffix=suffix)
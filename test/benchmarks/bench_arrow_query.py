@@ -0,0 +1,69 @@
+# test/benchmarks/bench_arrow_query.py
+"""
+Consulta DuckDB -> Parquet por tres rutas, cada una en su subproceso (ru_maxrss):
+  pandas : query() -> DataFrame -> save_df()          (Arrow -> pandas -> Arrow)
+  arrow  : query_arrow() -> save_table()               (Arrow de punta a punta)
+  batches: query_batches() -> save_batches()           (Arrow en streaming)
+
+    python -m test.benchmarks.bench_arrow_query --n 1000000
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from src.storage import DuckDBIndex, ParquetStorage
+from src.pipeline import stream_posts_to_parquet
+from test.benchmarks.fake_reddit import make_post
+
+SQL = "SELECT * FROM vw_posts WHERE score >= 0"
+
+
+def build(base: str, n: int) -> None:
+    storage = ParquetStorage(base_dir=base, dataset="posts")
+    posts = (make_post(f"/r/sub{i % 200}/new", i) for i in range(n))
+    stream_posts_to_parquet(posts, storage, batch_size=20_000, suffix="src")
+    index = DuckDBIndex(db_path=os.path.join(base, "bench.duckdb"), base_dir=base)
+    index.create_view_for_dataset("posts")
+
+
+def run_mode(mode: str, base: str) -> None:
+    index = DuckDBIndex(db_path=os.path.join(base, "bench.duckdb"), base_dir=base, read_only=True)
+    out = ParquetStorage(base_dir=tempfile.mkdtemp(), dataset="posts")
+    t0 = time.perf_counter()
+    if mode == "pandas":
+        out.save_df(index.query(SQL), suffix="out")
+    elif mode == "arrow":
+        out.save_table(index.query_arrow(SQL), suffix="out")
+    else:
+        out.save_batches(index.query_batches(SQL), suffix="out")
+    elapsed = time.perf_counter() - t0
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{mode:8s} {elapsed:7.2f}s  pico RSS {peak_mb:8.1f} MB")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=500_000)
+    ap.add_argument("--mode", choices=["pandas", "arrow", "batches"])
+    ap.add_argument("--base")
+    args = ap.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.base)
+        return
+
+    base = tempfile.mkdtemp()
+    build(base, args.n)
+    for mode in ("pandas", "arrow", "batches"):
+        subprocess.run(
+            [sys.executable, "-m", "test.benchmarks.bench_arrow_query", "--mode", mode, "--base", base],
+            check=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# test/benchmarks/bench_async_client.py
+"""
+Throughput: RedditClient (secuencial) vs AsyncRedditClient (fan-out) contra FakeReddit.
+
+    python -m test.benchmarks.bench_async_client --targets 40 --max-items 300 --latency 0.05
+    python -m test.benchmarks.bench_async_client --quota 200 --window 5   # ritmo adaptativo
+"""
+import argparse
+import asyncio
+import time
+
+from src.clients import RedditClient, AsyncRedditClient, ListingTarget, RateLimiter
+from test.benchmarks.fake_reddit import FakeReddit
+
+
+def make_targets(n: int, max_items: int):
+    targets = []
+    for i in range(n):
+        if i % 3 == 0:
+            targets.append(ListingTarget.new(f"sub{i}", max_items=max_items))
+        elif i % 3 == 1:
+            targets.append(ListingTarget.top(f"sub{i}", t="week", max_items=max_items))
+        else:
+            targets.append(ListingTarget.search(f"query {i}", sort="new", max_items=max_items))
+    return targets
+
+
+def run_sync(fr: FakeReddit, targets) -> int:
+    class _Local(RedditClient):
+        AUTH_URL = fr.auth_url
+        API_BASE = fr.api_base
+
+    rc = _Local("id", "secret", "bench", rate_limiter=RateLimiter(fr.quota, fr.window))
+    n = 0
+    for t in targets:
+        kw = dict(t.kwargs)
+        if t.kind == "new":
+            it = rc.subreddit_new(t.subreddit, **kw)
+        elif t.kind == "top":
+            it = rc.subreddit_top(t.subreddit, **kw)
+        else:
+            it = rc.search(t.query, **kw)
+        n += sum(1 for _ in it)
+    return n
+
+
+def run_async(fr: FakeReddit, targets, concurrency: int) -> int:
+    async def _run():
+        async with AsyncRedditClient(
+            "id", "secret", "bench",
+            max_concurrency=concurrency, rate_limiter=RateLimiter(fr.quota, fr.window),
+            auth_url=fr.auth_url, api_base=fr.api_base,
+        ) as rc:
+            n = 0
+            async for _target, _post in rc.crawl(targets):
+                n += 1
+            return n
+    return asyncio.run(_run())
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--targets", type=int, default=30)
+    ap.add_argument("--max-items", type=int, default=300)
+    ap.add_argument("--latency", type=float, default=0.05)
+    ap.add_argument("--quota", type=int, default=100_000)
+    ap.add_argument("--window", type=float, default=600.0)
+    ap.add_argument("--concurrency", type=int, default=16)
+    args = ap.parse_args()
+
+    targets = make_targets(args.targets, args.max_items)
+    # Un servidor por modo: cada uno parte de una ventana de cuota limpia
+    server_kw = dict(latency=args.latency, quota=args.quota, window=args.window)
+    with FakeReddit(**server_kw) as fr:
+        t0 = time.perf_counter()
+        n_sync = run_sync(fr, targets)
+        t_sync = time.perf_counter() - t0
+        n_429 = fr.requests.get("429", 0)
+
+    with FakeReddit(**server_kw) as fr:
+        t0 = time.perf_counter()
+        n_async = run_async(fr, targets, args.concurrency)
+        t_async = time.perf_counter() - t0
+        n_429 += fr.requests.get("429", 0)
+
+    print(f"sync : {n_sync:>7} posts en {t_sync:6.2f}s  ({n_sync / t_sync:8.0f} posts/s)")
+    print(f"async: {n_async:>7} posts en {t_async:6.2f}s  ({n_async / t_async:8.0f} posts/s)")
+    print(f"speedup x{t_sync / t_async:.1f}  (429 recibidos: {n_429})")
+
+
+if __name__ == "__main__":
+    main()
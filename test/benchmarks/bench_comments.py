@@ -0,0 +1,63 @@
+# test/benchmarks/bench_comments.py
+"""
+Ingesta de comentarios contra el servidor falso: peticiones y tiempo de
+  sync : RedditClient.comments (posts en serie, morechildren en lotes de 100)
+  async: AsyncRedditClient.crawl_comments (posts en paralelo, vía iter_async)
+y, como referencia, cuántas llamadas haría expandir cada id "more" por separado.
+
+    python -m test.benchmarks.bench_comments --posts 20 --comments 2000 --latency 0.05
+"""
+import argparse
+import resource
+import tempfile
+import time
+
+import pyarrow.parquet as pq
+
+from src.clients import AsyncRedditClient, RedditClient
+from src.pipeline import iter_async, stream_comments_to_parquet
+from src.storage import ParquetStorage
+from test.benchmarks.fake_reddit import FakeReddit
+
+
+def run_sync(fr: FakeReddit, post_ids, storage: ParquetStorage) -> None:
+    RedditClient.AUTH_URL = fr.auth_url
+    RedditClient.API_BASE = fr.api_base
+    rc = RedditClient("id", "secret", "bench")
+    stream_comments_to_parquet(rc.comments(post_ids), storage, suffix="sync")
+
+
+def run_async(fr: FakeReddit, post_ids, storage: ParquetStorage) -> None:
+    async def comments():
+        async with AsyncRedditClient("id", "secret", "bench", auth_url=fr.auth_url, api_base=fr.api_base) as rc:
+            async for c in rc.crawl_comments(post_ids):
+                yield c
+    stream_comments_to_parquet(iter_async(comments), storage, suffix="async")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--posts", type=int, default=20)
+    ap.add_argument("--comments", type=int, default=2000)
+    ap.add_argument("--latency", type=float, default=0.05)
+    args = ap.parse_args()
+
+    post_ids = [f"p{i}" for i in range(args.posts)]
+    visible = min(500, args.comments)
+    naive = args.posts * (1 + (args.comments - visible))
+    print(f"referencia (1 llamada por id 'more'): {naive} peticiones")
+
+    for name, fn in (("sync", run_sync), ("async", run_async)):
+        with FakeReddit(latency=args.latency, comments_per_post=args.comments) as fr:
+            storage = ParquetStorage(base_dir=tempfile.mkdtemp(), dataset="comments")
+            t0 = time.perf_counter()
+            fn(fr, post_ids, storage)
+            elapsed = time.perf_counter() - t0
+            calls = fr.requests.get("comments", 0) + fr.requests.get("morechildren", 0)
+            rows = sum(pq.ParquetFile(f).metadata.num_rows for f in storage.latest_paths(10))
+            print(f"{name:5s} {elapsed:6.2f}s  {calls} peticiones {dict(fr.requests)}  {rows} comentarios")
+    print(f"pico RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
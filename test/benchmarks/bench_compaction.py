@@ -0,0 +1,117 @@
+# test/benchmarks/bench_compaction.py
+"""
+Muchos ficheros pequeños con ids solapados (new/top/search del mismo subreddit)
+-> compactación -> ficheros antes/después y latencia de consulta. Comprueba
+que no quedan ids duplicados ni staging, y (--partitioned) que cada fila
+sigue en su partición.
+
+Antes, check_writer_paths(): ficheros del normalizador pandas (save_df), solos
+o mezclados con los del Arrow (save_batches), con y sin registro, columnas
+enteras a nulo (link_flair_text en todos los crawls) y recrawls -> la
+compactación se queda con el retrieved_at más reciente de cada id y los viejos
+acaban en la papelera.
+
+    python -m test.benchmarks.bench_compaction --files 300 --rows 500
+    python -m test.benchmarks.bench_compaction --partitioned
+"""
+import argparse
+import glob
+import os
+import tempfile
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.storage import ParquetStorage, DuckDBIndex
+from src.storage.compaction import compact_dataset
+from src.transform.arrow_normalizers import normalize_posts_table
+from src.transform.normalizers import normalize_posts
+from test.benchmarks.fake_reddit import make_post
+
+
+def _crawl(k: int, ids: range):
+    """Posts del crawl k: score = k (el recrawl lo cambia); el primero sin subscribers."""
+    posts = []
+    for i in ids:
+        p = make_post("/r/sub0/new", i)   # link_flair_text siempre None
+        p["score"] = k
+        if not k:
+            p["subreddit_subscribers"] = None
+        posts.append(p)
+    return posts
+
+
+def check_writer_paths(use_registry: bool, mixed: bool) -> None:
+    base = tempfile.mkdtemp()
+    storage = ParquetStorage(base_dir=base, dataset="posts", use_registry=use_registry)
+    for k in range(4):
+        posts = _crawl(k, range(k * 50, k * 50 + 100))   # cada crawl solapa la mitad
+        if mixed and k % 2:
+            table = normalize_posts_table(posts)
+            table = table.set_column(table.schema.get_field_index("retrieved_at"), "retrieved_at",
+                                     pa.array([1000 + k] * table.num_rows, pa.int64()))
+            storage.save_batches([table], suffix=f"arrow{k}")
+        else:
+            df = normalize_posts(posts)
+            df["retrieved_at"] = 1000 + k
+            storage.save_df(df, suffix=f"pandas{k}")
+    old = sorted(glob.glob(os.path.join(storage.dataset_dir, "*.parquet")))
+    assert len(old) == 4, old
+
+    report = compact_dataset(storage)
+    new = sorted(glob.glob(os.path.join(storage.dataset_dir, "*.parquet")))
+    trashed = sorted(glob.glob(os.path.join(report.trash_dir, "*.parquet")))
+    assert [os.path.basename(f) for f in trashed] == [os.path.basename(f) for f in old], "swap incompleto"
+    assert len(new) == report.files_after == 1 and not set(new) & set(old)
+    assert not os.path.exists(os.path.join(base, "_staging")), "staging huérfano"
+
+    latest = {p["id"]: k for k in range(4) for p in _crawl(k, range(k * 50, k * 50 + 100))}
+    table = pq.read_table(new[0])
+    rows = dict(zip(table["id"].to_pylist(), zip(table["score"].to_pylist(), table["retrieved_at"].to_pylist())))
+    assert len(rows) == table.num_rows == len(latest), table.num_rows
+    assert all(rows[pid] == (k, 1000 + k) for pid, k in latest.items()), "no se quedó el recrawl más reciente"
+    print(f"check_writer_paths(use_registry={use_registry}, mixed={mixed}): ok ({report.summary()})")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--files", type=int, default=300)
+    ap.add_argument("--rows", type=int, default=500)
+    ap.add_argument("--partitioned", action="store_true")
+    args = ap.parse_args()
+
+    for use_registry in (True, False):
+        for mixed in (True, False):
+            check_writer_paths(use_registry, mixed)
+
+    base = tempfile.mkdtemp()
+    parts = ("subreddit", "date") if args.partitioned else ()
+    storage = ParquetStorage(base_dir=base, dataset="posts", partition_by=parts)
+    for k in range(args.files):
+        # 10 subreddits; cada "crawl" solapa la mitad de sus ids con el anterior del mismo subreddit
+        start = (k // 10) * args.rows // 2
+        posts = [make_post(f"/r/sub{k % 10}/new", i) for i in range(start, start + args.rows)]
+        storage.save_batches([normalize_posts_table(posts)], suffix=f"crawl{k}")
+
+    report = compact_dataset(storage, measure_latency=True)
+    print(report.summary())
+
+    index = DuckDBIndex(db_path=os.path.join(base, "bench.duckdb"), base_dir=base)
+    index.create_view_for_dataset("posts")
+    counts = index.query("SELECT COUNT(*) AS filas, COUNT(DISTINCT id) AS ids FROM vw_posts")
+    print(counts)
+    assert counts["filas"][0] == counts["ids"][0], "ids duplicados tras compactar"
+    assert not os.path.exists(os.path.join(base, "_staging")), "staging huérfano"
+    if args.partitioned:
+        # Las claves de la ruta cuadran con los datos: subreddit del permalink, date de created_utc
+        bad = index.query(
+            "SELECT COUNT(*) AS n FROM vw_posts WHERE permalink NOT LIKE '%/r/' || subreddit || '/%' "
+            "OR CAST(date AS VARCHAR) <> strftime(to_timestamp(created_utc), '%Y-%m-%d')"
+        )["n"][0]
+        assert bad == 0, f"{bad} filas fuera de su partición"
+        assert all(d["files_after"] == 1 for d in report.details), "partición sin compactar"
+    print("ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# test/benchmarks/bench_embeddings.py
+"""
+Etapa de embeddings con HashingEncoder (el modelo real se cambia con --st):
+  ingenuo : codificar todos los textos, en el orden de llegada, lotes fijos
+  frío    : EmbeddingStage sobre un store vacío (dedup por hash + lotes por longitud)
+  caliente: segunda pasada con el 10% de posts nuevos (solo se codifican esos)
+
+Además del tiempo se informa del relleno: sum(tamaño lote x texto más largo)
+frente a los caracteres reales, que es lo que paga un transformer en CPU.
+
+    python -m test.benchmarks.bench_embeddings --n 50000 --dup 0.3
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from src.transform.embeddings import (
+    EmbeddingStage, EmbeddingStore, HashingEncoder, SentenceTransformerEncoder, embedding_text,
+)
+from test.benchmarks.fake_reddit import make_post
+
+
+def corpus(n: int, dup: float, seed: int = 7, offset: int = 0):
+    """Posts sintéticos con longitudes muy variadas y una fracción `dup` de textos repetidos."""
+    rng = random.Random(seed + offset)
+    texts = []
+    for i in range(n):
+        if texts and rng.random() < dup:
+            texts.append(rng.choice(texts))
+            continue
+        p = make_post(f"/r/sub{i % 50}/new", offset + i)
+        body = p["selftext"] * rng.choice((0, 1, 1, 2, 5, 20))
+        texts.append(embedding_text(p["title"], body))
+    return texts
+
+
+def naive(encoder, texts, batch_size: int):
+    t0 = time.perf_counter()
+    chars = padded = 0
+    for s in range(0, len(texts), batch_size):
+        batch = texts[s:s + batch_size]
+        encoder.encode(batch)
+        chars += sum(map(len, batch))
+        padded += len(batch) * max(map(len, batch))
+    return time.perf_counter() - t0, chars / padded
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=50_000)
+    ap.add_argument("--dup", type=float, default=0.3)
+    ap.add_argument("--batch-size", type=int, default=64)
+    ap.add_argument("--dtype", default="float16", choices=["float16", "float32"])
+    ap.add_argument("--st", action="store_true", help="usar Sentence-Transformers en vez de hashing")
+    args = ap.parse_args()
+
+    encoder = SentenceTransformerEncoder() if args.st else HashingEncoder(dim=384)
+    texts = corpus(args.n, args.dup)
+
+    elapsed, eff = naive(encoder, texts, args.batch_size)
+    print(f"ingenuo  {elapsed:7.2f}s  {len(texts)} codificados, aprovechamiento {eff:.0%}")
+
+    path = tempfile.mkdtemp()
+    store = EmbeddingStore(path, dim=encoder.dim, dtype=args.dtype, model=encoder.name)
+    stage = EmbeddingStage(encoder, store, batch_size=args.batch_size)
+    t0 = time.perf_counter()
+    vecs = stage.embed(texts)
+    print(f"frío     {time.perf_counter() - t0:7.2f}s  {stage.stats.summary()}")
+
+    day2 = texts[: int(args.n * 0.9)] + corpus(int(args.n * 0.1), 0.0, offset=args.n)
+    stage.stats = type(stage.stats)()
+    t0 = time.perf_counter()
+    stage.embed(day2)
+    print(f"caliente {time.perf_counter() - t0:7.2f}s  {stage.stats.summary()}")
+
+    ref = encoder.encode(texts[:100])
+    err = float(np.abs(vecs[:100] - ref).max())
+    size = os.path.getsize(os.path.join(path, "vectors.bin")) / 2 ** 20
+    print(f"store {args.dtype}: {len(store)} filas, {size:.1f} MB en disco, error máx vs float32 {err:.1e}")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# test/benchmarks/bench_fulltext.py
+"""
+Búsqueda de un concepto sobre posts guardados: LIKE sobre vw_posts (DuckDB
+relee title/selftext de todos los Parquet) frente a FullTextIndex (FTS5, BM25).
+
+  - construcción del índice desde cero y refresh incremental con un fichero nuevo
+  - latencia (mediana) de consultas de una palabra, frase, prefijo y un
+    concepto con sus expansiones (OR de varios términos)
+  - mismos ids encontrados por ambos caminos (sin límite de resultados)
+
+    python -m test.benchmarks.bench_fulltext --files 20 --rows 50000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from src.storage import DuckDBIndex, FullTextIndex, ParquetStorage
+from test.benchmarks._util import timed_median, write_posts
+from test.benchmarks.fake_reddit import make_post
+
+TOPICAL = (
+    "running shoes trainers sneakers marathon race pace injury knee coffee café "
+    "espresso barista budget ahorro hipoteca alquiler receta cocina python rust "
+    "duckdb parquet laptop keyboard monitor garden tomato bike commute rain "
+    "holiday playa montaña trail ultra recovery stretching diet protein"
+).split()
+# Relleno: el vocabulario real tiene una cola larga de palabras poco frecuentes
+VOCAB = [f"w{i}" for i in range(200)] + TOPICAL + [f"x{i}" for i in range(20_000)]
+
+# (nombre, consulta FTS5, condición SQL equivalente sobre txt; title y selftext
+# separados por ' . ' para que una frase no case a caballo entre los dos)
+QUERIES = [
+    ("palabra", "marathon", "txt LIKE '%marathon%'"),
+    ("frase", '"running shoes"', "txt LIKE '%running shoes%'"),
+    ("prefijo", "espress*", "regexp_matches(txt, '\\bespress')"),
+    (
+        "concepto",
+        '"running shoes" OR "trainers" OR "sneakers" OR "race" *',
+        "(txt LIKE '%running shoes%' OR regexp_matches(txt, '\\b(trainers|sneakers)\\b') "
+        "OR regexp_matches(txt, '\\brace'))",
+    ),
+]
+
+
+def _posts(k: int, rows: int, rng: np.random.Generator):
+    words = np.array(VOCAB)
+    picks = words[(rng.zipf(1.1, (rows, 30)) - 1) % len(VOCAB)]
+    posts = []
+    for i in range(rows):
+        p = make_post(f"/r/sub{k % 10}/new", k * rows + i)
+        p["title"] = " ".join(picks[i, :8])
+        p["selftext"] = " ".join(picks[i, 8:]) + " " + p["selftext"]
+        posts.append(p)
+    return posts
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--files", type=int, default=20)
+    ap.add_argument("--rows", type=int, default=50_000)
+    ap.add_argument("--repeats", type=int, default=5)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(7)
+    base = tempfile.mkdtemp()
+    storage = ParquetStorage(base_dir=base, dataset="posts")
+    for k in range(args.files):
+        write_posts(storage, _posts(k, args.rows, rng), f"crawl{k}")
+    parquet_mb = sum(
+        os.path.getsize(os.path.join(dp, f)) for dp, _, fs in os.walk(os.path.join(base, "posts")) for f in fs
+    ) / 2 ** 20
+
+    views = DuckDBIndex(db_path=os.path.join(base, "views.duckdb"), base_dir=base)
+    views.create_view_for_dataset("posts", latest_only=True)
+    con = views.connect()
+
+    db = os.path.join(base, "fulltext.sqlite")
+    index = FullTextIndex(db, base_dir=base)
+    print("construcción:", index.refresh().summary())
+    print("refresh sin cambios:", index.refresh().summary())
+    write_posts(storage, _posts(args.files, args.rows, rng), "new")
+    print("refresh +1 fichero:", index.refresh().summary())
+    # Recrawl del primer fichero (retrieved_at nuevo): 1 de cada 10 posts editado
+    time.sleep(1.1)
+    again = _posts(0, args.rows, np.random.default_rng(1))
+    for p, q in zip(again, _posts(0, args.rows, np.random.default_rng(7))):
+        if int(p["id"], 16) % 10:
+            p["title"], p["selftext"] = q["title"], q["selftext"]
+    write_posts(storage, again, "recrawl")
+    print("refresh recrawl:", index.refresh().summary(), f"(huérfanos: {index.stale})")
+    index.optimize()
+    index_mb = sum(os.path.getsize(p) for p in (db, db + "-wal") if os.path.exists(p)) / 2 ** 20
+    print(f"Parquet {parquet_mb:.1f} MB, índice {index_mb:.1f} MB\n")
+
+    print(f"{'consulta':<10} {'coinciden':>10} {'LIKE ms':>9} {'FTS top50 ms':>13} {'FTS todos ms':>13}  iguales")
+    for name, fts_q, cond in QUERIES:
+        sql = f"SELECT id FROM (SELECT id, lower(title || ' . ' || selftext) AS txt FROM vw_posts) WHERE {cond}"
+        like_ids = {r[0] for r in con.execute(sql).fetchall()}
+        fts_ids = set(index.search(fts_q, n=None)["id"])
+        like_ms = timed_median(lambda: con.execute(sql).fetchall(), args.repeats, warmup=True)
+        top_ms = timed_median(lambda: index.search(fts_q, n=50), args.repeats, warmup=True)
+        all_ms = timed_median(lambda: index.search(fts_q, n=None), args.repeats, warmup=True)
+        print(
+            f"{name:<10} {len(fts_ids):>10} {like_ms:>9.1f} {top_ms:>13.1f} {all_ms:>13.1f}  "
+            f"{'sí' if like_ids == fts_ids else f'no ({len(like_ids)} LIKE)'}"
+        )
+
+    expand = lambda w, n: ["trainers", "sneakers", "race*"]   # sin WordNet: expansión fija
+    ms = timed_median(
+        lambda: index.search_concept("running shoes", expand=expand, subreddit="sub3"), args.repeats, warmup=True
+    )
+    top = index.search_concept("running shoes", n=3, expand=expand, subreddit="sub3")
+    print(f"\nsearch_concept filtrado por subreddit: {ms:.1f} ms")
+    print(top.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
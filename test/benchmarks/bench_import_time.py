@@ -0,0 +1,105 @@
+# test/benchmarks/bench_import_time.py
+"""
+Regresión de tiempo de arranque: importa cada módulo en un intérprete nuevo con
+`python -X importtime`, suma el tiempo acumulado (us) del módulo y comprueba qué
+dependencias pesadas (pandas, pyarrow, duckdb, nltk, httpx...) quedaron cargadas.
+
+Se compara con una línea base JSON: falla (exit 1) si un módulo tarda más de
+`--tolerance` veces lo registrado o si carga una dependencia pesada que no debe.
+
+    python -m test.benchmarks.bench_import_time                  # comparar
+    python -m test.benchmarks.bench_import_time --update         # regrabar la base
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+HEAVY = ("pandas", "pyarrow", "duckdb", "numpy", "nltk", "httpx", "requests", "pydantic_settings")
+
+# módulo -> dependencias pesadas que NO debe cargar al importarse
+TARGETS: Dict[str, Tuple[str, ...]] = {
+    "src.clients": HEAVY,
+    "src.storage": HEAVY,
+    "src.pipeline": HEAVY,
+    "src.clients.synonim_gen": HEAVY,
+    "src.clients.reddit": ("pandas", "pyarrow", "duckdb", "numpy", "nltk", "httpx"),
+    "src.pipeline.query_planner": HEAVY,
+    "src.storage.checkpoints": HEAVY,
+    "src.settings": ("pandas", "pyarrow", "duckdb", "numpy", "nltk", "httpx", "requests"),
+}
+
+BASELINE = os.path.join(os.path.dirname(__file__), "import_time_baseline.json")
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def measure(module: str) -> Tuple[int, List[str]]:
+    """
+    (us acumulados del módulo, dependencias pesadas cargadas) en un proceso limpio.
+    """
+    code = (
+        f"import {module}, sys; "
+        f"print(','.join(m for m in {HEAVY!r} if m in sys.modules))"
+    )
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, env=env, check=True,
+    )
+    cumulative = 0
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if m and m.group(4) == module:
+            cumulative = int(m.group(2))
+    loaded = [x for x in proc.stdout.strip().split(",") if x]
+    return cumulative, loaded
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=5, help="mediana de N procesos por módulo")
+    ap.add_argument("--tolerance", type=float, default=2.0, help="factor máximo sobre la base")
+    ap.add_argument("--baseline", default=BASELINE)
+    ap.add_argument("--update", action="store_true", help="regrabar la línea base")
+    args = ap.parse_args()
+
+    base: Dict[str, int] = {}
+    if os.path.exists(args.baseline) and not args.update:
+        with open(args.baseline, encoding="utf-8") as f:
+            base = json.load(f)
+
+    results: Dict[str, int] = {}
+    failures: List[str] = []
+    print(f"{'módulo':<30} {'ms':>8} {'base':>8}  pesadas cargadas")
+    for module, forbidden in TARGETS.items():
+        runs = [measure(module) for _ in range(args.repeat)]
+        us = int(statistics.median(r[0] for r in runs))
+        loaded = runs[-1][1]
+        results[module] = us
+        ref = base.get(module)
+        bad = [m for m in loaded if m in forbidden]
+        print(
+            f"{module:<30} {us / 1000:>8.1f} {(ref or 0) / 1000:>8.1f}  "
+            f"{','.join(loaded) or '-'}{'  <- ' + ','.join(bad) if bad else ''}"
+        )
+        if bad:
+            failures.append(f"{module} carga {','.join(bad)} al importarse")
+        # Umbral absoluto mínimo de 5 ms: por debajo, el ruido domina
+        if ref and us > max(ref * args.tolerance, ref + 5000):
+            failures.append(f"{module}: {us / 1000:.1f} ms > {args.tolerance}x base ({ref / 1000:.1f} ms)")
+
+    if args.update:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Línea base guardada en {args.baseline}")
+    if failures:
+        print("\nREGRESIONES:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
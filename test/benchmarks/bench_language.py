@@ -0,0 +1,149 @@
+# test/benchmarks/bench_language.py
+"""
+LanguageStage: acierto del StopwordDetector y escalado con el número de procesos.
+
+  - posts sintéticos en es/en/pt/fr/de/it (frases reales combinadas, con URLs,
+    markdown y [removed] de ruido) en lotes como los de streaming
+  - acierto total y con lang_conf >= 0.5 (lo que filtraría keep=...)
+  - filas/s con workers = 1 (en proceso), 2, 4... hasta los núcleos de la
+    máquina, speedup y eficiencia (speedup / workers)
+  - mismo Pool pasando los textos por pickle en vez de Arrow IPC en /dev/shm
+
+    python -m test.benchmarks.bench_language --rows 200000 --batch 20000
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pyarrow as pa
+
+from src.transform.language import LanguageStage, StopwordDetector, detection_text_array
+
+SENTENCES = {
+    "es": [
+        "¿Alguien sabe dónde comprar zapatillas para correr baratas?",
+        "Llevo dos meses entrenando para la maratón y me duele la rodilla",
+        "Busco recomendaciones de un portátil para programar que no sea muy caro",
+        "La hipoteca me sube otra vez este año y no sé qué hacer",
+        "Gracias a todos por los consejos, al final compré las que me dijisteis",
+        "Es mejor esperar a las rebajas o comprarlo ahora?",
+    ],
+    "en": [
+        "Anyone know where to buy cheap running shoes?",
+        "I have been training for the marathon for two months and my knee hurts",
+        "Looking for a laptop for programming that is not too expensive",
+        "My mortgage is going up again this year and I do not know what to do",
+        "Thanks everyone for the advice, I ended up buying the ones you said",
+        "Is it better to wait for the sales or buy it now?",
+    ],
+    "pt": [
+        "Alguém sabe onde comprar tênis de corrida baratos?",
+        "Estou treinando para a maratona há dois meses e meu joelho dói",
+        "Procuro um notebook para programar que não seja muito caro",
+        "A minha hipoteca sobe outra vez este ano e não sei o que fazer",
+        "Obrigado a todos pelos conselhos, no fim comprei os que vocês disseram",
+        "É melhor esperar pelas promoções ou comprar agora?",
+    ],
+    "fr": [
+        "Quelqu'un sait où acheter des chaussures de course pas chères ?",
+        "Je m'entraîne pour le marathon depuis deux mois et j'ai mal au genou",
+        "Je cherche un ordinateur portable pour programmer qui ne soit pas trop cher",
+        "Mon crédit immobilier augmente encore cette année et je ne sais pas quoi faire",
+        "Merci à tous pour les conseils, j'ai fini par acheter celles que vous avez dit",
+        "Est-ce qu'il vaut mieux attendre les soldes ou l'acheter maintenant ?",
+    ],
+    "de": [
+        "Weiß jemand, wo man günstige Laufschuhe kaufen kann?",
+        "Ich trainiere seit zwei Monaten für den Marathon und mein Knie tut weh",
+        "Ich suche einen Laptop zum Programmieren, der nicht zu teuer ist",
+        "Meine Hypothek steigt dieses Jahr wieder und ich weiß nicht, was ich tun soll",
+        "Danke an alle für die Tipps, am Ende habe ich die gekauft, die ihr gesagt habt",
+        "Ist es besser, auf den Sale zu warten oder es jetzt zu kaufen?",
+    ],
+    "it": [
+        "Qualcuno sa dove comprare scarpe da corsa economiche?",
+        "Mi alleno per la maratona da due mesi e mi fa male il ginocchio",
+        "Cerco un portatile per programmare che non sia troppo caro",
+        "Il mio mutuo aumenta di nuovo quest'anno e non so cosa fare",
+        "Grazie a tutti per i consigli, alla fine ho comprato quelle che avete detto",
+        "È meglio aspettare i saldi o comprarlo adesso?",
+    ],
+}
+NOISE = ["https://example.com/p/123", "**EDIT:**", "[removed]", "r/running", "> cita", "10/10", "🔥"]
+
+
+def make_table(rows: int, rng: np.random.Generator):
+    langs = list(SENTENCES)
+    truth = [langs[i] for i in rng.integers(0, len(langs), rows)]
+    titles, bodies = [], []
+    for lang in truth:
+        s = SENTENCES[lang]
+        titles.append(s[rng.integers(len(s))])
+        parts = [s[j] for j in rng.integers(0, len(s), rng.integers(0, 5))]
+        if rng.random() < 0.3:
+            parts.insert(int(rng.integers(len(parts) + 1)), NOISE[rng.integers(len(NOISE))])
+        bodies.append(" ".join(parts) or None)
+    return pa.table({"id": [f"p{i}" for i in range(rows)], "title": titles, "selftext": bodies}), truth
+
+
+def _pickle_shard(texts):
+    return StopwordDetector().detect(texts)
+
+
+def run_pickle(stage: LanguageStage, table: pa.Table, batch: int) -> None:
+    """Mismo reparto, pero los textos viajan al Pool como listas de str (pickle)."""
+    pool = stage._get_pool()
+    for start in range(0, table.num_rows, batch):
+        t = table.slice(start, batch)
+        texts = detection_text_array(t["title"], t["selftext"]).to_pylist()
+        step = max(stage.shard_rows, -(-len(texts) // (stage.workers * 4)))
+        list(pool.map(_pickle_shard, [texts[k:k + step] for k in range(0, len(texts), step)], chunksize=1))
+
+
+def run(stage: LanguageStage, table: pa.Table, batch: int) -> float:
+    t0 = time.perf_counter()
+    for start in range(0, table.num_rows, batch):
+        stage.process(table.slice(start, batch))
+    return time.perf_counter() - t0
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=200_000)
+    ap.add_argument("--batch", type=int, default=20_000)
+    ap.add_argument("--workers", type=int, nargs="*", default=None)
+    args = ap.parse_args()
+
+    cores = os.cpu_count() or 1
+    counts = args.workers or sorted({1, 2, 4, 8, 16, cores} & set(range(1, max(cores, 2) + 1)))
+    table, truth = make_table(args.rows, np.random.default_rng(0))
+    print(f"{args.rows} posts, lotes de {args.batch}, {cores} núcleos")
+
+    with LanguageStage(workers=1) as stage:
+        out = stage.process(table)
+    pred = out["lang"].to_pylist()
+    conf = out["lang_conf"].to_numpy()
+    ok = np.array([p == t for p, t in zip(pred, truth)])
+    sure = conf >= 0.5
+    print(f"acierto {ok.mean():.1%}; con lang_conf >= 0.5: {ok[sure].mean():.1%} ({sure.mean():.0%} de las filas)")
+    print(stage.stats.summary(), "\n")
+
+    base = None
+    print(f"{'workers':>7} {'filas/s':>10} {'speedup':>8} {'eficiencia':>10} {'pickle filas/s':>15}")
+    for w in counts:
+        with LanguageStage(workers=w, min_parallel_rows=0 if w > 1 else 2 ** 62) as stage:
+            run(stage, table.slice(0, args.batch), args.batch)   # calentamiento (arranque del Pool)
+            elapsed = run(stage, table, args.batch)
+            pickled = ""
+            if w > 1:
+                t0 = time.perf_counter()
+                run_pickle(stage, table, args.batch)
+                pickled = f"{args.rows / (time.perf_counter() - t0):,.0f}"
+        rate = args.rows / elapsed
+        base = base or rate
+        print(f"{w:>7} {rate:>10,.0f} {rate / base:>7.2f}x {rate / base / w:>10.0%} {pickled:>15}")
+
+
+if __name__ == "__main__":
+    main()
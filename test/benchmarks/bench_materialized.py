@@ -0,0 +1,99 @@
+# test/benchmarks/bench_materialized.py
+"""
+Consultas analíticas repetidas: vistas parquet_scan (DuckDBIndex) frente a
+tablas materializadas + rollups (MaterializedIndex), y coste de un refresh
+incremental tras añadir un fichero nuevo.
+
+check_timezones(): refreshes sucesivos desde procesos con TZ distintos
+(America/New_York, Asia/Kolkata) -> horas del rollup en UTC y sin doble conteo.
+
+    python -m test.benchmarks.bench_materialized --files 200 --rows 2000
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List
+
+from src.storage import DuckDBIndex, MaterializedIndex, ParquetStorage
+from test.benchmarks._util import timed_median, write_posts
+from test.benchmarks.fake_reddit import make_post
+
+HOURLY_SQL = """
+SELECT subreddit, date_trunc('hour', to_timestamp(created_utc)) AS hour,
+       COUNT(*) AS posts, SUM(score) AS score_sum
+FROM {src} GROUP BY ALL ORDER BY subreddit, hour
+"""
+ROLLUP_SQL = "SELECT subreddit, hour, posts, score_sum FROM rollup_posts_hourly ORDER BY subreddit, hour"
+
+
+def _posts(k: int, rows: int) -> List[Dict]:
+    start = (k // 10) * rows // 2
+    return [make_post(f"/r/sub{k % 10}/new", i) for i in range(start, start + rows)]
+
+
+def _refresh_with_tz(tz: str, db: str, base: str) -> None:
+    # DuckDB toma el TZ del entorno al arrancar: hace falta un proceso nuevo
+    code = (
+        "from src.storage import MaterializedIndex; "
+        f"MaterializedIndex(db_path={db!r}, base_dir={base!r}).refresh('posts')"
+    )
+    subprocess.run([sys.executable, "-c", code], env={**os.environ, "TZ": tz}, check=True)
+
+
+def check_timezones(rows: int = 500) -> None:
+    base = tempfile.mkdtemp()
+    storage = ParquetStorage(base_dir=base, dataset="posts")
+    db = os.path.join(base, "tz.duckdb")
+    for k, tz in enumerate(("America/New_York", "Asia/Kolkata")):
+        write_posts(storage, _posts(k, rows), f"crawl{k}")
+        _refresh_with_tz(tz, db, base)
+    mat = MaterializedIndex(db_path=db, base_dir=base)
+    hours = mat.query("SELECT epoch(hour)::BIGINT AS h, posts FROM rollup_posts_hourly")
+    total = mat.query("SELECT COUNT(*) AS n FROM mt_posts")["n"][0]
+    mat.close()
+    assert (hours["h"] % 3600 == 0).all(), "horas del rollup fuera de UTC"
+    assert hours["posts"].sum() == total, f"{hours['posts'].sum()} posts en el rollup, {total} en la tabla"
+    print("check_timezones: ok")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--files", type=int, default=200)
+    ap.add_argument("--rows", type=int, default=2000)
+    ap.add_argument("--repeats", type=int, default=5)
+    args = ap.parse_args()
+
+    check_timezones()
+    base = tempfile.mkdtemp()
+    storage = ParquetStorage(base_dir=base, dataset="posts")
+    for k in range(args.files):
+        write_posts(storage, _posts(k, args.rows), f"crawl{k}")
+
+    views = DuckDBIndex(db_path=os.path.join(base, "views.duckdb"), base_dir=base)
+    views.create_view_for_dataset("posts", latest_only=True)
+    mat = MaterializedIndex(db_path=os.path.join(base, "mat.duckdb"), base_dir=base)
+    print("refresh inicial:", mat.refresh("posts").summary())
+
+    expected = views.query(HOURLY_SQL.format(src="vw_posts"))
+    got = mat.query(ROLLUP_SQL)
+    assert len(expected) == len(got) and (expected["posts"].to_numpy() == got["posts"].to_numpy()).all()
+    assert (expected["score_sum"].to_numpy() == got["score_sum"].to_numpy()).all()
+
+    t_view = timed_median(lambda: views.query(HOURLY_SQL.format(src="vw_posts")), args.repeats)
+    t_table = timed_median(lambda: mat.query(HOURLY_SQL.format(src="mt_posts")), args.repeats)
+    t_rollup = timed_median(lambda: mat.query(ROLLUP_SQL), args.repeats)
+    print(f"posts/hora: vista {t_view:.1f} ms | tabla {t_table:.1f} ms | rollup {t_rollup:.1f} ms")
+
+    write_posts(storage, _posts(args.files, args.rows), f"crawl{args.files}")
+    print("refresh incremental:", mat.refresh("posts").summary())
+    expected = views.query(HOURLY_SQL.format(src="vw_posts"))
+    got = mat.query(ROLLUP_SQL)
+    assert (expected["posts"].to_numpy() == got["posts"].to_numpy()).all()
+    print("refresh sin cambios:", mat.refresh("posts").summary())
+    mat.close()
+
+
+if __name__ == "__main__":
+    main()
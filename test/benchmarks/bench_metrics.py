@@ -0,0 +1,111 @@
+# test/benchmarks/bench_metrics.py
+"""
+Coste de la instrumentación (src.metrics):
+  micro: ns por span()/count()/función decorada, desactivada y activada
+  crawl: listing -> normalize_posts -> save_df contra FakeReddit sin latencia,
+         desactivada frente a activada (con y sin log JSON por span)
+
+Al final vuelca el fichero Prometheus y unas líneas del log JSON.
+
+    python -m test.benchmarks.bench_metrics --subs 8 --items 1000
+"""
+import argparse
+import io
+import logging
+import os
+import statistics
+import tempfile
+import time
+import timeit
+
+from src import metrics
+from src.logging_cfg import JsonFormatter
+from src.storage import ParquetStorage
+from test.benchmarks.bench_scheduler import fake_client
+from test.benchmarks.fake_reddit import FakeReddit
+
+
+def micro(n: int = 200_000) -> None:
+    @metrics.timed("noop")
+    def decorated():
+        return None
+
+    def bare():
+        return None
+
+    def with_span():
+        with metrics.span("noop"):
+            pass
+
+    cases = {
+        "llamada vacía": bare,
+        "función @timed": decorated,
+        "with span()": with_span,
+        "count()": lambda: metrics.count("noop"),
+    }
+    for state in ("desactivada", "activada"):
+        metrics.enable() if state == "activada" else metrics.disable()
+        row = []
+        for name, fn in cases.items():
+            ns = min(timeit.repeat(fn, number=n, repeat=3)) / n * 1e9
+            row.append(f"{name} {ns:5.0f} ns")
+        print(f"{state:<12} " + " | ".join(row))
+    metrics.disable()
+    metrics.reset()
+
+
+def crawl(fr: FakeReddit, subs: int, items: int) -> float:
+    rc = fake_client(fr.auth_url, fr.api_base)
+    storage = ParquetStorage(base_dir=tempfile.mkdtemp(), dataset="posts")
+    t0 = time.perf_counter()
+    for i in range(subs):
+        df = rc.subreddit_new_df(f"bench{i}", max_items=items)
+        storage.save_df(df, suffix=f"new_bench{i}")
+    return time.perf_counter() - t0
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--subs", type=int, default=8)
+    ap.add_argument("--items", type=int, default=1000)
+    ap.add_argument("--repeats", type=int, default=5)
+    args = ap.parse_args()
+
+    micro()
+
+    log = io.StringIO()
+    handler = logging.StreamHandler(log)
+    handler.setFormatter(JsonFormatter())
+    mlog = logging.getLogger("tfm.metrics")
+    mlog.addHandler(handler)
+    mlog.setLevel(logging.INFO)
+    mlog.propagate = False
+
+    modes = {
+        "desactivada": lambda: metrics.disable(),
+        "activada": lambda: metrics.enable(),
+        "activada+log": lambda: metrics.enable(log_spans=True),
+    }
+    times = {m: [] for m in modes}
+    with FakeReddit(latency=0.0, items_per_source=args.items) as fr:
+        crawl(fr, 1, args.items)  # calentamiento
+        for _ in range(args.repeats):
+            for mode, setup in modes.items():  # intercalados: el ruido afecta a todos por igual
+                setup()
+                times[mode].append(crawl(fr, args.subs, args.items))
+    metrics.disable()
+
+    base = statistics.median(times["desactivada"])
+    for mode, ts in times.items():
+        med = statistics.median(ts)
+        print(f"crawl {mode:<13} {med:6.3f}s  ({(med / base - 1) * 100:+5.1f}%)")
+
+    path = metrics.write_prometheus(os.path.join(tempfile.mkdtemp(), "tfm.prom"))
+    with open(path, encoding="utf-8") as f:
+        prom = [l for l in f.read().splitlines() if not l.startswith("tfm_span_seconds_bucket")]
+    print(f"\n{path}:\n  " + "\n  ".join(prom[:30]))
+    print("\nlog JSON:\n  " + "\n  ".join(log.getvalue().splitlines()[:3]))
+
+
+if __name__ == "__main__":
+    main()
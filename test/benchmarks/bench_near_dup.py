@@ -0,0 +1,81 @@
+# test/benchmarks/bench_near_dup.py
+"""
+Casi-duplicados: corpus sintético con un % de copias editadas (copypasta con
+un par de palabras cambiadas, cross-posts con otro título) que llega por lotes.
+Mide throughput, tamaño del índice y precisión/recall frente a la verdad.
+
+    python -m test.benchmarks.bench_near_dup --n 200000 --dup-ratio 0.2
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from src.transform.near_dup import NearDupIndex, dedup_text
+
+WORDS = (
+    "zapatillas carbono running maratón placa espuma ritmo kilómetros entreno "
+    "rodaje series tempo descanso lesión gemelo rodilla talón drop amortiguación "
+    "precio oferta tienda talla horma review opinión duración suela asfalto"
+).split()
+
+
+def make_doc(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(30, 120)))
+
+
+def edit(doc: str, rng: random.Random) -> str:
+    words = doc.split()
+    for _ in range(max(1, len(words) // 40)):
+        words[rng.randrange(len(words))] = rng.choice(WORDS)
+    return " ".join(words)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=100_000)
+    ap.add_argument("--dup-ratio", type=float, default=0.2)
+    ap.add_argument("--batch", type=int, default=10_000)
+    args = ap.parse_args()
+
+    rng = random.Random(7)
+    ids, texts, truth = [], [], {}
+    for i in range(args.n):
+        pid = f"p{i}"
+        if texts and rng.random() < args.dup_ratio:
+            j = rng.randrange(len(texts))
+            texts.append(edit(texts[j], rng))
+            truth[pid] = truth.get(ids[j], ids[j])
+        else:
+            texts.append(make_doc(rng))
+        ids.append(pid)
+
+    path = os.path.join(tempfile.mkdtemp(), "near_dup.sqlite")
+    index = NearDupIndex(path)
+    t0 = time.perf_counter()
+    found = {}
+    for k in range(0, args.n, args.batch):
+        res = index.check(ids[k:k + args.batch], [dedup_text(t, None) for t in texts[k:k + args.batch]])
+        found.update({pid: d for pid, d in zip(ids[k:k + args.batch], res) if d})
+    elapsed = time.perf_counter() - t0
+
+    tp = sum(1 for pid in found if pid in truth)
+    precision = tp / len(found) if found else 1.0
+    recall = tp / len(truth) if truth else 1.0
+    same_root = sum(1 for pid, d in found.items() if truth.get(pid) == d) / max(tp, 1)
+    print(
+        f"n={args.n} en {elapsed:.1f}s ({args.n / elapsed:,.0f} posts/s), "
+        f"índice {os.path.getsize(path) / 1e6:.0f} MB\n"
+        f"duplicados reales {len(truth)}, marcados {len(found)}: "
+        f"precisión {precision:.3f}, recall {recall:.3f}, canónico correcto {same_root:.3f}"
+    )
+    # Segunda pasada: ids ya indexados -> respuesta inmediata
+    t0 = time.perf_counter()
+    index.check(ids[:args.batch], texts[:args.batch])
+    print(f"re-check de {args.batch} ids ya vistos: {(time.perf_counter() - t0) * 1000:.0f} ms")
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# test/benchmarks/bench_normalize.py
+"""
+Filas/s de normalize_posts (fila a fila) vs normalize_posts_table (columnar).
+
+    python -m test.benchmarks.bench_normalize --n 1000000
+"""
+import argparse
+import time
+
+from src.transform.normalizers import normalize_posts
+from src.transform.arrow_normalizers import normalize_posts_table, normalize_posts_arrow
+from test.benchmarks.fake_reddit import make_post
+
+
+def synthetic_children(n: int):
+    out = []
+    for i in range(n):
+        p = make_post(f"/r/sub{i % 200}/new", i)
+        if i % 17 == 0:
+            p["title"] = "Q&A: precios &lt;100€&gt; &#x200B; ¿merece&nbsp;la pena?"
+        out.append({"kind": "t3", "data": p})
+    return out
+
+
+def check_equivalence(children) -> None:
+    a = normalize_posts(children).drop(columns=["retrieved_at"]).reset_index(drop=True)
+    b = normalize_posts_arrow(children).drop(columns=["retrieved_at"]).reset_index(drop=True)
+    assert list(a.columns) == list(b.columns), (a.columns, b.columns)
+    assert a.dtypes.equals(b.dtypes), f"dtypes difieren:\n{a.dtypes}\n{b.dtypes}"
+    for c in a.columns:
+        left = a[c].astype(object).where(a[c].notna(), None).tolist()
+        right = b[c].astype(object).where(b[c].notna(), None).tolist()
+        if c == "upvote_ratio":
+            left = [None if x is None else round(float(x), 4) for x in left]
+            right = [None if x is None else round(float(x), 4) for x in right]
+        assert left == right, f"columna {c} difiere"
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=200_000)
+    args = ap.parse_args()
+
+    children = synthetic_children(args.n)
+    check_equivalence(children[:5000])
+
+    t0 = time.perf_counter()
+    df = normalize_posts(children)
+    t_py = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    table = normalize_posts_table(children)
+    t_arrow = time.perf_counter() - t0
+
+    print(f"python: {len(df):>9} filas en {t_py:6.2f}s  ({len(df) / t_py:10.0f} filas/s)")
+    print(f"arrow : {table.num_rows:>9} filas en {t_arrow:6.2f}s  ({table.num_rows / t_arrow:10.0f} filas/s)")
+    print(f"speedup x{t_py / t_arrow:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# test/benchmarks/bench_parquet_layout.py
+"""
+Mismos posts escritos de dos formas:
+  legacy  : save_df sin registro (tipos del downcast de pandas, ZSTD 7 en todo,
+            sin orden ni tamaño de row group)
+  registry: save_df con el registro (tipos canónicos, orden subreddit/created_utc,
+            row groups de 128k, codificación y nivel ZSTD por columna)
+
+Compara throughput de escritura, tamaño en disco (total y por columna) y tiempo
+de escaneo DuckDB: agregado completo, filtro selectivo (un subreddit y una
+semana: aquí cuenta la poda por min/max) y lectura de texto.
+
+    python -m test.benchmarks.bench_parquet_layout --files 8 --rows 100000
+"""
+import argparse
+import glob
+import os
+import statistics
+import tempfile
+import time
+from collections import defaultdict
+
+import duckdb
+import numpy as np
+import pyarrow.parquet as pq
+
+from src.storage import ParquetStorage
+from src.transform.normalizers import normalize_posts
+from test.benchmarks.fake_reddit import BASE_TS, make_post
+
+QUERIES = {
+    "agregado": "SELECT subreddit, COUNT(*), AVG(score), SUM(num_comments) FROM {src} GROUP BY 1",
+    "selectivo": (
+        "SELECT COUNT(*), AVG(score) FROM {src} WHERE subreddit = 'sub7' "
+        f"AND created_utc BETWEEN {BASE_TS - 14 * 86400} AND {BASE_TS - 7 * 86400}"
+    ),
+    "texto": "SELECT COUNT(*) FROM {src} WHERE title ILIKE '%oferta%'",
+}
+
+
+def crawl(k: int, rows: int, rng: np.random.Generator):
+    """Un crawl: subreddits mezclados y fechas desordenadas (como llegan del listing)."""
+    subs = rng.zipf(1.5, rows) % 200
+    ages = rng.integers(0, 60 * 86400, rows)
+    posts = []
+    for i in range(rows):
+        p = make_post(f"/r/sub{subs[i]}/new", k * rows + i)
+        p["created_utc"] = float(BASE_TS - ages[i])
+        # Crawls con scores pequeños: el downcast de pandas los deja en int8
+        p["score"] = int(rng.integers(0, 100_000 if k % 2 else 100))
+        if i % 13 == 0:
+            p["title"] += " oferta"
+        posts.append(p)
+    return normalize_posts(posts)
+
+
+def column_sizes(files):
+    sizes = defaultdict(int)
+    for f in files:
+        md = pq.ParquetFile(f).metadata
+        for rg in range(md.num_row_groups):
+            for c in range(md.num_columns):
+                col = md.row_group(rg).column(c)
+                sizes[col.path_in_schema] += col.total_compressed_size
+    return sizes
+
+
+def scan(bases, repeats: int):
+    """
+    Mediana por consulta y modo; las repeticiones se intercalan entre modos
+    para que el ruido (caché, otros procesos) les afecte por igual.
+    """
+    con = duckdb.connect()
+    times = {mode: defaultdict(list) for mode in bases}
+    for name, sql in QUERIES.items():
+        for r in range(repeats + 1):
+            for mode, base in bases.items():
+                q = sql.format(src=f"read_parquet('{base}/posts/*.parquet', union_by_name = true)")
+                t0 = time.perf_counter()
+                con.execute(q).fetchall()
+                if r:  # la primera es de calentamiento
+                    times[mode][name].append(time.perf_counter() - t0)
+    return {mode: {q: statistics.median(ts) * 1000 for q, ts in qs.items()} for mode, qs in times.items()}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--files", type=int, default=8)
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--repeats", type=int, default=7)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(3)
+    frames = [crawl(k, args.rows, rng) for k in range(args.files)]
+    n = sum(len(df) for df in frames)
+
+    results = {}
+    for mode in ("legacy", "registry"):
+        base = tempfile.mkdtemp()
+        storage = ParquetStorage(base, "posts", use_registry=(mode == "registry"))
+        t0 = time.perf_counter()
+        for k, df in enumerate(frames):
+            storage.save_df(df, suffix=f"crawl{k}")
+        elapsed = time.perf_counter() - t0
+        files = glob.glob(os.path.join(base, "posts", "*.parquet"))
+        schemas = {pq.read_schema(f).remove_metadata().to_string() for f in files}
+        results[mode] = {
+            "write": n / elapsed,
+            "mb": sum(map(os.path.getsize, files)) / 2 ** 20,
+            "cols": column_sizes(files),
+            "schemas": len(schemas),
+            "base": base,
+        }
+    scans = scan({mode: r["base"] for mode, r in results.items()}, args.repeats)
+    for mode, r in results.items():
+        r["scan"] = scans[mode]
+
+    print(f"{n} posts en {args.files} ficheros")
+    print(f"{'':<10} {'filas/s':>10} {'MB':>7}  " + "  ".join(f"{q + ' ms':>13}" for q in QUERIES) + "  schemas distintos")
+    for mode, r in results.items():
+        scans = "  ".join(f"{r['scan'][q]:>13.1f}" for q in QUERIES)
+        print(f"{mode:<10} {r['write']:>10,.0f} {r['mb']:>7.1f}  {scans}  {r['schemas']:>3}")
+
+    print("\nKB por columna (legacy -> registry):")
+    a, b = results["legacy"]["cols"], results["registry"]["cols"]
+    for c in sorted(a, key=lambda c: -a[c]):
+        print(f"  {c:<24} {a[c] / 1024:9.0f} -> {b.get(c, 0) / 1024:9.0f}")
+
+
+if __name__ == "__main__":
+    main()
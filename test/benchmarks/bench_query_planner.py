@@ -0,0 +1,92 @@
+# test/benchmarks/bench_query_planner.py
+"""
+Llamadas a la API por concepto: una search() por variante (paginando hasta
+max_items) frente a QueryPlanner (consultas OR + corte por solape + saturación).
+
+Corpus sintético: cada variante casa con un subconjunto de posts y las
+variantes se solapan mucho (como sinónimos reales); el cliente falso resuelve
+"a OR b" como la unión (sort=new: los posts nuevos primero) y cuenta páginas.
+Segunda pasada: al día siguiente, con los ids ya ingeridos como `seen` y un 5%
+de posts nuevos.
+
+    python -m test.benchmarks.bench_query_planner --variants 15 --overlap 0.8
+"""
+import argparse
+import random
+import re
+from typing import Dict, Iterator, List
+
+from src.pipeline import QueryPlanner
+
+
+class FakeSearchClient:
+    def __init__(self, index: Dict[str, List[str]]):
+        self.index = index
+        self.requests = 0
+
+    def search(self, query: str, limit: int = 100, max_items: int = 1000, **_) -> Iterator[Dict]:
+        terms = [t.strip('"') for t in re.split(r" OR ", query)]
+        ids = sorted(
+            {pid for t in terms for pid in self.index.get(t, [])},
+            key=lambda p: (not p.startswith("new"), hash((p, query))),
+        )
+        ids = ids[:max_items]
+        for start in range(0, len(ids), limit):
+            self.requests += 1
+            for pid in ids[start:start + limit]:
+                yield {"id": pid}
+        if not ids:
+            self.requests += 1
+
+
+def build_index(n_variants: int, per_variant: int, overlap: float, seed: int = 3) -> Dict[str, List[str]]:
+    rng = random.Random(seed)
+    core = [f"c{i}" for i in range(per_variant)]
+    index = {}
+    for v in range(n_variants):
+        own = [f"v{v}_{i}" for i in range(int(per_variant * (1 - overlap)))]
+        shared = rng.sample(core, int(per_variant * overlap))
+        index[f"variant {v}" if v % 3 == 0 else f"variant{v}"] = shared + own
+    return index
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--variants", type=int, default=15)
+    ap.add_argument("--per-variant", type=int, default=300)
+    ap.add_argument("--overlap", type=float, default=0.8)
+    args = ap.parse_args()
+
+    index = build_index(args.variants, args.per_variant, args.overlap)
+    names = list(index)
+    concept, synonyms = names[0], names[1:]
+
+    naive = FakeSearchClient(index)
+    naive_ids = set()
+    for v in names:
+        naive_ids.update(p["id"] for p in naive.search(v))
+
+    client = FakeSearchClient(index)
+    planner = QueryPlanner(client, expand=lambda w, n: synonyms[:n], max_variants=len(synonyms))
+    got = {p["id"] for p in planner.run(concept)}
+
+    print(f"naive  : {naive.requests:4d} peticiones, {len(naive_ids)} ids únicos")
+    print(f"planner: {client.requests:4d} peticiones, {len(got)} ids únicos "
+          f"({len(got) / len(naive_ids):.1%} de cobertura, x{naive.requests / client.requests:.1f} menos llamadas)")
+    print(planner.stats.summary())
+
+    # Día 2: 5% de posts nuevos por variante; los ya ingeridos van en `seen`
+    for v, ids in index.items():
+        index[v] = [f"new_{v}_{i}" for i in range(len(ids) // 20)] + ids
+    naive.requests = client.requests = 0
+    for v in names:
+        list(naive.search(v))
+    fresh = {p["id"] for p in planner.run(concept, seen=set(got))}
+    print(f"día 2 naive  : {naive.requests:4d} peticiones")
+    print(f"día 2 planner: {client.requests:4d} peticiones, {len(fresh)} posts nuevos "
+          f"(x{naive.requests / client.requests:.1f} menos llamadas)")
+    print(planner.stats.summary())
+
+
+if __name__ == "__main__":
+    main()
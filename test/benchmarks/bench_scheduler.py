@@ -0,0 +1,133 @@
+# test/benchmarks/bench_scheduler.py
+"""
+Ingesta de S subreddits (new + top) contra el servidor falso:
+  lineal   : como test/services/reddit_dwl.py, descarga -> normaliza -> guarda, uno tras otro
+  scheduler: IngestScheduler con N procesos de red y M de escritura sobre la JobQueue
+
+Con --crash, un primer run del planificador se interrumpe a mitad y un segundo
+run retoma los alquileres caducados (lease corto) hasta terminar.
+
+Antes, check_requeue(): volver a encolar un trabajo en backoff no resetea sus
+intentos (max_attempts se cumple); uno terminado o fallido sí vuelve a empezar.
+
+    python -m test.benchmarks.bench_scheduler --subs 16 --items 1000 --latency 0.05 --fetchers 8
+"""
+import argparse
+import glob
+import os
+import tempfile
+import threading
+import time
+from functools import partial
+
+from src.clients import RedditClient
+from src.pipeline import IngestScheduler, JobQueue
+from test.benchmarks.fake_reddit import FakeReddit
+
+
+def fake_client(auth_url: str, api_base: str, rate_limiter=None) -> RedditClient:
+    # En procesos 'spawn' los atributos de clase parcheados no se heredan
+    RedditClient.AUTH_URL = auth_url
+    RedditClient.API_BASE = api_base
+    return RedditClient("id", "secret", "bench", rate_limiter=rate_limiter)
+
+
+def count_rows(base_dir: str) -> int:
+    import pyarrow.parquet as pq
+
+    files = glob.glob(os.path.join(base_dir, "posts", "**", "*.parquet"), recursive=True)
+    return sum(pq.ParquetFile(f).metadata.num_rows for f in files)
+
+
+def run_linear(fr: FakeReddit, subs, items: int) -> None:
+    # Imports pesados aquí: fake_client se deserializa en cada proceso 'spawn'
+    from src.storage import ParquetStorage
+
+    rc = fake_client(fr.auth_url, fr.api_base)
+    storage = ParquetStorage(base_dir=tempfile.mkdtemp(), dataset="posts")
+    t0 = time.perf_counter()
+    for sub in subs:
+        storage.save_df(rc.subreddit_new_df(sub, max_items=items), suffix=f"new_{sub}")
+        storage.save_df(rc.subreddit_top_df(sub, t="day", max_items=items), suffix=f"top_{sub}")
+    elapsed = time.perf_counter() - t0
+    print(f"lineal     {elapsed:6.2f}s  {count_rows(storage.base_dir)} filas")
+
+
+def make_scheduler(fr: FakeReddit, tmp: str, args, **kw) -> IngestScheduler:
+    return IngestScheduler(
+        os.path.join(tmp, "jobs.sqlite"), tmp, partial(fake_client, fr.auth_url, fr.api_base),
+        fetch_workers=args.fetchers, write_workers=args.writers, flush_seconds=1.0, poll=0.1, **kw,
+    )
+
+
+def run_scheduler(fr: FakeReddit, subs, items: int, args) -> None:
+    tmp = tempfile.mkdtemp()
+    sched = make_scheduler(fr, tmp, args)
+    sched.plan(subs, kinds=("new", "top"), max_items=items)
+    report = sched.run()
+    print(f"scheduler  {report.elapsed:6.2f}s  {count_rows(tmp)} filas  ({report.summary()})")
+
+
+def run_crash(fr: FakeReddit, subs, items: int, args) -> None:
+    tmp = tempfile.mkdtemp()
+    sched = make_scheduler(fr, tmp, args, lease_seconds=2.0)
+    sched.plan(subs, kinds=("new", "top"), max_items=items)
+    # Interrumpe el primer run a los 0.5 s (como un kill): terminate() de todos los procesos
+    timer = threading.Timer(0.5, _interrupt)
+    timer.start()
+    try:
+        sched.run()
+    except KeyboardInterrupt:
+        pass
+    print(f"crash      tras el corte: {sched.jobs.counts()}")
+    report = make_scheduler(fr, tmp, args, lease_seconds=2.0).run()
+    print(f"reanudado  {report.elapsed:6.2f}s  {count_rows(tmp)} filas  ({report.summary()})")
+
+
+def check_requeue(tmp: str) -> None:
+    with JobQueue(os.path.join(tmp, "requeue.sqlite"), max_attempts=2, backoff=0.0) as q:
+        rows = lambda: q._con.execute("SELECT state, attempts FROM jobs ORDER BY id").fetchall()
+        q.enqueue("new", "a")
+        job = q.lease()
+        q.fail(job.id, job.token, "boom")
+        q.enqueue("new", "a")                      # pendiente en backoff: no se toca
+        assert rows() == [("pending", 1)], rows()
+        job = q.lease()
+        q.fail(job.id, job.token, "boom")
+        assert rows() == [("failed", 2)], rows()   # max_attempts respetado
+        q.enqueue("new", "a")                      # fallido: se reactiva
+        job = q.lease()
+        q.complete(job.id, job.token)
+        q.enqueue("new", "a")                      # terminado: se reactiva
+        assert rows() == [("pending", 0)], rows()
+    print("check_requeue: ok")
+
+
+def _interrupt() -> None:
+    import _thread
+    _thread.interrupt_main()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--subs", type=int, default=16)
+    ap.add_argument("--items", type=int, default=1000)
+    ap.add_argument("--latency", type=float, default=0.05)
+    ap.add_argument("--fetchers", type=int, default=8)
+    ap.add_argument("--writers", type=int, default=2)
+    ap.add_argument("--crash", action="store_true")
+    args = ap.parse_args()
+
+    check_requeue(tempfile.mkdtemp())
+    subs = [f"sub{i}" for i in range(args.subs)]
+    with FakeReddit(latency=args.latency, items_per_source=args.items) as fr:
+        run_linear(fr, subs, args.items)
+    with FakeReddit(latency=args.latency, items_per_source=args.items) as fr:
+        run_scheduler(fr, subs, args.items, args)
+    if args.crash:
+        with FakeReddit(latency=args.latency, items_per_source=args.items) as fr:
+            run_crash(fr, subs, args.items, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# test/benchmarks/bench_sketches.py
+"""
+Top dominios/autores/entidades y autores distintos: GROUP BY exacto en DuckDB
+sobre los Parquet frente a SketchStore (4 "procesos" escriben sketches por
+separado y se fusionan al consultar). Informa de recall del top-k, error de
+cuenta, error de HLL, tiempo de consulta y tamaño en disco.
+
+    python -m test.benchmarks.bench_sketches --n 500000 --days 30
+"""
+import argparse
+import glob
+import os
+import tempfile
+import time
+
+import duckdb
+import numpy as np
+
+from src.storage import ParquetStorage
+from src.transform.arrow_normalizers import normalize_posts_table
+from src.transform.sketches import SketchStore
+from test.benchmarks.fake_reddit import make_post
+
+BRANDS = [f"Brand{i} Model{i % 7}" for i in range(3000)]
+
+
+def batches(n: int, days: int, batch: int, seed: int = 11):
+    rng = np.random.default_rng(seed)
+    for start in range(0, n, batch):
+        m = min(batch, n - start)
+        doms = rng.zipf(1.3, m) % 20000
+        auth = rng.zipf(1.2, m) % 200000
+        ents = rng.zipf(1.4, m) % len(BRANDS)
+        ts = 1_700_000_000 - rng.integers(0, days * 86400, m)
+        posts = []
+        for i in range(m):
+            p = make_post("/r/sub/new", start + i)
+            p.update(domain=f"d{doms[i]}.com", author=f"u{auth[i]}", created_utc=float(ts[i]),
+                     title=f"review of the {BRANDS[ents[i]]} today")
+            posts.append(p)
+        yield normalize_posts_table(posts)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=500_000)
+    ap.add_argument("--days", type=int, default=30)
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--k", type=int, default=20)
+    args = ap.parse_args()
+
+    base = tempfile.mkdtemp()
+    storage = ParquetStorage(base, "posts")
+    stores = [SketchStore(base, "posts") for _ in range(args.workers)]
+    t_update = 0.0
+    for b, table in enumerate(batches(args.n, args.days, 5000)):
+        storage.save_batches([table], suffix=f"b{b}")
+        t0 = time.perf_counter()
+        stores[b % args.workers].update(table)
+        t_update += time.perf_counter() - t0
+    for s in stores:
+        s.flush()
+    print(f"actualización de sketches: {args.n / t_update:,.0f} posts/s")
+
+    src = f"read_parquet('{base}/posts/*.parquet')"
+    con = duckdb.connect()
+    reader = SketchStore(base, "posts")
+    t0 = time.perf_counter()
+    reader.top("domain", args.k)
+    print(f"primera consulta (carga de {sum(len(glob.glob(f'{reader.dir}/{d}/*.npz')) for d in reader.days())} ficheros): "
+          f"{(time.perf_counter() - t0) * 1000:.0f} ms")
+    for dim, col in (("domain", "domain"), ("author", "author")):
+        t0 = time.perf_counter()
+        exact = con.execute(
+            f"SELECT {col}, COUNT(*) n FROM {src} GROUP BY 1 ORDER BY n DESC, 1 LIMIT {args.k}"
+        ).fetchall()
+        t_exact = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        approx = reader.top(dim, args.k)
+        t_sketch = time.perf_counter() - t0
+        recall = len({x for x, _ in exact} & set(approx[dim])) / args.k
+        exact_n = dict(exact)
+        err = max(abs(c - exact_n.get(x, 0)) / max(exact_n.get(x, 1), 1) for x, c in zip(approx[dim], approx["count"]))
+        print(f"top-{args.k} {dim:7s}: exacto {t_exact * 1000:6.0f} ms | sketch {t_sketch * 1000:6.0f} ms "
+              f"| recall {recall:.0%} | error de cuenta máx {err:.2%}")
+
+    t0 = time.perf_counter()
+    exact = con.execute(f"SELECT COUNT(DISTINCT author) FROM {src}").fetchone()[0]
+    t_exact = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    approx = reader.distinct("author")
+    print(f"autores distintos: exacto {exact} ({t_exact * 1000:.0f} ms) | HLL {approx} "
+          f"({(time.perf_counter() - t0) * 1000:.0f} ms, error {abs(approx - exact) / exact:.2%})")
+    print("top entidades:", reader.top("entity", 5)["entity"].tolist())
+
+    size = sum(os.path.getsize(f) for f in glob.glob(f"{base}/posts/_sketches/**/*.npz", recursive=True))
+    for day in reader.days():
+        reader.compact(day)
+    csize = sum(os.path.getsize(f) for f in glob.glob(f"{base}/posts/_sketches/**/*.npz", recursive=True))
+    compacted = SketchStore(base, "posts")
+    compacted.top("domain", args.k)
+    t0 = time.perf_counter()
+    compacted.top("domain", args.k)
+    print(f"sketches en disco: {size / 2**20:.1f} MB ({args.workers} escritores) -> {csize / 2**20:.1f} MB compactados; "
+          f"top-{args.k} tras compactar {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
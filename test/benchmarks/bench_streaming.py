@@ -0,0 +1,60 @@
+# test/benchmarks/bench_streaming.py
+"""
+Memoria pico (RSS) de la ruta clásica (_collect + save_df) vs streaming por lotes.
+Cada modo corre en un subproceso para medir su ru_maxrss por separado.
+
+    python -m test.benchmarks.bench_streaming --n 500000 --batch-size 5000
+"""
+import argparse
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from src.storage import ParquetStorage
+from src.transform.normalizers import normalize_posts
+from src.pipeline import stream_posts_to_parquet
+from test.benchmarks.fake_reddit import make_post
+
+
+def fake_listing(n: int):
+    """Generador perezoso, como RedditClient.listing."""
+    for i in range(n):
+        yield make_post(f"/r/sub{i % 200}/new", i)
+
+
+def run_mode(mode: str, n: int, batch_size: int) -> None:
+    storage = ParquetStorage(base_dir=tempfile.mkdtemp(), dataset="posts")
+    t0 = time.perf_counter()
+    if mode == "collect":
+        path = storage.save_df(normalize_posts(list(fake_listing(n))), suffix="bench")
+    else:
+        path = stream_posts_to_parquet(fake_listing(n), storage, batch_size=batch_size, suffix="bench")
+    elapsed = time.perf_counter() - t0
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{mode:8s} n={n:>9} {elapsed:7.2f}s  pico RSS {peak_mb:8.1f} MB  -> {path}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=300_000)
+    ap.add_argument("--batch-size", type=int, default=5000)
+    ap.add_argument("--mode", choices=["collect", "stream"])
+    args = ap.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.n, args.batch_size)
+        return
+
+    # Sin --mode: lanza ambos en subprocesos; streaming con 2 tamaños para ver que no crece con n
+    for mode, n in [("collect", args.n), ("stream", args.n), ("stream", args.n * 2)]:
+        subprocess.run(
+            [sys.executable, "-m", "test.benchmarks.bench_streaming",
+             "--mode", mode, "--n", str(n), "--batch-size", str(args.batch_size)],
+            check=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
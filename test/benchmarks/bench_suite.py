@@ -0,0 +1,304 @@
+# test/benchmarks/bench_suite.py
+"""
+Suite offline de regresión (Linux, sin credenciales ni red): cada escenario corre
+en un intérprete nuevo para que el pico de RSS (ru_maxrss) sea solo suyo.
+
+  listing  : RedditClient.listing contra FakeReddit (latencia + jitter, cuota por
+             ventana con cabeceras x-ratelimit-* y 429 forzados)
+  normalize: normalize_posts por páginas de 100 children
+  save     : ParquetStorage.save_df por lotes
+  query    : DuckDBIndex.query sobre las vistas de los Parquet
+  e2e      : listing -> normalize_posts -> save_df por subreddit, y consulta final
+             (el flujo de test/services/reddit_dwl.py)
+
+Para cada escenario: throughput (unidades/s), latencia p50/p95/p99 por operación y
+pico de RSS. Se compara con una línea base JSON y falla (exit 1) si el throughput
+cae por debajo de base / --tolerance, si p95 supera base x --tolerance o si el RSS
+supera base x --rss-tolerance. Una base grabada con otros parámetros se ignora.
+
+    python -m test.benchmarks.bench_suite                       # todos, comparar
+    python -m test.benchmarks.bench_suite listing query         # solo algunos
+    python -m test.benchmarks.bench_suite --update              # regrabar la base
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+BASELINE = os.path.join(os.path.dirname(__file__), "suite_baseline.json")
+
+# Parámetros por escenario (forman parte de la base: si cambian, no se compara)
+PARAMS: Dict[str, Dict] = {
+    "listing": {"subs": 4, "items": 1000, "latency": 0.01, "jitter": 0.02,
+                "quota": 30, "window": 2.0, "throttle_every": 15},
+    "normalize": {"rows": 100_000, "page": 100},
+    "save": {"rows": 200_000, "batch": 5000},
+    "query": {"files": 40, "rows": 5000, "repeats": 5},
+    "e2e": {"subs": 4, "items": 1000, "latency": 0.01, "jitter": 0.02},
+}
+
+QUERIES = [
+    "SELECT COUNT(*) FROM vw_posts",
+    "SELECT subreddit, COUNT(*) n, AVG(score) s FROM vw_posts GROUP BY 1 ORDER BY n DESC",
+    "SELECT author, SUM(num_comments) c FROM vw_posts GROUP BY 1 ORDER BY c DESC LIMIT 20",
+    "SELECT date_trunc('day', to_timestamp(created_utc)) d, COUNT(*) FROM vw_posts GROUP BY 1 ORDER BY 1",
+    "SELECT id, title FROM vw_posts WHERE title ILIKE '%sub3%' ORDER BY score DESC LIMIT 50",
+]
+
+
+# ---------------------- Medidas ----------------------
+
+class Timer:
+    """
+    Acumula latencias por operación: `with timer: ...` o timer.wrap(fn).
+    """
+
+    def __init__(self):
+        self.samples: List[float] = []
+        self._t0 = 0.0
+
+    def __enter__(self) -> "Timer":
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.samples.append(time.perf_counter() - self._t0)
+
+    def wrap(self, fn: Callable) -> Callable:
+        def timed(*args, **kwargs):
+            with self:
+                return fn(*args, **kwargs)
+        return timed
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """Percentil por rango más cercano (sin interpolar)."""
+    if not samples:
+        return 0.0
+    xs = sorted(samples)
+    return xs[min(len(xs) - 1, max(0, int(round(q / 100 * len(xs) + 0.5)) - 1))]
+
+
+def summarize(units: int, elapsed: float, timer: Timer, **extra) -> Dict:
+    s = timer.samples
+    return {
+        "units": units,
+        "seconds": round(elapsed, 4),
+        "throughput": round(units / elapsed, 2) if elapsed else 0.0,
+        "ops": len(s),
+        "p50_ms": round(percentile(s, 50) * 1000, 3),
+        "p95_ms": round(percentile(s, 95) * 1000, 3),
+        "p99_ms": round(percentile(s, 99) * 1000, 3),
+        **extra,
+    }
+
+
+def peak_rss_mb() -> float:
+    # Linux: ru_maxrss en KiB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# ---------------------- Datos ----------------------
+
+def children(rows: int, offset: int = 0) -> List[Dict]:
+    from test.benchmarks.fake_reddit import make_post
+    return [{"kind": "t3", "data": make_post(f"/r/sub{i % 20}/new", i)} for i in range(offset, offset + rows)]
+
+
+def write_posts(base: str, files: int, rows: int) -> None:
+    """`files` crawls de `rows` posts; cada uno solapa la mitad con el anterior."""
+    from src.storage import ParquetStorage
+    from src.transform.normalizers import normalize_posts
+
+    storage = ParquetStorage(base_dir=base, dataset="posts")
+    for k in range(files):
+        items = [c["data"] for c in children(rows, offset=k * rows // 2)]
+        storage.save_df(normalize_posts(items), suffix=f"f{k}")
+
+
+# ---------------------- Escenarios ----------------------
+# Los imports pesados van dentro: el proceso padre solo orquesta.
+
+def run_listing(p: Dict) -> Dict:
+    from test.benchmarks.bench_scheduler import fake_client
+    from test.benchmarks.fake_reddit import FakeReddit
+
+    with FakeReddit(latency=p["latency"], jitter=p["jitter"], items_per_source=p["items"],
+                    quota=p["quota"], window=p["window"], throttle_every=p["throttle_every"]) as fr:
+        rc = fake_client(fr.auth_url, fr.api_base)
+        timer = Timer()
+        rc._request = timer.wrap(rc._request)   # página = espera del limiter + HTTP (+ reintento)
+        n = 0
+        t0 = time.perf_counter()
+        for i in range(p["subs"]):
+            n += sum(1 for _ in rc.listing(f"/r/bench{i}/new", max_items=p["items"]))
+        elapsed = time.perf_counter() - t0
+        rl = rc.rate_limiter
+        return summarize(n, elapsed, timer, http_429=fr.requests.get("429", 0),
+                         limiter_waits=rl.waits, limiter_wait_s=round(rl.waited_seconds, 2))
+
+
+def run_normalize(p: Dict) -> Dict:
+    from src.transform.normalizers import normalize_posts
+
+    items = [c["data"] for c in children(p["rows"])]
+    pages = [items[i:i + p["page"]] for i in range(0, len(items), p["page"])]
+    timer = Timer()
+    t0 = time.perf_counter()
+    for page in pages:
+        with timer:
+            normalize_posts(page)
+    return summarize(len(items), time.perf_counter() - t0, timer)
+
+
+def run_save(p: Dict) -> Dict:
+    from src.storage import ParquetStorage
+    from src.transform.normalizers import normalize_posts
+
+    df = normalize_posts([c["data"] for c in children(p["rows"])])
+    parts = [df.iloc[i:i + p["batch"]] for i in range(0, len(df), p["batch"])]
+    storage = ParquetStorage(base_dir=tempfile.mkdtemp(), dataset="posts")
+    timer = Timer()
+    t0 = time.perf_counter()
+    for k, part in enumerate(parts):
+        with timer:
+            storage.save_df(part, suffix=f"b{k}")
+    return summarize(len(df), time.perf_counter() - t0, timer)
+
+
+def run_query(p: Dict) -> Dict:
+    from src.storage import DuckDBIndex
+
+    base = tempfile.mkdtemp()
+    write_posts(base, p["files"], p["rows"])
+    index = DuckDBIndex(db_path=os.path.join(base, "bench.duckdb"), base_dir=base)
+    index.create_view_for_dataset("posts", latest_only=True)
+    timer = Timer()
+    t0 = time.perf_counter()
+    for _ in range(p["repeats"]):
+        for sql in QUERIES:
+            with timer:
+                index.query(sql)
+    return summarize(len(timer.samples), time.perf_counter() - t0, timer)
+
+
+def run_e2e(p: Dict) -> Dict:
+    from src.storage import DuckDBIndex, ParquetStorage
+    from src.transform.normalizers import normalize_posts
+    from test.benchmarks.bench_scheduler import fake_client
+    from test.benchmarks.fake_reddit import FakeReddit
+
+    base = tempfile.mkdtemp()
+    storage = ParquetStorage(base_dir=base, dataset="posts")
+    index = DuckDBIndex(db_path=os.path.join(base, "bench.duckdb"), base_dir=base)
+    with FakeReddit(latency=p["latency"], jitter=p["jitter"], items_per_source=p["items"]) as fr:
+        rc = fake_client(fr.auth_url, fr.api_base)
+        timer = Timer()
+        t0 = time.perf_counter()
+        for i in range(p["subs"]):
+            with timer:
+                df = normalize_posts(list(rc.listing(f"/r/bench{i}/new", max_items=p["items"])))
+                storage.save_df(df, suffix=f"new_bench{i}")
+        index.create_view_for_dataset("posts", latest_only=True)
+        rows = int(index.query("SELECT COUNT(*) AS n FROM vw_posts")["n"][0])
+        elapsed = time.perf_counter() - t0
+    return summarize(rows, elapsed, timer)
+
+
+SCENARIOS: Dict[str, Callable[[Dict], Dict]] = {
+    "listing": run_listing,
+    "normalize": run_normalize,
+    "save": run_save,
+    "query": run_query,
+    "e2e": run_e2e,
+}
+
+
+# ---------------------- Orquestación ----------------------
+
+def measure(name: str) -> Dict:
+    """
+    Ejecuta un escenario en un proceso limpio y devuelve sus métricas.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-m", "test.benchmarks.bench_suite", "--child", name],
+        capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"escenario {name} falló:\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def compare(name: str, res: Dict, ref: Dict, tol: float, rss_tol: float) -> List[str]:
+    out = []
+    if res["throughput"] < ref["throughput"] / tol:
+        out.append(f"{name}: throughput {res['throughput']:.0f}/s < base {ref['throughput']:.0f}/s / {tol}")
+    # Umbral absoluto mínimo de 5 ms en latencia: por debajo, el ruido domina
+    if res["p95_ms"] > max(ref["p95_ms"] * tol, ref["p95_ms"] + 5):
+        out.append(f"{name}: p95 {res['p95_ms']:.1f} ms > {tol}x base ({ref['p95_ms']:.1f} ms)")
+    if res["peak_rss_mb"] > ref["peak_rss_mb"] * rss_tol:
+        out.append(f"{name}: RSS {res['peak_rss_mb']:.0f} MB > {rss_tol}x base ({ref['peak_rss_mb']:.0f} MB)")
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("scenarios", nargs="*", help=f"escenarios a ejecutar (por defecto todos: {', '.join(SCENARIOS)})")
+    ap.add_argument("--tolerance", type=float, default=1.5, help="factor máximo en throughput y p95")
+    ap.add_argument("--rss-tolerance", type=float, default=1.25)
+    ap.add_argument("--baseline", default=BASELINE)
+    ap.add_argument("--update", action="store_true", help="regrabar la línea base")
+    ap.add_argument("--child", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        res = SCENARIOS[args.child](PARAMS[args.child])
+        res["peak_rss_mb"] = round(peak_rss_mb(), 1)
+        print(json.dumps(res))
+        return
+
+    base: Dict[str, Dict] = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            base = json.load(f)
+
+    names = args.scenarios or list(SCENARIOS)
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        ap.error(f"escenarios desconocidos: {', '.join(unknown)}")
+    failures: List[str] = []
+    print(f"{'escenario':<10} {'unid/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'RSS MB':>7}  base unid/s / p95 / RSS")
+    for name in names:
+        res = measure(name)
+        res["params"] = PARAMS[name]
+        ref = base.get(name) if not args.update else None
+        if ref and ref.get("params") != PARAMS[name]:
+            print(f"  ({name}: parámetros distintos a la base, no se compara)")
+            ref = None
+        extra = "" if not ref else (
+            f"  {ref['throughput']:.0f} / {ref['p95_ms']:.1f} / {ref['peak_rss_mb']:.0f}"
+        )
+        print(
+            f"{name:<10} {res['throughput']:>10.0f} {res['p50_ms']:>9.1f} {res['p95_ms']:>9.1f} "
+            f"{res['p99_ms']:>9.1f} {res['peak_rss_mb']:>7.0f}{extra}"
+        )
+        if ref:
+            failures += compare(name, res, ref, args.tolerance, args.rss_tolerance)
+        base[name] = res
+
+    if args.update:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(base, f, indent=2, sort_keys=True)
+        print(f"Línea base guardada en {args.baseline}")
+    if failures:
+        print("\nREGRESIONES:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# test/benchmarks/bench_trends.py
+"""
+Curva de volumen/velocidad de un concepto: recalculada desde los Parquet en cada
+petición (vista + regex + ventana) frente a TrendIndex.series() sobre los
+agregados, y coste del refresh incremental al llegar un fichero nuevo.
+
+check_timezones(): buckets diarios refrescados desde procesos con TZ distintos
+(America/New_York, Asia/Kolkata) -> días UTC, sin doble conteo, y leaders()
+de un día cuenta lo mismo que los posts de ese día UTC.
+
+    python -m test.benchmarks.bench_trends --files 100 --rows 5000
+"""
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from src.storage import DuckDBIndex, ParquetStorage, TrendIndex
+from test.benchmarks._util import timed_median, write_posts
+from test.benchmarks.fake_reddit import make_post
+
+WORDS = ["sneakers", "trainers", "running shoes", "boots", "sandals", "laptop", "keyboard", "monitor"]
+CONCEPTS = {
+    "running shoes": ["running shoes", "sneakers", "trainers"],
+    "computers": ["laptop", "keyboard", "monitor"],
+}
+
+NAIVE_SQL = r"""
+WITH m AS (
+    SELECT date_trunc('hour', to_timestamp(created_utc)) AS bucket
+    FROM vw_posts
+    WHERE regexp_matches(lower(coalesce(title, '') || ' ' || coalesce(selftext, '')),
+                         '\b(running\s+shoes|sneakers|trainers)\b')
+),
+agg AS (SELECT bucket, COUNT(*) AS volume FROM m GROUP BY bucket),
+grid AS (SELECT unnest(generate_series(min(bucket), max(bucket), INTERVAL 1 hour)) AS bucket FROM agg),
+f AS (SELECT g.bucket, COALESCE(volume, 0) AS volume FROM grid g LEFT JOIN agg USING (bucket)),
+s AS (SELECT *, AVG(volume) OVER (ORDER BY bucket ROWS BETWEEN 2 PRECEDING AND CURRENT ROW) AS ma FROM f)
+SELECT bucket, volume, ma - LAG(ma) OVER (ORDER BY bucket) AS velocity FROM s ORDER BY bucket
+"""
+
+
+def _posts(k: int, rows: int) -> List[Dict]:
+    rng = random.Random(k)
+    posts = []
+    for i in range(k * rows, (k + 1) * rows):
+        p = make_post(f"/r/sub{k % 10}/new", i)
+        p["title"] = f"{rng.choice(WORDS)} {p['title']}"
+        p["created_utc"] = float(1_700_000_000 - rng.randrange(30 * 24 * 3600))
+        posts.append(p)
+    return posts
+
+
+def _refresh_with_tz(tz: str, db: str, base: str) -> None:
+    # DuckDB toma el TZ del entorno al arrancar: hace falta un proceso nuevo
+    code = (
+        "from src.storage import TrendIndex; "
+        f"TrendIndex(db_path={db!r}, base_dir={base!r}, bucket='day').refresh('posts')"
+    )
+    subprocess.run([sys.executable, "-c", code], env={**os.environ, "TZ": tz}, check=True)
+
+
+def check_timezones(rows: int = 2000) -> None:
+    base = tempfile.mkdtemp()
+    storage = ParquetStorage(base_dir=base, dataset="posts")
+    db = os.path.join(base, "tz.duckdb")
+    for k, tz in enumerate(("America/New_York", "Asia/Kolkata")):
+        write_posts(storage, _posts(k, rows), f"crawl{k}")
+        _refresh_with_tz(tz, db, base)
+    trends = TrendIndex(db_path=db, base_dir=base, bucket="day")
+    days = trends.query("SELECT epoch(bucket)::BIGINT AS d, posts FROM trend_posts WHERE concept = '*'")
+    assert (days["d"] % 86400 == 0).all(), "buckets diarios fuera de UTC"
+    assert days["posts"].sum() == 2 * rows, f"{days['posts'].sum()} posts agregados de {2 * rows}"
+    utc_day = trends.query(
+        "SELECT COUNT(*) AS n FROM mt_posts WHERE created_utc >= 1699920000 AND created_utc < 1700006400"
+    )["n"][0]
+    assert trends.leaders("2023-11-14", n=100)["posts"].sum() == utc_day, "leaders() fuera del día UTC"
+    trends.close()
+    print("check_timezones: ok")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--files", type=int, default=100)
+    ap.add_argument("--rows", type=int, default=5000)
+    ap.add_argument("--repeats", type=int, default=5)
+    args = ap.parse_args()
+
+    check_timezones()
+    base = tempfile.mkdtemp()
+    storage = ParquetStorage(base_dir=base, dataset="posts")
+    for k in range(args.files):
+        write_posts(storage, _posts(k, args.rows), f"crawl{k}")
+
+    views = DuckDBIndex(db_path=os.path.join(base, "views.duckdb"), base_dir=base)
+    views.create_view_for_dataset("posts", latest_only=True)
+    trends = TrendIndex(db_path=os.path.join(base, "trends.duckdb"), base_dir=base)
+    trends.set_concepts(CONCEPTS)
+    t0 = time.perf_counter()
+    print("refresh inicial:", trends.refresh("posts").summary())
+    n_rows = trends.query("SELECT COUNT(*) AS n FROM trend_posts")["n"][0]
+    print(f"  trend_posts: {n_rows} filas para {args.files * args.rows} posts")
+
+    naive = views.query(NAIVE_SQL)
+    curve = trends.series("running shoes")
+    assert (naive["volume"].to_numpy() == curve["volume"].to_numpy()).all()
+
+    t_naive = timed_median(lambda: views.query(NAIVE_SQL), args.repeats)
+    t_series = timed_median(lambda: trends.series("running shoes"), args.repeats)
+    print(f"curva 'running shoes' ({len(curve)} buckets): desde Parquet {t_naive:.1f} ms | series() {t_series:.1f} ms")
+
+    write_posts(storage, _posts(args.files, args.rows), f"crawl{args.files}")
+    print("refresh incremental:", trends.refresh("posts").summary())
+    assert (views.query(NAIVE_SQL)["volume"].to_numpy() == trends.series("running shoes")["volume"].to_numpy()).all()
+    t0 = time.perf_counter()
+    trends.set_concepts({**CONCEPTS, "footwear": ["boots", "sandals"]})
+    print(f"concepto nuevo recalculado en {time.perf_counter() - t0:.2f}s")
+    trends.close()
+
+
+if __name__ == "__main__":
+    main()
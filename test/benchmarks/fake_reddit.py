@@ -0,0 +1,295 @@
+# test/benchmarks/fake_reddit.py
+"""
+Servidor HTTP local que imita lo justo de la API de Reddit para benchmarks offline:
+  - POST /api/v1/access_token
+  - GET  /r/{sub}/new | /r/{sub}/top | /search | /r/{sub}/search  (paginación 'after')
+  - Cabeceras x-ratelimit-remaining/used/reset y 429 al agotar la cuota de la ventana
+    (o forzado cada `throttle_every` GETs)
+  - Latencia fija + jitter uniforme reproducible (semilla)
+  - ETag en los listings y 304 ante If-None-Match coincidente
+  - GET  /comments/{id} (árbol anidado, stubs "more" y "continue this thread")
+    y /api/morechildren (400 si se piden más de 100 ids)
+
+Uso:
+    with FakeReddit(latency=0.05) as fr:
+        rc = AsyncRedditClient("id", "secret", "bench", auth_url=fr.auth_url, api_base=fr.api_base)
+"""
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
+BASE_TS = 1_700_000_000
+
+
+def make_post(source: str, idx: int) -> Dict:
+    """
+    Post sintético determinista (mismo source/idx -> mismo post).
+    El orden idx=0,1,2... es de más nuevo a más antiguo.
+    """
+    h = zlib.crc32(f"{source}:{idx}".encode())
+    pid = f"{h:08x}{idx:x}"[-10:]
+    sub = source.split("/")[2] if source.startswith("/r/") else f"sub{h % 50}"
+    return {
+        "id": pid,
+        "name": f"t3_{pid}",
+        "subreddit": sub,
+        "author": f"user{h % 997}",
+        "title": f"Post {idx} sobre {source} &amp; más",
+        "selftext": "Lorem ipsum\n\n dolor   sit amet " * (1 + h % 4),
+        "created_utc": float(BASE_TS - idx * 60),
+        "num_comments": h % 300,
+        "score": h % 5000,
+        "upvote_ratio": round(0.5 + (h % 50) / 100, 2),
+        "url": f"https://example.com/{pid}",
+        "permalink": f"/r/{sub}/comments/{pid}/post_{idx}/",
+        "over_18": False,
+        "is_self": True,
+        "domain": f"self.{sub}",
+        "link_flair_text": None,
+        "subreddit_subscribers": 1000 + h % 100000,
+    }
+
+
+# ---------------------- Comentarios sintéticos ----------------------
+# Comentario i de un post: hilos de 10 (i % 10 == 0 cuelga del post, el resto
+# del i-1), así hay profundidad para probar "continue this thread".
+
+def comment_id(post_id: str, i: int) -> str:
+    return f"{post_id}c{i:x}"
+
+
+def make_comment(post_id: str, i: int, n: int) -> Dict:
+    parent = f"t3_{post_id}" if i % 10 == 0 else f"t1_{comment_id(post_id, i - 1)}"
+    return {
+        "id": comment_id(post_id, i),
+        "name": f"t1_{comment_id(post_id, i)}",
+        "link_id": f"t3_{post_id}",
+        "parent_id": parent,
+        "subreddit": "fake",
+        "author": f"user{i % 97}",
+        "body": f"Comentario {i} &amp; respuesta",
+        "created_utc": float(BASE_TS + i),
+        "score": i % 50,
+        "depth": i % 10,
+        "controversiality": 0,
+        "is_submitter": False,
+        "stickied": False,
+        "distinguished": None,
+        "replies": "",
+    }
+
+
+def _thread(post_id: str, i: int, n: int, visible: int, max_depth: int, depth: int = 0) -> Dict:
+    """t1 anidado: el hijo (i+1) cuelga en replies hasta `max_depth` o `visible`."""
+    c = make_comment(post_id, i, n)
+    child = i + 1
+    if child < visible and child % 10 != 0:
+        if depth + 1 >= max_depth:
+            stub = {"id": "_", "count": 0, "children": [], "parent_id": f"t1_{c['id']}", "depth": depth + 1}
+            kids = [{"kind": "more", "data": stub}]
+        else:
+            kids = [_thread(post_id, child, n, visible, max_depth, depth + 1)]
+        c["replies"] = {"kind": "Listing", "data": {"children": kids}}
+    return {"kind": "t1", "data": c}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "_Server"
+
+    def log_message(self, *args) -> None:  # silencioso
+        pass
+
+    def _send(self, code: int, body: Dict, headers: Optional[Dict[str, str]] = None) -> None:
+        raw = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        if urlparse(self.path).path == "/api/v1/access_token":
+            self.server.count("auth")
+            self._send(200, {"access_token": "fake-token", "expires_in": 3600, "token_type": "bearer"})
+        else:
+            self._send(404, {"error": 404})
+
+    def do_GET(self) -> None:
+        u = urlparse(self.path)
+        qs = {k: v[0] for k, v in parse_qs(u.query).items()}
+        fr = self.server.fake
+        time.sleep(fr.delay())
+        allowed, rl_headers = fr.take_quota()
+        if not allowed:
+            self.server.count("429")
+            self._send(429, {"message": "Too Many Requests", "error": 429}, rl_headers)
+            return
+        if u.path.startswith("/comments/"):
+            self._comments(u.path.split("/")[2], qs, rl_headers)
+            return
+        if u.path == "/api/morechildren":
+            self._morechildren(qs, rl_headers)
+            return
+        self.server.count("listing")
+
+        limit = min(int(qs.get("limit", 25)), 100)
+        source = u.path + ("?q=" + qs["q"] if "q" in qs else "")
+        start = int(qs["after"].split("_")[-1], 16) if qs.get("after") else 0
+        end = min(start + limit, fr.items_per_source)
+        children = [{"kind": "t3", "data": make_post(source, i)} for i in range(start, end)]
+        after = f"t3_cursor_{end:x}" if end < fr.items_per_source else None
+        body = {"kind": "Listing", "data": {"after": after, "children": children}}
+        etag = f'"{zlib.crc32(json.dumps(body).encode()):08x}"'
+        rl_headers["ETag"] = etag
+        if self.headers.get("If-None-Match") == etag:
+            self.server.count("304")
+            self.send_response(304)
+            for k, v in rl_headers.items():
+                self.send_header(k, v)
+            self.end_headers()
+            return
+        self._send(200, body, rl_headers)
+
+
+    def _comments(self, post_id: str, qs: Dict[str, str], headers: Dict[str, str]) -> None:
+        self.server.count("comments")
+        fr = self.server.fake
+        n = fr.comments_per_post
+        visible = min(int(qs.get("limit", 200)), 500, n)
+        max_depth = int(qs.get("depth", 10))
+        if qs.get("comment"):
+            # Subárbol desde un comentario (continue this thread)
+            start = int(qs["comment"][len(post_id) + 1:], 16)
+            end = min(start // 10 * 10 + 10, n)
+            roots = [_thread(post_id, start, n, end, max_depth)]
+        else:
+            roots = [_thread(post_id, i, n, visible, max_depth) for i in range(0, visible, 10)]
+            rest = [comment_id(post_id, i) for i in range(visible, n)]
+            for k in range(0, len(rest), 200):
+                stub = {"id": rest[k], "count": len(rest[k:k + 200]), "children": rest[k:k + 200],
+                        "parent_id": f"t3_{post_id}", "depth": 0}
+                roots.append({"kind": "more", "data": stub})
+        post = {"kind": "Listing", "data": {"children": [{"kind": "t3", "data": {"id": post_id}}]}}
+        body = [post, {"kind": "Listing", "data": {"after": None, "children": roots}}]
+        self._send(200, body, headers)
+
+    def _morechildren(self, qs: Dict[str, str], headers: Dict[str, str]) -> None:
+        self.server.count("morechildren")
+        ids = [i for i in qs.get("children", "").split(",") if i]
+        if len(ids) > 100:
+            self._send(400, {"error": 400, "message": "too many children"}, headers)
+            return
+        post_id = qs["link_id"][3:]
+        n = self.server.fake.comments_per_post
+        things = [{"kind": "t1", "data": make_comment(post_id, int(c[len(post_id) + 1:], 16), n)} for c in ids]
+        self._send(200, {"json": {"errors": [], "data": {"things": things}}}, headers)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    fake: "FakeReddit"
+
+    def count(self, key: str) -> None:
+        with self.fake._lock:
+            self.fake.requests[key] = self.fake.requests.get(key, 0) + 1
+
+
+class FakeReddit:
+    """
+    latency: segundos de espera simulada por página.
+    jitter: segundos extra aleatorios (uniforme 0..jitter) por petición.
+    throttle_every: si > 0, uno de cada N GETs responde 429 aunque quede cuota.
+    items_per_source: nº total de posts de cada listing/búsqueda.
+    quota/window: peticiones permitidas por ventana de `window` segundos.
+    comments_per_post: tamaño del árbol de comentarios de cada post.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        items_per_source: int = 1000,
+        quota: int = 100_000,
+        window: float = 600.0,
+        port: int = 0,
+        comments_per_post: int = 0,
+        jitter: float = 0.0,
+        throttle_every: int = 0,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_every = throttle_every
+        self._rng = random.Random(seed)
+        self._gets = 0
+        self.items_per_source = items_per_source
+        self.quota = quota
+        self.window = window
+        self.comments_per_post = comments_per_post
+        self._window_start = time.monotonic()
+        self._used = 0
+        self.requests: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._httpd = _Server(("127.0.0.1", port), _Handler)
+        self._httpd.fake = self
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    def delay(self) -> float:
+        if not self.jitter:
+            return self.latency
+        with self._lock:
+            return self.latency + self._rng.uniform(0.0, self.jitter)
+
+    def take_quota(self) -> Tuple[bool, Dict[str, str]]:
+        with self._lock:
+            now = time.monotonic()
+            if now - self._window_start >= self.window:
+                self._window_start = now
+                self._used = 0
+            self._gets += 1
+            forced = self.throttle_every > 0 and self._gets % self.throttle_every == 0
+            allowed = self._used < self.quota and not forced
+            if allowed:
+                self._used += 1
+            reset = 0.0 if forced else self.window - (now - self._window_start)
+            headers = {
+                "x-ratelimit-remaining": f"{max(0, self.quota - self._used):.1f}",
+                "x-ratelimit-used": str(self._used),
+                "x-ratelimit-reset": str(max(0, int(round(reset)))),
+            }
+            return allowed, headers
+
+    @property
+    def api_base(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def auth_url(self) -> str:
+        return f"{self.api_base}/api/v1/access_token"
+
+    def start(self) -> "FakeReddit":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "FakeReddit":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def expected_ids(source: str, n: int) -> List[str]:
+    return [make_post(source, i)["id"] for i in range(n)]